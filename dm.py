@@ -20,7 +20,7 @@ class Organisation:
             name=each_tnt["name"],
             slug=self.nb.make_slug(each_tnt.get("slug", each_tnt["name"])),
             description=each_tnt.get("descr", ""),
-            tags=self.nb.get_or_create_tag(each_tnt.get("tags")),
+            tags=self.nb.tag_ref(each_tnt.get("tags")),
         )
 
     # 2b. SITE: Uses temp dict and joins as the ASN cant be None, it must be an integer.
@@ -35,7 +35,7 @@ class Organisation:
             time_zone=each_site.get("time_zone", "UTC"),
             description=each_site.get("descr", ""),
             physical_address=each_site.get("addr", ""),
-            tags=self.nb.get_or_create_tag(each_site.get("tags")),
+            tags=self.nb.tag_ref(each_site.get("tags")),
         )
         if each_site.get("ASN") != None:
             temp_site["asn"] = each_site["ASN"]
@@ -55,7 +55,7 @@ class Organisation:
             slug=self.nb.make_slug(each_loc.get("slug", each_loc["name"])),
             site=dict(name=each_site["name"]),
             description=each_loc.get("descr", ""),
-            tags=self.nb.get_or_create_tag(each_loc.get("tags")),
+            tags=self.nb.tag_ref(each_loc.get("tags")),
         )
         if parent != None:
             tmp_loc["parent"] = dict(name=parent)
@@ -74,7 +74,7 @@ class Organisation:
                     ),
                     tenant=dict(name=each_rack.get("tenant", each_tnt["name"])),
                     u_height=each_rack.get("height", 42),
-                    tags=self.nb.get_or_create_tag(each_rack.get("tags")),
+                    tags=self.nb.tag_ref(each_rack.get("tags")),
                 )
                 # Needed as Role cant be blank
                 if each_rack.get("role") != None:
@@ -90,7 +90,7 @@ class Organisation:
             slug=self.nb.make_slug(each_rr.get("slug", each_rr["name"])),
             description=each_rr.get("descr", ""),
             color=each_rr.get("color", "ffffff"),
-            tags=self.nb.get_or_create_tag(each_rr.get("tags")),
+            tags=self.nb.tag_ref(each_rr.get("tags")),
         )
 
     # ENGINE: Runs all the other methods in this class to create dict used to create nbox objects
@@ -149,7 +149,7 @@ class Devices:
             color=each_role.get("color", "ffffff"),
             description=each_role.get("descr", ""),
             vm_role=each_role.get("vm_role", True),
-            tags=self.nb.get_or_create_tag(each_role.get("tags")),
+            tags=self.nb.tag_ref(each_role.get("tags")),
         )
 
     # 3b. MFTR: List of manufacturers for all sites
@@ -158,7 +158,7 @@ class Devices:
             name=each_mftr["name"],
             slug=self.nb.make_slug(each_mftr.get("slug", each_mftr["name"])),
             description=each_mftr.get("descr", ""),
-            tags=self.nb.get_or_create_tag(each_mftr.get("tags")),
+            tags=self.nb.tag_ref(each_mftr.get("tags")),
         )
 
     # 3c. PLATFORM: List of platforms for the manufacturer. Uses 'if' as platform is optional
@@ -169,7 +169,7 @@ class Devices:
             manufacturer=dict(name=mftr),
             description=each_pltm.get("descr", ""),
             napalm_driver=each_pltm.get("driver", self.nb.make_slug(each_pltm["name"])),
-            tags=self.nb.get_or_create_tag(each_pltm.get("tags")),
+            tags=self.nb.tag_ref(each_pltm.get("tags")),
         )
 
     # DEV_TYPE_CONN: Creates each device type connection object
@@ -286,7 +286,7 @@ class Ipam:
             slug=self.nb.make_slug(each_rir.get("slug", each_rir["name"])),
             description=each_rir.get("descr", ""),
             is_private=each_rir.get("is_private", False),
-            tags=self.nb.get_or_create_tag(each_rir.get("tags")),
+            tags=self.nb.tag_ref(each_rir.get("tags")),
         )
 
     # 4b. AGGREGATE: Create aggregates that are associated to the RIR
@@ -297,7 +297,7 @@ class Ipam:
             rir=dict(name=each_rir["name"]),
             prefix=each_aggr["prefix"],
             description=each_aggr.get("descr", ""),
-            tags=self.nb.get_or_create_tag(each_aggr.get("tags")),
+            tags=self.nb.tag_ref(each_aggr.get("tags")),
         )
 
     # 4c. ROLE: Provides segregation of networks (i.e prod, npe, etc), applies to all VLANs and prefixes beneath it
@@ -306,7 +306,7 @@ class Ipam:
             name=each_role["name"],
             slug=self.nb.make_slug(each_role.get("slug", each_role["name"])),
             description=each_role.get("descr", ""),
-            tags=self.nb.get_or_create_tag(each_role.get("tags")),
+            tags=self.nb.tag_ref(each_role.get("tags")),
         )
 
     # 4d. VL_GRP: Creates per site VLAN group that holds VLANs that are unique to that group
@@ -316,7 +316,7 @@ class Ipam:
             slug=self.nb.make_slug(each_vlgrp.get("slug", each_vlgrp["name"])),
             site=dict(name=site),
             description=each_vlgrp.get("descr", ""),
-            tags=self.nb.get_or_create_tag(each_vlgrp.get("tags")),
+            tags=self.nb.tag_ref(each_vlgrp.get("tags")),
         )
 
     # 4e. VLAN: Creates VLANs and associate to the vl_grp, tenant, site and role. The VL_GRP and role keep them unique
@@ -336,7 +336,7 @@ class Ipam:
                 vl_grp_tnt, dict(name=each_vl.get("tenant", vl_grp_tnt))
             ),
             description=each_vl.get("descr", ""),
-            tags=self.nb.get_or_create_tag(each_vl.get("tags")),
+            tags=self.nb.tag_ref(each_vl.get("tags")),
         )
         if each_vlgrp != None:
             tmp_vlan["group"] = dict(name=each_vlgrp)
@@ -351,12 +351,12 @@ class Ipam:
             description=each_vrf.get("descr", ""),
             enforce_unique=each_vrf.get("unique", True),
             tenant=self.nb.name_none(vrf_tnt, dict(name=vrf_tnt)),
-            tags=self.nb.get_or_create_tag(each_vrf.get("tags")),
-            import_targets=self.nb.get_or_create_rt(
+            tags=self.nb.tag_ref(each_vrf.get("tags")),
+            import_targets=self.nb.rt_ref(
                 each_vrf.get("import_rt"),
                 vrf_tnt,
             ),
-            export_targets=self.nb.get_or_create_rt(
+            export_targets=self.nb.rt_ref(
                 each_vrf.get("export_rt"),
                 vrf_tnt,
             ),
@@ -387,7 +387,7 @@ class Ipam:
             tenant=self.nb.name_none(
                 vrf_tnt, dict(name=each_pfx.get("tenant", vrf_tnt))
             ),
-            tags=self.nb.get_or_create_tag(each_pfx.get("tags")),
+            tags=self.nb.tag_ref(each_pfx.get("tags")),
         )
         if site == None:
             tmp_pfx["site"] = site
@@ -432,7 +432,7 @@ class Ipam:
             self.role.append(self.cr_role(each_role))
             # Loops through sites to create vlans and prefixes
             for each_site in each_role["site"]:
-                tnt = self.nb.get_tnt(each_site["name"])
+                tnt = self.nb.site_tnt_ref(each_site["name"])
                 # 4d. VL_GRP: Creates per-site VLAN Group Dictionary
                 if each_site.get("vlan_grp") != None:
                     for each_vlgrp in each_site["vlan_grp"]:
@@ -536,7 +536,7 @@ class Circuits:
             name=each_type["name"],
             slug=self.nb.make_slug(each_type.get("slug", each_type["name"])),
             description=each_type.get("descr", ""),
-            tags=self.nb.get_or_create_tag(each_type.get("tags")),
+            tags=self.nb.tag_ref(each_type.get("tags")),
         )
 
     # 5b. PROVIDER: Containers that hold cicuits by the same provider of connectivity (ISP)
@@ -547,7 +547,7 @@ class Circuits:
             account=each_pvdr.get("account_num", ""),
             portal_url=each_pvdr.get("portal_url", ""),
             comments=each_pvdr.get("comments", ""),
-            tags=self.nb.get_or_create_tag(each_pvdr.get("tags")),
+            tags=self.nb.tag_ref(each_pvdr.get("tags")),
         )
         # Optional setting ASN
         if each_pvdr.get("asn") != None:
@@ -564,7 +564,7 @@ class Circuits:
             provider=dict(name=each_pvdr["name"]),
             description=each_crt.get("descr", ""),
             comments=each_crt.get("comments", ""),
-            tags=self.nb.get_or_create_tag(each_crt.get("tags")),
+            tags=self.nb.tag_ref(each_crt.get("tags")),
         )
         # Optional settings Tenant and commit_rate need to be only added if set as empty vlaues breal API calls
         if each_crt.get("tenant") != None:
@@ -604,7 +604,7 @@ class Virtualisation:
             name=each_grp["name"],
             slug=self.nb.make_slug(each_grp.get("slug", each_grp["name"])),
             description=each_grp.get("descr", ""),
-            tags=self.nb.get_or_create_tag(each_grp.get("tags")),
+            tags=self.nb.tag_ref(each_grp.get("tags")),
         )
 
     # 6b. CLUSTER_TYPE: Represents a technology or mechanism by which to group clusters
@@ -613,7 +613,7 @@ class Virtualisation:
             name=each_type["name"],
             slug=self.nb.make_slug(each_type.get("slug", each_type["name"])),
             description=each_type.get("descr", ""),
-            tags=self.nb.get_or_create_tag(each_type.get("tags")),
+            tags=self.nb.tag_ref(each_type.get("tags")),
         )
 
     # 6c. CLUSTERS: Holds VMs and physical resources which hosts VMs
@@ -634,20 +634,15 @@ class Virtualisation:
             tmp_cltr["group"] = dict(name=each_cltr.get("group", type_grp))
         type_tags = each_type.get("tags", None)
         if each_cltr.get("tags", type_tags) != None:
-            tmp_cltr["tags"] = self.nb.get_or_create_tag(
-                each_cltr.get("tags", type_tags)
-            )
-        # If tenant is undefined in cltr and cltr_grp gets the tenant name from the site (leaves blank if API call fails)
+            tmp_cltr["tags"] = self.nb.tag_ref(each_cltr.get("tags", type_tags))
+        # If tenant is undefined in cltr and cltr_grp gets the tenant name from the site (leaves blank if site has no tenant)
         if each_type.get("tenant") != None:
             type_tnt = each_type.get("tenant", None)
         elif each_type.get("tenant") == None:
-            try:
-                site = each_cltr.get("site", type_site)
-                type_tnt = dict(self.nb.dcim.sites.get(name=site))["tenant"]["name"]
-            except:
-                type_tnt = None
-        if each_cltr.get("tenant", type_tnt) != None:
-            tmp_cltr["tenant"] = dict(name=each_cltr.get("tenant", type_tnt))
+            type_tnt = self.nb.site_tnt_ref(each_cltr.get("site", type_site))
+        cltr_tnt = each_cltr.get("tenant", type_tnt)
+        if cltr_tnt != None:
+            tmp_cltr["tenant"] = self.nb.name_none(cltr_tnt, dict(name=cltr_tnt))
         return tmp_cltr
 
     # ENGINE: Runs all the other methods in this class to create dict used to create nbox objects
@@ -690,7 +685,7 @@ class Contacts:
             name=each_role["name"],
             slug=self.nb.make_slug(each_role.get("slug", each_role["name"])),
             description=each_role.get("descr", ""),
-            tags=self.nb.get_or_create_tag(each_role.get("tags")),
+            tags=self.nb.tag_ref(each_role.get("tags")),
         )
 
     # 7b. CNT_GRP: List of contact groups
@@ -700,7 +695,7 @@ class Contacts:
             slug=self.nb.make_slug(each_grp.get("slug", each_grp["name"])),
             description=each_grp.get("descr", ""),
             parent=None,
-            tags=self.nb.get_or_create_tag(each_grp.get("tags")),
+            tags=self.nb.tag_ref(each_grp.get("tags")),
         )
 
     # 7c. CNT: List of contacts
@@ -708,7 +703,7 @@ class Contacts:
         tmp_cnt = dict(
             name=each_cnt["name"],
             group=dict(name=grp),
-            tags=self.nb.get_or_create_tag(each_cnt.get("tags")),
+            tags=self.nb.tag_ref(each_cnt.get("tags")),
         )
         # Optional settings tjhat would break call if set to null
         if each_cnt.get("phone") != None:
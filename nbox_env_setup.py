@@ -1,7 +1,7 @@
 """
 ## Netbox Base - Setup the base netbox environment
 Creates the environment within NetBox ready for adding devices, it does not add the devices themselves.
-This script is not idempotent. Its purpose to add objects rather than edit or delete existing objects.
+This script is not idempotent. Its purpose to add objects rather than edit or delete existing objects (unless run with --update).
 The environment is defined in YAML files (opens all from defined directory) that follows the hierarchical structure of NetBox.
 
 2. ORG_TNT_SITE_RACK: Create all the organisation objects
@@ -10,12 +10,38 @@ The environment is defined in YAML files (opens all from defined directory) that
 5. CRT_PVDR: Create all the Circuit objects
 6. VIRTUAL: Creates all the Cluster objects
 7. CONTACT: Creates all the Contacts and associates them to objects
+The DMs of all sections are built first (tags, RTs and site tenants are references resolved in bulk), their engine calls are
+stages of a registry with stages whose dependencies are done run at the same time (up to workers)
 
 It is advisable to run the validation script against the input file to ensure the formatting of the input file is correct
 python input_validate.py test.yml
 
 When run pass in directory where yaml files are stored. Without flags will try and create all objects or can limit it using flags (-o, -d, -i, -p, -v, -c)
 python nbox_env_setup.py simple_example
+The stages and Netbox lookups can be run concurrently using the workers flag (-w), the limit of API calls in flight
+python nbox_env_setup.py simple_example -w 8
+Objects are bulk created in one call per object type, this can be split into batches by number of objects and/or payload size
+python nbox_env_setup.py simple_example --batch-size 500 --batch-bytes 1000000
+Throttled or failed API calls are retried with backoff (--retries, --backoff) and calls can be rate limited per second (--rate)
+python nbox_env_setup.py simple_example -w 8 --retries 5 --rate 20
+A summary of the API calls made (per endpoint) and time taken by each stage can be printed and/or saved as JSON
+python nbox_env_setup.py simple_example --stats --stats-json stats.json
+The existing objects of each stage can be fetched with one GraphQL query (rather than a REST call per object type)
+python nbox_env_setup.py simple_example --graphql
+Existing objects that differ from the input file are updated (bulk PATCH of the changed fields) with --update
+python nbox_env_setup.py simple_example --update
+Parent objects (tenant, site, location, etc) can be sent as IDs (from the cached objects) so Netbox does not have to look them up
+python nbox_env_setup.py simple_example --ids
+To check objects exist either all objects of an endpoint, those in the input file (multi-value filters, URL length limited) or
+each object (a call per object) are fetched. By default the strategy with the fewest calls is chosen per endpoint (--stats shows it)
+python nbox_env_setup.py simple_example --strategy filter
+The objects of each endpoint can be kept in a local file, later runs then only fetch objects changed since the last run
+python nbox_env_setup.py simple_example --cache nbox_cache.db
+To preview a run (nothing is changed in Netbox) the objects to be created and that already exist are counted per stage
+python nbox_env_setup.py simple_example --plan
+All API calls of a run can be recorded and later replayed without a Netbox (with optional simulated latency) for benchmarking
+python nbox_env_setup.py simple_example --record run.json.gz
+python nbox_env_setup.py simple_example --replay run.json.gz --replay-latency 0.02 --stats
 """
 
 import config
@@ -29,7 +55,9 @@ from rich.console import Console
 from rich.theme import Theme
 import ipdb
 
-from netbox import Nbox
+from netbox import Nbox, Stage
+from transport import Cassette
+from state import StateCache
 from dm import Organisation
 from dm import Devices
 from dm import Ipam
@@ -54,6 +82,58 @@ ssl = False
 # If using Self-signed cert rather than disbaling SSL verification (nb.http_session.verify = False) can specify the CA cert
 # os.environ['REQUESTS_CA_BUNDLE'] = os.path.expanduser('~/Documents/Coding/Netbox/nbox_py_scripts/myCA.pem')
 
+# Netbox endpoints the existing objects are looked up in for each stage (prefetched with GraphQL or loaded by --plan)
+stage_api = dict(
+    ORG=[
+        "tenancy.tenants",
+        "dcim.sites",
+        "dcim.locations",
+        "dcim.racks",
+        "dcim.rack-roles",
+        "extras.tags",
+    ],
+    DVC=[
+        "dcim.device-roles",
+        "dcim.manufacturers",
+        "dcim.platforms",
+        "dcim.device-types",
+        "extras.tags",
+    ],
+    IPAM=[
+        "ipam.rirs",
+        "ipam.aggregates",
+        "ipam.roles",
+        "ipam.vlan-groups",
+        "ipam.vrfs",
+        "ipam.route-targets",
+        "ipam.vlans",
+        "ipam.prefixes",
+        "dcim.sites",
+        "extras.tags",
+    ],
+    CRT=[
+        "circuits.circuit-types",
+        "circuits.providers",
+        "circuits.circuits",
+        "tenancy.tenants",
+        "extras.tags",
+    ],
+    VIRTUAL=[
+        "virtualization.cluster-types",
+        "virtualization.cluster-groups",
+        "virtualization.clusters",
+        "dcim.sites",
+        "extras.tags",
+    ],
+    CONTACT=[
+        "tenancy.contact-roles",
+        "tenancy.contact-groups",
+        "tenancy.contacts",
+        "tenancy.contact-assignments",
+        "extras.tags",
+    ],
+)
+
 
 # ----------------------------------------------------------------------------
 # 1. Gathers input arguments as well as loading and validating the input file
@@ -102,8 +182,102 @@ class Inputs:
             action="store_true",
             help="Create all Netbox Virtualisation objects",
         )
+        args.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of concurrent Netbox API calls (stages and lookups), defaults to 1",
+        )
+        args.add_argument(
+            "--batch-size",
+            type=int,
+            default=0,
+            help="Max number of objects per bulk create call, defaults to 0 (no limit)",
+        )
+        args.add_argument(
+            "--batch-bytes",
+            type=int,
+            default=0,
+            help="Max payload size (bytes) per bulk create call, defaults to 0 (no limit)",
+        )
+        args.add_argument(
+            "--retries",
+            type=int,
+            default=0,
+            help="Number of times a throttled or failed Netbox API call is retried, defaults to 0 (not retried)",
+        )
+        args.add_argument(
+            "--backoff",
+            type=float,
+            default=0.5,
+            help="Base delay (seconds) of the exponential backoff between retries, defaults to 0.5",
+        )
+        args.add_argument(
+            "--rate",
+            type=float,
+            default=0,
+            help="Max Netbox API calls per second, defaults to 0 (no limit)",
+        )
+        args.add_argument(
+            "--stats",
+            action="store_true",
+            help="Print a summary of the Netbox API calls (per endpoint) and time taken by each stage",
+        )
+        args.add_argument(
+            "--stats-json",
+            help="Also save the API call and stage summary as JSON to this file",
+        )
+        args.add_argument(
+            "--graphql",
+            action="store_true",
+            help="Fetch the existing objects of each stage with one Netbox GraphQL query",
+        )
+        args.add_argument(
+            "--plan",
+            action="store_true",
+            help="Dry-run, print the objects that would be created and already exist without changing Netbox",
+        )
+        args.add_argument(
+            "--update",
+            action="store_true",
+            help="Update existing objects whose fields differ from the input file (only changed fields are sent)",
+        )
+        args.add_argument(
+            "--ids",
+            action="store_true",
+            help="Send the IDs of parent objects (tenant, site, location, etc) rather than their name or slug",
+        )
+        args.add_argument(
+            "--strategy",
+            choices=["auto", "prefetch", "filter", "point"],
+            default="auto",
+            help="How objects are fetched to check they exist, all objects (prefetch), those in the input file using "
+            "multi-value filters (filter) or a call per object (point). Defaults to auto, the fewest calls per endpoint",
+        )
+        args.add_argument(
+            "--cache",
+            help="SQLite file the Netbox objects are kept in between runs, only changed objects are then fetched",
+        )
+        # CASSETTE: A run either records or replays the API calls
+        cassette = args.add_mutually_exclusive_group()
+        cassette.add_argument(
+            "--record",
+            help="Record all Netbox API calls (requests and responses) to this cassette file",
+        )
+        cassette.add_argument(
+            "--replay",
+            help="Replay Netbox API calls from this cassette file rather than connecting to Netbox",
+        )
+        args.add_argument(
+            "--replay-latency",
+            type=float,
+            help="Simulated latency (seconds) of each replayed API call (needs --replay), defaults to 0",
+        )
         # parse_known_args allows filename to be entered without needing a flag (arg)
         all_args, directory = args.parse_known_args()
+        if all_args.replay_latency != None and all_args.replay == None:
+            args.error("argument --replay-latency: only used with --replay")
 
         if len(directory) != 0:
             tmp_input_dir = directory[0]
@@ -167,120 +341,322 @@ def main():
     my_vars = arg_vars.input_val(input_dir, args)
     # Initialise Netbox class used to run Netbox API calls
     tag_exists, tag_created, rt_exists, rt_created = ([] for i in range(4))
+    # CASSETTE: Optionally records the API calls or replays them from a previous recording
+    cassette = None
+    if args["replay"] != None:
+        cassette = Cassette(args["replay"], "replay", args["replay_latency"] or 0)
+    elif args["record"] != None:
+        cassette = Cassette(args["record"], "record")
     nbox = Nbox(
-        netbox_url, api_token, ssl, tag_exists, tag_created, rt_exists, rt_created
+        netbox_url,
+        api_token,
+        ssl,
+        tag_exists,
+        tag_created,
+        rt_exists,
+        rt_created,
+        args["workers"],
+        args["batch_size"],
+        args["batch_bytes"],
+        args["retries"],
+        args["backoff"],
+        args["rate"],
+        cassette,
+        args["graphql"],
+        args["plan"],
+        StateCache(args["cache"], netbox_url) if args["cache"] != None else None,
+        args["update"],
+        args["ids"],
+        args["strategy"],
     )
     # Used to run all object creation classes if no flags input
     flag_all = False
-    for flag_bool in args.values():
-        flag_all = flag_all + flag_bool
+    for flag in ["organisation", "device", "ipam", "provider", "contact", "virtual"]:
+        flag_all = flag_all + args[flag]
+    # PLAN: Loads a snapshot of the endpoints of all stages being run in one go
+    if args["plan"] == True:
+        all_section = dict(
+            organisation="ORG",
+            device="DVC",
+            ipam="IPAM",
+            provider="CRT",
+            virtual="VIRTUAL",
+            contact="CONTACT",
+        )
+        nbox.stats.stage("SNAPSHOT")
+        all_api = [
+            y
+            for x, stage in all_section.items()
+            if args[x] == True or flag_all == False
+            for y in stage_api[stage]
+        ]
+        snapshot_calls = nbox.snapshot(*all_api)
+
+    # STAGES: Registry of the engine calls, each run once the stages (objects) it depends on are done
+    all_stage, all_dm = ([], {})
 
     # 2. ORG_TNT_SITE_RACK: Create all the organisation objects
     if args["organisation"] == True or flag_all == False:
+        nbox.stats.stage("ORG")
+        # PREFETCH: If using GraphQL the existing objects of all endpoints used by the stage are fetched in one call
+        nbox.prefetch(*stage_api["ORG"])
         org = Organisation(nbox, my_vars["tenant"], my_vars["rack_role"])
-        org_dict = org.create_tnt_site_rack()
-        # Passed into nbox_call are: Friendly name (for user message), path of api call, filter (to check if object already exists), DM of data
-        nbox.engine("Rack Role", "dcim.rack_roles", "name", org_dict["rack_role"])
-        nbox.engine("Tenant", "tenancy.tenants", "name", org_dict["tnt"])
-        nbox.engine("Site", "dcim.sites", "name", org_dict["site"])
-        nbox.engine("Location (parent)", "dcim.locations", "slug", org_dict["prnt_loc"])
-        nbox.engine("Location (child)", "dcim.locations", "slug", org_dict["chld_loc"])
-        nbox.engine("Rack", "dcim.racks", "name", org_dict["rack"])
+        all_dm["ORG"] = org.create_tnt_site_rack()
+        # Sites tenant used by IPAM and Virtualisation (if site not yet in Netbox) when tenant not explicitly set
+        nbox.add_site_tnt(all_dm["ORG"]["site"])
+        # Passed into Stage are: Section, friendly name (for user message), path of api call, filter (to check if object
+        # already exists), DM of data (key of the section DM) and the stages (friendly names) whose objects it uses
+        all_stage.extend(
+            [
+                Stage("ORG", "Rack Role", "dcim.rack_roles", "name", "rack_role"),
+                Stage("ORG", "Tenant", "tenancy.tenants", "name", "tnt"),
+                Stage("ORG", "Site", "dcim.sites", "name", "site", ["Tenant"]),
+                Stage(
+                    "ORG",
+                    "Location (parent)",
+                    "dcim.locations",
+                    "slug",
+                    "prnt_loc",
+                    ["Site", "Tenant"],
+                ),
+                Stage(
+                    "ORG",
+                    "Location (child)",
+                    "dcim.locations",
+                    "slug",
+                    "chld_loc",
+                    ["Location (parent)"],
+                ),
+                Stage(
+                    "ORG",
+                    "Rack",
+                    "dcim.racks",
+                    "name",
+                    "rack",
+                    ["Location (child)", "Rack Role", "Site"],
+                ),
+            ]
+        )
 
     # 3. DVC_MTFR_TYPE: Create all the objects required to create devices
     if args["device"] == True or flag_all == False:
+        nbox.stats.stage("DVC")
+        nbox.prefetch(*stage_api["DVC"])
         dvc = Devices(
             nbox, my_vars["device_role"], my_vars["manufacturer"], dvc_type_dir
         )
-        dvc_dict = dvc.create_dvc_type_role()
-        # Passed into nbox_call are: Friendly name (for user message), path of api call, filter (to check if object already exists), DM of data
-        nbox.engine("Device-role", "dcim.device_roles", "name", dvc_dict["dev_role"])
-        nbox.engine("Manufacturer", "dcim.manufacturers", "name", dvc_dict["mftr"])
-        nbox.engine("Platform", "dcim.platforms", "name", dvc_dict["pltm"])
-        nbox.engine("Device-type", "dcim.device_types", "model", dvc_dict["dev_type"])
+        all_dm["DVC"] = dvc.create_dvc_type_role()
+        all_stage.extend(
+            [
+                Stage("DVC", "Device-role", "dcim.device_roles", "name", "dev_role"),
+                Stage("DVC", "Manufacturer", "dcim.manufacturers", "name", "mftr"),
+                Stage(
+                    "DVC",
+                    "Platform",
+                    "dcim.platforms",
+                    "name",
+                    "pltm",
+                    ["Manufacturer"],
+                ),
+                Stage(
+                    "DVC",
+                    "Device-type",
+                    "dcim.device_types",
+                    "model",
+                    "dev_type",
+                    ["Manufacturer"],
+                ),
+            ]
+        )
 
     # 4. IPAM_VRF_VLAN: Create all the IPAM objects
     if args["ipam"] == True or flag_all == False:
+        nbox.stats.stage("IPAM")
+        nbox.prefetch(*stage_api["IPAM"])
         ipam = Ipam(nbox, my_vars["rir"], my_vars["role"])
-        ipam_dict = ipam.create_ipam()
-        # print(ipam_dict)
-
-        # Passed into nbox_call are: Friendly name (for user message), path of api call, filter (to check if object already exists), DM of data
-        nbox.engine("RIRs", "ipam.rirs", "name", ipam_dict["rir"])
-        nbox.engine("Aggregates", "ipam.aggregates", "prefix", ipam_dict["aggr"])
-        nbox.engine("Prefix/VLAN Role", "ipam.roles", "name", ipam_dict["role"])
-        nbox.engine("VLAN Group", "ipam.vlan-groups", "name", ipam_dict["vlan_grp"])
-        nbox.engine("VRF", "ipam.vrfs", "name", ipam_dict["vrf"])
-        nbox.print_tag_rt("Route-Targets", set(rt_exists), rt_created)
-        # First check if VL/PFX exist in VL_GRP/VRF, then if exist in ROLE.
-        nbox.engine(
-            "VLAN",
-            ["ipam.vlans", "ipam.vlan_groups"],
-            ["name", "group_id"],
-            ipam_dict["vlan"],
-        )
-        nbox.engine(
-            "Prefix",
-            ["ipam.prefixes", "ipam.vrfs"],
-            ["prefix", "vrf_id"],
-            ipam_dict["prefix"],
+        all_dm["IPAM"] = ipam.create_ipam()
+        all_stage.extend(
+            [
+                Stage("IPAM", "RIRs", "ipam.rirs", "name", "rir"),
+                Stage(
+                    "IPAM",
+                    "Aggregates",
+                    "ipam.aggregates",
+                    "prefix",
+                    "aggr",
+                    ["RIRs", "Tenant"],
+                ),
+                Stage("IPAM", "Prefix/VLAN Role", "ipam.roles", "name", "role"),
+                Stage(
+                    "IPAM",
+                    "VLAN Group",
+                    "ipam.vlan-groups",
+                    "name",
+                    "vlan_grp",
+                    ["Site"],
+                ),
+                Stage(
+                    "IPAM",
+                    "VRF",
+                    "ipam.vrfs",
+                    "name",
+                    "vrf",
+                    ["Route-Targets", "Tenant"],
+                ),
+                # RTs are created with the tenant of their VRF (so after tenants), reported after the VRFs that use them
+                Stage("IPAM", "Route-Targets", None, None, None, ["Tenant"]),
+                # First check if VL/PFX exist in VL_GRP/VRF, then if exist in ROLE.
+                Stage(
+                    "IPAM",
+                    "VLAN",
+                    ["ipam.vlans", "ipam.vlan_groups"],
+                    ["name", "group_id"],
+                    "vlan",
+                    ["VLAN Group", "Prefix/VLAN Role", "Site", "Tenant"],
+                ),
+                Stage(
+                    "IPAM",
+                    "Prefix",
+                    ["ipam.prefixes", "ipam.vrfs"],
+                    ["prefix", "vrf_id"],
+                    "prefix",
+                    ["VRF", "VLAN", "Prefix/VLAN Role", "Site", "Tenant"],
+                ),
+            ]
         )
 
     # 5. CRT_PVDR: Create all the Circuit objects
     if args["provider"] == True or flag_all == False:
+        nbox.stats.stage("CRT")
+        nbox.prefetch(*stage_api["CRT"])
         crt = Circuits(nbox, my_vars["circuit_type"], my_vars["provider"])
-        crt_dict = crt.create_crt_pvdr()
-        # Passed into nbox_call are: Friendly name (for user message), path of api call, filter (to check if object already exists), DM of data
-        nbox.engine(
-            "Circuit Type", "circuits.circuit-types", "name", crt_dict["crt_type"]
+        all_dm["CRT"] = crt.create_crt_pvdr()
+        all_stage.extend(
+            [
+                Stage(
+                    "CRT", "Circuit Type", "circuits.circuit-types", "name", "crt_type"
+                ),
+                Stage("CRT", "Provider", "circuits.providers", "name", "pvdr"),
+                Stage(
+                    "CRT",
+                    "Circuit",
+                    "circuits.circuits",
+                    "cid",
+                    "crt",
+                    ["Circuit Type", "Provider", "Tenant"],
+                ),
+            ]
         )
-        nbox.engine("Provider", "circuits.providers", "name", crt_dict["pvdr"])
-        nbox.engine("Circuit", "circuits.circuits", "cid", crt_dict["crt"])
 
     # 6. VIRTUAL: Creates all the Cluster objects
     if args["virtual"] == True or flag_all == False:
+        nbox.stats.stage("VIRTUAL")
+        nbox.prefetch(*stage_api["VIRTUAL"])
         vrtl = Virtualisation(nbox, my_vars["cluster_group"], my_vars["cluster_type"])
-        vrtl_dict = vrtl.create_vrtl()
-        # Passed into nbox_call are: Friendly name (for user message), path of api call, filter (to check if object already exists), DM of data
-        nbox.engine(
-            "Cluster Type",
-            "virtualization.cluster-types",
-            "name",
-            vrtl_dict["cltr_type"],
-        )
-        nbox.engine(
-            "Cluster Group",
-            "virtualization.cluster-groups",
-            "name",
-            vrtl_dict["cltr_grp"],
-        )
-        nbox.engine("Cluster", "virtualization.clusters", "name", vrtl_dict["cltr"])
+        all_dm["VIRTUAL"] = vrtl.create_vrtl()
+        all_stage.extend(
+            [
+                Stage(
+                    "VIRTUAL",
+                    "Cluster Type",
+                    "virtualization.cluster-types",
+                    "name",
+                    "cltr_type",
+                ),
+                Stage(
+                    "VIRTUAL",
+                    "Cluster Group",
+                    "virtualization.cluster-groups",
+                    "name",
+                    "cltr_grp",
+                ),
+                Stage(
+                    "VIRTUAL",
+                    "Cluster",
+                    "virtualization.clusters",
+                    "name",
+                    "cltr",
+                    ["Cluster Type", "Cluster Group", "Site", "Tenant"],
+                ),
+            ]
+        )
 
     # 7. CONTACTS: Creates all the contacts and assigns to objects
     if args["contact"] == True or flag_all == False:
+        nbox.stats.stage("CONTACT")
+        nbox.prefetch(*stage_api["CONTACT"])
         cnt = Contacts(
             nbox,
             my_vars["contact_role"],
             my_vars["contact_group"],
             my_vars["contact_assign"],
         )
-        cnt_dict = cnt.create_contact()
-        nbox.engine(
-            "Contact Role", "tenancy.contact-roles", "name", cnt_dict["cnt_role"]
-        )
-        nbox.engine(
-            "Contact Group", "tenancy.contact-groups", "name", cnt_dict["cnt_grp"]
-        )
-        nbox.engine("Contacts", "tenancy.contacts", "name", cnt_dict["cnt"])
-        nbox.engine(
-            "Contact Assignment",
-            "tenancy.contact-assignments",
-            "multi-fltr",
-            cnt_dict["cnt_asgn"],
+        all_dm["CONTACT"] = cnt.create_contact()
+        # ASGN_DEPS: Contact assignments wait for the stages creating the objects they are assigned to (by content type)
+        asgn_api = [
+            nbox.asgn_api(x["content_type"]) for x in all_dm["CONTACT"]["cnt_asgn"]
+        ]
+        all_stage.extend(
+            [
+                Stage(
+                    "CONTACT",
+                    "Contact Role",
+                    "tenancy.contact-roles",
+                    "name",
+                    "cnt_role",
+                ),
+                Stage(
+                    "CONTACT",
+                    "Contact Group",
+                    "tenancy.contact-groups",
+                    "name",
+                    "cnt_grp",
+                ),
+                Stage(
+                    "CONTACT",
+                    "Contacts",
+                    "tenancy.contacts",
+                    "name",
+                    "cnt",
+                    ["Contact Group"],
+                ),
+                Stage(
+                    "CONTACT",
+                    "Contact Assignment",
+                    "tenancy.contact-assignments",
+                    "multi-fltr",
+                    "cnt_asgn",
+                    ["Contacts", "Contact Role"] + nbox.stage_deps(all_stage, asgn_api),
+                ),
+            ]
         )
 
+    # RESOLVE: The DMs hold references (names) of tags and site tenants, all new tags (any section) are created in one call
+    nbox.stats.stage("RESOLVE")
+    nbox.resolve_tags(all_dm)
+    nbox.resolve_site_tnt(all_dm)
+    nbox.stats.stage(None)
+
+    # RUN_STAGE: Creates the objects of a DM (or the RTs referenced by the VRFs)
+    def run_stage(each_stage: Stage) -> None:
+        if each_stage.name == "Route-Targets":
+            nbox.resolve_rts(all_dm)
+            if args["plan"] == False:
+                nbox.print_tag_rt("Route-Targets", set(rt_exists), rt_created)
+        else:
+            dm = all_dm[each_stage.section][each_stage.dm]
+            nbox.engine(each_stage.name, each_stage.api_attr, each_stage.obj_fltr, dm)
+
+    nbox.run_stages(all_stage, run_stage)
+
     # 8. Prints any tags that have been created for any of the sections:
-    nbox.print_tag_rt("Tags", set(tag_exists), tag_created)
+    if args["plan"] == False:
+        nbox.print_tag_rt("Tags", set(tag_exists), tag_created)
+    else:
+        nbox.print_plan(snapshot_calls)
+    # 9. STATS: Optionally prints the API call metrics and stage timings
+    if args["stats"] == True or args["stats_json"] != None:
+        nbox.print_stats(args["stats_json"])
 
 
 if __name__ == "__main__":
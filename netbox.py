@@ -1,22 +1,165 @@
 from multiprocessing.connection import Listener
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, NamedTuple
 import pynetbox
 from pynetbox.core.query import RequestError
 import operator
-import ast
+import json
 from rich.console import Console
 from rich.theme import Theme
+from rich.table import Table
 import ipdb
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import io
+import threading
+import requests
 import urllib3
+from urllib.parse import urlencode
+from transport import NboxAdapter, Cassette
+from state import StateCache
 
 urllib3.disable_warnings()
 
+# ----------------------------------------------------------------------------
+# GRAPHQL: GraphQL list query and fields (only those used for matching and IDs) of each endpoint that can be prefetched
+# ----------------------------------------------------------------------------
+NAME_SLUG = "id name slug"
+GQL_FIELDS = {
+    "tenancy.tenants": ("tenant_list", NAME_SLUG),
+    "tenancy.contact-roles": ("contact_role_list", NAME_SLUG),
+    "tenancy.contact-groups": ("contact_group_list", NAME_SLUG),
+    "tenancy.contacts": ("contact_list", "id name"),
+    "tenancy.contact-assignments": (
+        "contact_assignment_list",
+        "id content_type { app_label model } object_id contact { id }",
+    ),
+    "dcim.sites": ("site_list", "id name slug tenant { id name }"),
+    "dcim.locations": ("location_list", NAME_SLUG),
+    "dcim.racks": ("rack_list", "id name"),
+    "dcim.rack-roles": ("rack_role_list", NAME_SLUG),
+    "dcim.device-roles": ("device_role_list", NAME_SLUG),
+    "dcim.manufacturers": ("manufacturer_list", NAME_SLUG),
+    "dcim.platforms": ("platform_list", NAME_SLUG),
+    "dcim.device-types": ("device_type_list", "id model slug"),
+    "ipam.rirs": ("rir_list", NAME_SLUG),
+    "ipam.aggregates": ("aggregate_list", "id prefix"),
+    "ipam.roles": ("role_list", NAME_SLUG),
+    "ipam.vlan-groups": ("vlan_group_list", NAME_SLUG),
+    "ipam.vrfs": ("vrf_list", "id name rd"),
+    "ipam.route-targets": ("route_target_list", "id name"),
+    "ipam.vlans": ("vlan_list", "id name vid group { id name } site { id name }"),
+    "ipam.prefixes": ("prefix_list", "id prefix vrf { id }"),
+    "circuits.circuit-types": ("circuit_type_list", NAME_SLUG),
+    "circuits.providers": ("provider_list", NAME_SLUG),
+    "circuits.circuits": ("circuit_list", "id cid"),
+    "virtualization.cluster-types": ("cluster_type_list", NAME_SLUG),
+    "virtualization.cluster-groups": ("cluster_group_list", NAME_SLUG),
+    "virtualization.clusters": ("cluster_list", "id name"),
+    "extras.tags": ("tag_list", NAME_SLUG),
+}
+
+
+# DEV_TYPE_CMPT: Component of a device_type and the endpoint its templates are created with (in creation order)
+DEV_TYPE_CMPT = dict(
+    interface="interface_templates",
+    power="power_port_templates",
+    console="console_port_templates",
+    rear_port="rear_port_templates",
+    front_port="front_port_templates",
+)
+
+
+# NESTED_API: Fields of each endpoint's payload that reference a parent object ({name: x} or {slug: x}) and the parent endpoint
+NESTED_API = {
+    "dcim.sites": dict(tenant="tenancy.tenants"),
+    "dcim.locations": dict(site="dcim.sites", parent="dcim.locations"),
+    "dcim.racks": dict(
+        site="dcim.sites",
+        location="dcim.locations",
+        tenant="tenancy.tenants",
+        role="dcim.rack_roles",
+    ),
+    "dcim.platforms": dict(manufacturer="dcim.manufacturers"),
+    "dcim.device-types": dict(manufacturer="dcim.manufacturers"),
+    "ipam.aggregates": dict(rir="ipam.rirs"),
+    "ipam.vrfs": dict(tenant="tenancy.tenants"),
+    "ipam.route-targets": dict(tenant="tenancy.tenants"),
+    "ipam.vlans": dict(
+        site="dcim.sites",
+        group="ipam.vlan_groups",
+        role="ipam.roles",
+        tenant="tenancy.tenants",
+    ),
+    "ipam.prefixes": dict(
+        site="dcim.sites", role="ipam.roles", tenant="tenancy.tenants"
+    ),
+    "circuits.circuits": dict(
+        type="circuits.circuit_types",
+        provider="circuits.providers",
+        tenant="tenancy.tenants",
+    ),
+    "virtualization.clusters": dict(
+        type="virtualization.cluster_types",
+        group="virtualization.cluster_groups",
+        site="dcim.sites",
+        tenant="tenancy.tenants",
+    ),
+    "tenancy.contacts": dict(group="tenancy.contact_groups"),
+    "tenancy.contact-assignments": dict(role="tenancy.contact_roles"),
+}
+
+
+# UPDATE_IGNORE: DM keys only used by the script (to check existence or find parent IDs) so never compared or updated
+UPDATE_IGNORE = ("id", "chk_fltr", "multi-fltr", "obj_fltr", "vrf_rd", "vl_grp")
+
+# URL_MAX: Max length of a request URL, Netbox (gunicorn) rejects request lines over 4094 bytes. Multi-value filters are
+# split into chunks so the URL (with room for the limit/offset pagination params) stays under it
+URL_MAX = 4000
+URL_PAGE = 64
+# SINGLE_FLTR: Filters Netbox applies only the last value of (single-value CharFilter), fetched with a call per value
+SINGLE_FLTR = {"tenancy.contact-assignments": ["content_type"]}
+# PAGE_SIZE: Objects per page of a REST listing without a limit (Netbox PAGINATE_COUNT default), MAX_PAGE_SIZE is the
+# most a listing returns per call (Netbox MAX_PAGE_SIZE default)
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+# STRATEGY: How the objects needed to check existence are fetched, in order of preference if the costs are equal.
+# All objects of the endpoint, multi-value filters of one field for all DMs or a GET per DM of its full filter
+STRATEGY = ("prefetch", "filter", "point")
+
+
+# STAGE: An entry of the stage registry (DM build or engine call), only run once the stages it depends on (by name) are done
+class Stage(NamedTuple):
+    section: str
+    name: str
+    api_attr: Any
+    obj_fltr: Any
+    dm: Any
+    deps: List[str] = []
+
+
+# REFS: Placeholders the DM builders use for values that need Netbox, swapped in bulk by the resolve methods before the engine
+# TAG_REF: Tags ({name: colour}) of an object, resolved to tag IDs
+class TagRef(NamedTuple):
+    tags: Dict[str, Any]
+
+
+# RT_REF: Route-targets ({name: descr}) of a VRF and the tenant used if created, resolved to RT IDs
+class RtRef(NamedTuple):
+    rt: Dict[str, Any]
+    tnt: Any
+
+
+# SITE_TNT_REF: Tenant name of a site, if value is set it is used instead (None if the site has no tenant)
+class SiteTntRef(NamedTuple):
+    site: str
+    value: Any = None
+
 
 # ----------------------------------------------------------------------------
 # INZT_LOAD: Opens netbox connection and loads the variable file
 # ----------------------------------------------------------------------------
 class Nbox:
+
     def __init__(
         self,
         netbox_url: str,
@@ -26,15 +169,606 @@ class Nbox:
         tag_created: List,
         rt_exists: List,
         rt_created: List,
+        workers: int = 1,
+        batch_size: int = 0,
+        batch_bytes: int = 0,
+        retries: int = 0,
+        backoff: float = 0.5,
+        rate: float = 0,
+        cassette: Cassette = None,
+        graphql: bool = False,
+        plan: bool = False,
+        state: StateCache = None,
+        update: bool = False,
+        ids: bool = False,
+        strategy: str = "prefetch",
     ):
-        self.nb = pynetbox.api(url=netbox_url, token=token)
+        # WORKERS: Number of concurrent API calls, the session connection pool is sized to match
+        self.workers = workers
+        # LOCAL: Per thread state, the console and section of the stage being run
+        self.local = threading.local()
+        self.all_stage = []
+        # GRAPHQL: Endpoints of each stage are prefetched with one GraphQL query rather than a REST listing each
+        self.graphql = graphql
+        # PLAN: Nothing is written to Netbox, objects to be created are counted and added to the caches with a made up ID
+        self.plan = plan
+        # PLAN_RESULT: Counts per stage and object type ({(stage, output_name): [create, update, exist, api_calls]})
+        self.plan_result = defaultdict(lambda: [0, 0, 0, 0])
+        self.plan_id = 0
+        self.plan_seen = set()
+        # STATE: Optional on-disk cache of the endpoints, only objects changed since the last run are fetched
+        self.state = state
+        # UPDATE: Existing objects that differ from their DM are updated (bulk PATCH of only the changed fields)
+        self.update = update
+        # IDS: Nested parent references of the payloads are replaced with the parent IDs from the caches before sending
+        self.ids = ids
+        # STRATEGY: How objects are fetched to check existence (one of STRATEGY), auto chooses per endpoint the
+        # cheapest based on the number of objects in Netbox. OBJ_STRATEGY is the choice made for each endpoint
+        self.strategy = strategy
+        self.obj_strategy = {}
+        # BATCH: Max objects and JSON payload bytes per bulk create (0 is no limit), failed batches are bisected
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.nb = pynetbox.api(url=netbox_url, token=token, threading=workers > 1)
         self.nb.http_session.verify = ssl
+        # TRANSPORT: Retries (with backoff) failed requests and rate limits requests per second (0 is no limit).
+        # If a cassette is used all requests/responses are recorded to it or replayed from it (offline)
+        pool_size = max(workers, requests.adapters.DEFAULT_POOLSIZE)
+        adapter = NboxAdapter(
+            retries=retries,
+            backoff=backoff,
+            rate=rate,
+            pool_size=pool_size,
+            cassette=cassette,
+            max_inflight=workers,
+        )
+        self.nb.http_session.mount("http://", adapter)
+        self.nb.http_session.mount("https://", adapter)
+        # STATS: Metrics of every API call made through the transport and the timings of each stage
+        self.stats = adapter.stats
         my_theme = {"repr.ipv4": "none", "repr.number": "none", "repr.call": "none"}
-        self.rc = Console(theme=Theme(my_theme))
+        self.theme = Theme(my_theme)
+        self.console = Console(theme=self.theme)
         self.tag_exists = tag_exists
         self.tag_created = tag_created
         self.rt_exists = rt_exists
         self.rt_created = rt_created
+        # OBJ_CACHE: Objects of each endpoint fetched once ({api: [obj_dicts]}) and indexed by filter fields
+        self.obj_cache, self.obj_index = ({} for i in range(2))
+        # OBJ_SCOPE: Endpoints that have only been partly fetched ({api: {(fltr_key, value)}})
+        self.obj_scope = {}
+        # TAG_INDEX: Registry of the ID of every tag ({name: id}), loaded once from Netbox
+        self.tag_index = None
+        # RT_INDEX: Registry of the ID of every route-target ({name: id}), loaded once from Netbox
+        self.rt_index = None
+        # SITE_TNT: Tenant of the sites in the input file ({site: tenant}), used if the site is yet to be created
+        self.site_tnt = {}
+        # ID_CACHE: Resolved parent object IDs ({(api, name, rd): id}), None if does not exist
+        self.id_cache = {}
+        # LOCK: Guards the tag/RT registries (and their lists) and the per-endpoint caches when using workers
+        self.lock = threading.RLock()
+        self.api_lock = defaultdict(threading.RLock)
+
+    # ----------------------------------------------------------------------------
+    # POOL_MAP: Runs a per-object method over all DMs using the worker pool, results and errors kept in input order
+    # ----------------------------------------------------------------------------
+    def pool_map(self, func: Callable, obj_dm: List, error: Any = None) -> List:
+        run_func = self.map_func(func, error)
+        if self.workers > 1 and len(obj_dm) > 1:
+            with ThreadPoolExecutor(
+                max_workers=self.workers,
+                initializer=self.set_local,
+                initargs=(self.get_local(),),
+            ) as pool:
+                all_result = list(pool.map(run_func, obj_dm))
+        else:
+            all_result = [run_func(each_obj_dm) for each_obj_dm in obj_dm]
+        return self.merge_err(all_result, error)
+
+    # MAP_FUNC: Wraps the method so each call gets its own error container (merged afterwards)
+    def map_func(self, func: Callable, error: Any) -> Callable:
+
+        def run_func(each_obj_dm: Any) -> List:
+            if error == None:
+                return [func(each_obj_dm), None]
+            each_err = defaultdict(list) if isinstance(error, dict) else []
+            return [func(each_obj_dm, each_err), each_err]
+
+        return run_func
+
+    # MERGE_ERR: Merges the errors of each object in the order the objects were input
+    def merge_err(self, all_result: List, error: Any) -> List:
+        for result, each_err in all_result:
+            if isinstance(each_err, dict):
+                for err_key, err_value in each_err.items():
+                    error[err_key].extend(err_value)
+            elif each_err != None:
+                error.extend(each_err)
+        return [result for result, each_err in all_result]
+
+    # RC: Console of the stage being run by this thread (buffered by run_stages), otherwise the main console
+    @property
+    def rc(self) -> Console:
+        return getattr(self.local, "rc", None) or self.console
+
+    # GET/SET_LOCAL: The stage console, section and stats stage of a thread, passed on to the worker threads it starts
+    def get_local(self) -> Dict[str, Any]:
+        return dict(
+            rc=getattr(self.local, "rc", None),
+            section=getattr(self.local, "section", None),
+            stage=getattr(self.stats.local, "stage", None),
+        )
+
+    def set_local(self, local: Dict[str, Any]) -> None:
+        self.local.rc = local["rc"]
+        self.local.section = local["section"]
+        self.stats.local.stage = local["stage"]
+
+    # ----------------------------------------------------------------------------
+    # RUN_STAGES: Runs the stages whose dependencies are done at the same time, up to workers at once (stages not in the
+    # registry are treated as done). Each stage prints to its own buffer, printed in registry order so the output is the
+    # same as if run in turn
+    # ----------------------------------------------------------------------------
+    def run_stages(self, all_stage: List[Stage], run_func: Callable) -> None:
+        self.all_stage = all_stage
+        all_name = set(x.name for x in all_stage)
+        running, output, error = {}, {}, None
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                # READY: Starts all stages not yet run whose dependencies are done (none once a stage has failed)
+                for each_stage in all_stage:
+                    started = (
+                        each_stage.name in output or each_stage.name in running.values()
+                    )
+                    deps = [x for x in each_stage.deps if x in all_name]
+                    if len(running) == self.workers:
+                        break
+                    elif (
+                        error == None and not started and all(x in output for x in deps)
+                    ):
+                        running[pool.submit(self.run_stage, each_stage, run_func)] = (
+                            each_stage.name
+                        )
+                if len(running) == 0:
+                    break
+                finished = wait(running, return_when=FIRST_COMPLETED)[0]
+                for each_run in finished:
+                    output[running.pop(each_run)], stage_err = each_run.result()
+                    error = error or stage_err
+                # PRINT: Output of all stages done up to the first one still running (or never run if failed)
+                for each_stage in all_stage:
+                    if each_stage.name not in output:
+                        break
+                    elif output[each_stage.name] != None:
+                        self.console.file.write(output[each_stage.name])
+                        output[each_stage.name] = None
+        # Any stages done after one that failed
+        for each_stage in all_stage:
+            if output.get(each_stage.name) != None:
+                self.console.file.write(output[each_stage.name])
+        self.console.file.flush()
+        if error != None:
+            raise error
+
+    # STAGE_DEPS: Names of the stages that create objects of any of the endpoints (an endpoint can have several stages)
+    def stage_deps(self, all_stage: List[Stage], all_api: List[str]) -> List[str]:
+        all_api = set(self.api_key(x) for x in all_api)
+        deps = []
+        for each_stage in all_stage:
+            api_attr = (
+                each_stage.api_attr[0]
+                if isinstance(each_stage.api_attr, list)
+                else each_stage.api_attr
+            )
+            if api_attr != None and self.api_key(api_attr) in all_api:
+                deps.append(each_stage.name)
+        return deps
+
+    # RUN_STAGE: Runs a stage printing to a buffer (same terminal settings as the main console), returns output and any error
+    def run_stage(self, each_stage: Stage, run_func: Callable) -> List:
+        buffer = io.StringIO()
+        self.local.rc = Console(
+            file=buffer,
+            theme=self.theme,
+            width=self.console.width,
+            force_terminal=self.console.is_terminal,
+            color_system=self.console.color_system,
+        )
+        self.local.section = each_stage.section
+        try:
+            with self.stats.timing(each_stage.name, each_stage.section):
+                run_func(each_stage)
+            return [buffer.getvalue(), None]
+        except BaseException as e:
+            return [buffer.getvalue(), e]
+        finally:
+            self.local.rc, self.local.section = (None, None)
+
+    # API_LOCKS: Lock per endpoint so it is only fetched once even if multiple workers need it at the same time
+    def get_api_lock(self, api: str) -> threading.RLock:
+        with self.lock:
+            return self.api_lock[api]
+
+    # ----------------------------------------------------------------------------
+    # OBJ_CACHE: Fetches all objects of an endpoint once (paginated list call) and caches them as dicts
+    # ----------------------------------------------------------------------------
+    # API_KEY: Endpoints can be referenced with either '_' or '-' (e.g. ipam.vlan_groups, ipam.vlan-groups)
+    def api_key(self, api_attr: str) -> str:
+        return api_attr.replace("_", "-")
+
+    def get_obj_cache(self, api_attr: str) -> List:
+        api = self.api_key(api_attr)
+        with self.get_api_lock(api):
+            if self.obj_cache.get(api) == None:
+                if self.state != None:
+                    self.obj_cache[api] = self.state.sync(
+                        api, operator.attrgetter(api_attr)(self.nb)
+                    )
+                else:
+                    # Sorted by ID as threaded pagination returns pages in any order
+                    all_obj = [
+                        dict(x) for x in operator.attrgetter(api_attr)(self.nb).all()
+                    ]
+                    self.obj_cache[api] = sorted(all_obj, key=lambda x: x.get("id", 0))
+                self.obj_index[api] = {}
+        return self.obj_cache[api]
+
+    # ----------------------------------------------------------------------------
+    # PREFETCH: Fetches all objects (needed fields only) of the endpoints used by a stage in one GraphQL query.
+    # Endpoints already cached are skipped, if the query fails the endpoints are fetched using REST when first used
+    # ----------------------------------------------------------------------------
+    def prefetch(self, *api_attr: str) -> None:
+        all_api = [self.api_key(x) for x in api_attr if self.api_key(x) in GQL_FIELDS]
+        all_api = [x for x in dict.fromkeys(all_api) if self.obj_cache.get(x) == None]
+        # STATE/UPDATE: Full objects are needed to keep the state cache or compare with DMs so endpoints are loaded using REST
+        if (
+            self.graphql == False
+            or self.state != None
+            or self.update
+            or len(all_api) == 0
+        ):
+            return
+        qry = " ".join(
+            f"{api.replace('.', '_').replace('-', '_')}: {GQL_FIELDS[api][0]} {{ {GQL_FIELDS[api][1]} }}"
+            for api in all_api
+        )
+        try:
+            resp = self.nb.http_session.post(
+                self.nb.base_url.rsplit("/api", 1)[0] + "/graphql/",
+                json={"query": "{ " + qry + " }"},
+                headers={
+                    "Authorization": f"Token {self.nb.token}",
+                    "Accept": "application/json",
+                },
+            )
+            data = resp.json().get("data") if resp.ok else None
+        except (requests.exceptions.RequestException, ValueError):
+            data = None
+        if data == None:
+            return
+        for api in all_api:
+            all_obj = data.get(api.replace(".", "_").replace("-", "_"))
+            if all_obj == None:
+                continue
+            with self.get_api_lock(api):
+                if self.obj_cache.get(api) == None:
+                    all_obj = [self.gql_obj(x) for x in all_obj]
+                    self.obj_cache[api] = sorted(all_obj, key=lambda x: x.get("id", 0))
+                    self.obj_index[api] = {}
+
+    # GQL_OBJ: Converts a GraphQL object into the REST format (IDs are integers, content types are 'app.model')
+    def gql_obj(self, obj: Any) -> Any:
+        if isinstance(obj, dict):
+            if set(obj.keys()) == {"app_label", "model"}:
+                return f"{obj['app_label']}.{obj['model']}"
+            obj = {x: self.gql_obj(y) for x, y in obj.items()}
+            if isinstance(obj.get("id"), str) and obj["id"].isdigit():
+                obj["id"] = int(obj["id"])
+        return obj
+
+    # OBJ_SCOPE: Fetches only the objects of an endpoint matching the scope ({fltr_key: [values]}), e.g. assignments of
+    # certain content types. Values already fetched are skipped, lookups against a partly fetched endpoint fetch any
+    # values not yet in scope. The values are sent as multi-value filters in chunks (concurrently if using workers)
+    def load_obj_scope(self, api_attr: str, scope: Dict[str, List]) -> None:
+        api = self.api_key(api_attr)
+        # STATE: Only the changes of the whole endpoint are fetched so nothing is gained from a partial fetch
+        if self.state != None:
+            self.get_obj_cache(api_attr)
+            return
+        endpoint = operator.attrgetter(api_attr)(self.nb)
+        with self.get_api_lock(api):
+            if self.obj_cache.get(api) != None and api not in self.obj_scope:
+                return
+            self.obj_cache.setdefault(api, [])
+            self.obj_index.setdefault(api, {})
+            loaded = self.obj_scope.setdefault(api, set())
+            all_id = set(x.get("id") for x in self.obj_cache[api])
+            for fltr_key, values in scope.items():
+                values = [self.fltr_value(x) for x in values]
+                values = [
+                    x
+                    for x in dict.fromkeys(values)
+                    if x != None and (fltr_key, x) not in loaded
+                ]
+                if len(values) == 0:
+                    continue
+                all_chunk = self.pool_map(
+                    lambda chunk: [
+                        dict(x)
+                        for x in endpoint.filter(
+                            **{fltr_key: chunk}, limit=MAX_PAGE_SIZE
+                        )
+                    ],
+                    self.scope_chunk(api_attr, fltr_key, values),
+                )
+                for obj in [x for chunk in all_chunk for x in chunk]:
+                    if obj.get("id") not in all_id:
+                        self.obj_cache[api].append(obj)
+                        all_id.add(obj.get("id"))
+                loaded.update((fltr_key, x) for x in values)
+                self.obj_index[api] = {}
+
+    # FLTR_CHUNK: Splits the values of a multi-value filter (?name=a&name=b) so the URL of each chunk stays under URL_MAX
+    def fltr_chunk(self, url: str, fltr_key: str, values: List) -> List[List]:
+        all_chunk, chunk, chunk_len = [], [], 0
+        max_len = URL_MAX - len(url) - URL_PAGE
+        for value in values:
+            value_len = len(urlencode({fltr_key: value})) + 1
+            if len(chunk) != 0 and chunk_len + value_len > max_len:
+                all_chunk.append(chunk)
+                chunk, chunk_len = [], 0
+            chunk.append(value)
+            chunk_len += value_len
+        if len(chunk) != 0:
+            all_chunk.append(chunk)
+        return all_chunk
+
+    # SCOPE_CHUNK: Chunks of the values of a scope filter, a chunk per value if Netbox only applies one value of the filter
+    def scope_chunk(self, api_attr: str, fltr_key: str, values: List) -> List[List]:
+        if fltr_key in SINGLE_FLTR.get(self.api_key(api_attr), []):
+            return [[x] for x in values]
+        endpoint = operator.attrgetter(api_attr)(self.nb)
+        return self.fltr_chunk(endpoint.url, fltr_key, values)
+
+    # SCOPE_FLTR: Field and value a lookup is fetched by if the endpoint is partly fetched (the first with a value that
+    # Netbox can filter on), objects matching the lookup are always within those matching this single field
+    def scope_fltr(self, fltr: Dict[str, Any]) -> Any:
+        for fltr_key, value in fltr.items():
+            if "__" not in fltr_key and self.fltr_value(value) != None:
+                return (fltr_key, self.fltr_value(value))
+        return None
+
+    # SCOPE_LOOKUP: Before a lookup against a partly fetched endpoint fetches the objects of the lookup if not in scope,
+    # if it has no field to filter by the whole endpoint is fetched
+    def scope_lookup(self, api_attr: str, fltr: Dict[str, Any]) -> None:
+        api = self.api_key(api_attr)
+        loaded = self.obj_scope.get(api)
+        if loaded == None or any(
+            (x, self.fltr_value(y)) in loaded for x, y in fltr.items()
+        ):
+            return
+        elif self.point_key(fltr) in loaded:
+            return
+        scope_fltr = self.scope_fltr(fltr)
+        if scope_fltr != None:
+            self.load_obj_scope(api_attr, {scope_fltr[0]: [scope_fltr[1]]})
+        else:
+            self.load_obj_all(api_attr)
+
+    # LOAD_OBJ_ALL: Fetches all objects of an endpoint, replacing the cache if it was only partly fetched
+    def load_obj_all(self, api_attr: str) -> None:
+        api = self.api_key(api_attr)
+        with self.get_api_lock(api):
+            if self.obj_scope.pop(api, None) != None:
+                self.obj_cache[api] = None
+            self.get_obj_cache(api_attr)
+
+    # ----------------------------------------------------------------------------
+    # LOAD_OBJ_CHECK: Fetches the objects needed to check the DMs exist using the strategy of the endpoint
+    # ----------------------------------------------------------------------------
+    def load_obj_check(self, api_attr: str, obj_fltr: str, obj_dm: List) -> None:
+        scope = self.check_scope(obj_fltr, obj_dm)
+        # SCOPE: Nothing to fetch if the objects are already within scope (e.g. assignments of the content types)
+        loaded = self.obj_scope.get(self.api_key(api_attr))
+        if loaded != None and all(
+            (x, y) in loaded for x, values in scope.items() for y in values
+        ):
+            return
+        strategy = self.get_strategy(api_attr, obj_fltr, obj_dm)
+        if strategy == "prefetch":
+            self.load_obj_all(api_attr)
+        elif strategy == "filter":
+            self.load_obj_scope(api_attr, scope)
+        elif strategy == "point":
+            self.load_obj_point(
+                api_attr, [self.exist_fltr(obj_fltr, x) for x in obj_dm]
+            )
+
+    # GET_STRATEGY: Strategy of the endpoint, in auto chosen the first time the endpoint is checked (kept for the run).
+    # Not needed if all its objects are already cached or kept in the state cache (only changes are fetched)
+    def get_strategy(self, api_attr: str, obj_fltr: str, obj_dm: List) -> Any:
+        api = self.api_key(api_attr)
+        if self.strategy != "auto":
+            return self.strategy
+        with self.get_api_lock(api):
+            if self.state != None or (
+                self.obj_cache.get(api) != None and api not in self.obj_scope
+            ):
+                return None
+            elif api not in self.obj_strategy:
+                self.obj_strategy[api] = self.choose_strategy(
+                    api_attr, obj_fltr, obj_dm
+                )
+        return self.obj_strategy[api]
+
+    # CHOOSE_STRATEGY: Picks the strategy with the fewest estimated API calls. The first page of the endpoint gives the
+    # number of objects and is kept as part of the prefetch (so small endpoints cost no extra call)
+    def choose_strategy(self, api_attr: str, obj_fltr: str, obj_dm: List) -> str:
+        api = self.api_key(api_attr)
+        endpoint = operator.attrgetter(api_attr)(self.nb)
+        resp = self.nb.http_session.get(
+            endpoint.url + "/",
+            params=dict(limit=PAGE_SIZE),
+            headers={
+                "Authorization": f"Token {self.nb.token}",
+                "Accept": "application/json",
+            },
+        )
+        if not resp.ok:
+            raise RequestError(resp)
+        page = resp.json()
+        all_offset = list(range(len(page["results"]), page["count"], MAX_PAGE_SIZE))
+        cost = dict(prefetch=len(all_offset) if page["next"] != None else 0)
+        if page["next"] != None:
+            cost.update(self.fetch_cost(api_attr, obj_fltr, obj_dm, cost["prefetch"]))
+        strategy = min(
+            STRATEGY, key=lambda x: (cost.get(x, float("inf")), STRATEGY.index(x))
+        )
+        self.stats.add_strategy(api, strategy, page["count"], len(obj_dm), cost)
+        # PREFETCH: The rest of the objects are fetched in pages (concurrently if using workers). Netbox may cap the page
+        # size below MAX_PAGE_SIZE so the size of the next page returned sets the offsets of the others
+        if strategy == "prefetch":
+            all_obj = list(page["results"])
+            if page["next"] != None:
+
+                def get_page(offset: int) -> List:
+                    return [
+                        dict(x)
+                        for x in endpoint.filter(limit=MAX_PAGE_SIZE, offset=offset)
+                    ]
+
+                all_obj.extend(get_page(len(all_obj)))
+                page_size = max(1, len(all_obj) - len(page["results"]))
+                all_page = self.pool_map(
+                    get_page, list(range(len(all_obj), page["count"], page_size))
+                )
+                all_obj.extend([x for each_page in all_page for x in each_page])
+            all_obj = {x.get("id"): x for x in all_obj}
+            self.obj_scope.pop(api, None)
+            self.obj_cache[api] = sorted(all_obj.values(), key=lambda x: x.get("id", 0))
+            self.obj_index[api] = {}
+            # COUNT: If objects were added or deleted while paging all objects are fetched again
+            if len(all_obj) != page["count"]:
+                self.obj_cache[api] = None
+                self.get_obj_cache(api_attr)
+        return strategy
+
+    # FETCH_COST: Estimated API calls of the filter and point strategies. Filters of multi-field checks (e.g. VLAN name
+    # and group) can match many objects per value, a count of the first chunk gives the average matched per value.
+    # The count is not needed if even at one object per value the filters cost no less than the prefetch
+    def fetch_cost(
+        self, api_attr: str, obj_fltr: str, obj_dm: List, prefetch_cost: int
+    ) -> Dict[str, int]:
+        endpoint = operator.attrgetter(api_attr)(self.nb)
+        all_key = set(self.point_key(self.exist_fltr(obj_fltr, x)) for x in obj_dm)
+        cost = dict(filter=0, point=len([x for x in all_key if len(x) != 0]))
+        for fltr_key, values in self.check_scope(obj_fltr, obj_dm).items():
+            all_chunk = self.scope_chunk(
+                api_attr, fltr_key, list(dict.fromkeys(values))
+            )
+            per_value = 1
+            if (
+                obj_fltr == "multi-fltr"
+                and cost["filter"] + len(all_chunk) + 1 < prefetch_cost
+            ):
+                per_value = endpoint.count(**{fltr_key: all_chunk[0]}) / len(
+                    all_chunk[0]
+                )
+                cost["filter"] += 1
+            cost["filter"] += sum(
+                max(1, -(-int(len(x) * per_value) // MAX_PAGE_SIZE)) for x in all_chunk
+            )
+        return cost
+
+    # OBJ_POINT: Fetches the objects of each filter with its own call (concurrently if using workers), lookups with the
+    # same filter are then within scope
+    def load_obj_point(self, api_attr: str, all_fltr: List) -> None:
+        api = self.api_key(api_attr)
+        endpoint = operator.attrgetter(api_attr)(self.nb)
+        with self.get_api_lock(api):
+            if self.obj_cache.get(api) != None and api not in self.obj_scope:
+                return
+            self.obj_cache.setdefault(api, [])
+            self.obj_index.setdefault(api, {})
+            loaded = self.obj_scope.setdefault(api, set())
+            all_id = set(x.get("id") for x in self.obj_cache[api])
+            all_key = [self.point_key(x) for x in all_fltr]
+            all_key = [
+                x for x in dict.fromkeys(all_key) if len(x) != 0 and x not in loaded
+            ]
+            all_obj = self.pool_map(
+                lambda key: [dict(x) for x in endpoint.filter(**dict(key))], all_key
+            )
+            for obj in [x for each_obj in all_obj for x in each_obj]:
+                if obj.get("id") not in all_id:
+                    self.obj_cache[api].append(obj)
+                    all_id.add(obj.get("id"))
+            loaded.update(all_key)
+            self.obj_index[api] = {}
+
+    # POINT_KEY: Filter of a point lookup, fields Netbox can filter on with a value (null fields are matched from the cache)
+    def point_key(self, fltr: Dict[str, Any]) -> tuple:
+        return tuple(
+            sorted(
+                (x, self.fltr_value(y))
+                for x, y in fltr.items()
+                if "__" not in x and self.fltr_value(y) != None
+            )
+        )
+
+    # ADD_OBJ_CACHE: Adds newly created or updated objects to the cache of an endpoint (only if it has already been fetched)
+    def add_obj_cache(self, api_attr: str, result: List) -> None:
+        api = self.api_key(api_attr)
+        with self.get_api_lock(api):
+            if self.obj_cache.get(api) != None:
+                # Updated objects replace the cached version
+                all_id = set(x["id"] for x in [dict(y) for y in result])
+                self.obj_cache[api] = [
+                    x for x in self.obj_cache[api] if x.get("id") not in all_id
+                ]
+                self.obj_cache[api].extend([dict(x) for x in result])
+                self.obj_index[api] = {}
+                # Planned objects (made up IDs) are never kept
+                if self.state != None and self.plan == False:
+                    self.state.save(api, [dict(x) for x in result], sync=False)
+        # Any cached ID (or not found) for the endpoint may now be out of date
+        if len(result) != 0:
+            with self.lock:
+                for key in [x for x in self.id_cache if x[0] == api]:
+                    del self.id_cache[key]
+
+    # FLTR_VALUE: Normalises filter and object values so they can be compared (nested objects by ID, null as None)
+    def fltr_value(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            value = value.get("id")
+        if value == None or value == "null":
+            return None
+        return str(value)
+
+    # OBJ_VALUE: Gets the value of an object for a filter field, 'xx_id' filters match the ID of nested object 'xx'
+    # and 'xx__yy' filters match field 'yy' of nested object 'xx' (e.g. group__name)
+    def obj_value(self, obj: Dict[str, Any], fltr_key: str) -> Any:
+        if "__" in fltr_key:
+            nested, fltr_key = fltr_key.split("__", 1)
+            return self.obj_value(obj.get(nested) or {}, fltr_key)
+        if fltr_key not in obj and fltr_key.endswith("_id"):
+            fltr_key = fltr_key[:-3]
+        return self.fltr_value(obj.get(fltr_key))
+
+    # OBJ_LOOKUP: Returns all cached objects matching the filter, index built per set of filter fields
+    def obj_lookup(self, api_attr: str, fltr: Dict[str, Any]) -> List:
+        api = self.api_key(api_attr)
+        fltr_keys = tuple(sorted(fltr.keys()))
+        self.scope_lookup(api_attr, fltr)
+        with self.get_api_lock(api):
+            all_obj = self.get_obj_cache(api_attr)
+            index = self.obj_index[api].get(fltr_keys)
+            if index == None:
+                index = defaultdict(list)
+                for obj in all_obj:
+                    index[tuple(self.obj_value(obj, x) for x in fltr_keys)].append(obj)
+                self.obj_index[api][fltr_keys] = index
+        return index.get(tuple(self.fltr_value(fltr[x]) for x in fltr_keys), [])
 
     # ----------------------------------------------------------------------------
     # OBJ_CHECK: API call to check if objects already exists in Netbox (e.g. Tenants, tenancy.tenants, tnt, name)
@@ -42,49 +776,154 @@ class Nbox:
     def obj_check(
         self, api_attr: str, obj_fltr: str, obj_dm: Dict[str, Any]
     ) -> Dict[str, Dict]:
-        # Creates 2 lists of DMs based on whether the object already exists or not
-        obj_notexist_dm, obj_exist_name = ([] for i in range(2))
+        self.load_obj_check(api_attr, obj_fltr, obj_dm)
+        all_exist = self.pool_map(
+            lambda each_obj_dm: self.obj_exist(api_attr, obj_fltr, each_obj_dm), obj_dm
+        )
+        return self.exist_split(obj_dm, all_exist)
+
+    # CHECK_SCOPE: Scope of the objects that need fetching to check the DMs exist (the value each DM is fetched by)
+    def check_scope(self, obj_fltr: str, obj_dm: List) -> Dict[str, List]:
+        scope = defaultdict(list)
         for each_obj_dm in obj_dm:
-            # For checking complex filter (filter based on more than 1 item)
-            if obj_fltr == "multi-fltr":
-                fltr = each_obj_dm["chk_fltr"]
-            # For checking all other contacts
-            else:
-                fltr = {obj_fltr: each_obj_dm[obj_fltr]}
-            # GET: Majority of API calls will produce one result (as most objects unique) so can use the get method
+            scope_fltr = self.scope_fltr(self.exist_fltr(obj_fltr, each_obj_dm))
+            if scope_fltr != None:
+                scope[scope_fltr[0]].append(scope_fltr[1])
+        return scope
+
+    # EXIST_SPLIT: Creates 2 lists of DMs based on whether the object already exists or not
+    def exist_split(self, obj_dm: List, all_exist: List) -> Dict[str, List]:
+        obj_notexist_dm, obj_exist_name = ([] for i in range(2))
+        for each_obj_dm, exist in zip(obj_dm, all_exist):
+            if exist == False:
+                obj_notexist_dm.append(each_obj_dm)
+            elif exist != None:
+                obj_exist_name.append(exist)
+        return dict(notexist_dm=obj_notexist_dm, exist_name=obj_exist_name)
+
+    # OBJ_EXIST: Checks a single object, returns False if not exist, name (for stdout) if exists or None if ignored
+    def obj_exist(
+        self, api_attr: str, obj_fltr: str, each_obj_dm: Dict[str, Any]
+    ) -> Any:
+        fltr = self.exist_fltr(obj_fltr, each_obj_dm)
+        # GBL_VRF: If in Netbox global VRF ignore (name null)
+        if api_attr == "ipam.vrfs" and each_obj_dm["name"] == None:
+            return None
+        # If not exist (lookup against cached endpoint) DM for object is added to list to be created
+        elif len(self.obj_lookup(api_attr, fltr)) == 0:
+            return False
+        # If object exists various methods used to add name to list for stdout
+        elif obj_fltr == "slug":
+            return each_obj_dm["name"] + f" ({each_obj_dm[obj_fltr]})"
+        else:
             try:
-                # GBL_VRF: If in Netbox global VRF ignore (name null)
-                if api_attr == "ipam.vrfs" and each_obj_dm["name"] == None:
-                    pass
-                # If not exist add DM for object to list to be created
-                elif operator.attrgetter(api_attr)(self.nb).get(**fltr) == None:
-                    obj_notexist_dm.append(each_obj_dm)
-                # If object exists various methods used to add name to list for stdout
-                else:
-                    if obj_fltr == "slug":
-                        obj_exist_name.append(
-                            each_obj_dm["name"] + f" ({each_obj_dm[obj_fltr]})"
-                        )
-                    else:
-                        try:
-                            obj_exist_name.append(each_obj_dm[obj_fltr])
-                        except:
-                            obj_exist_name.append(
-                                each_obj_dm.get(each_obj_dm["obj_fltr"], "")
-                            )
-            # FLTR: For odd excpetion where objects not unique uses the filter method
+                return each_obj_dm[obj_fltr]
             except:
-                obj_result = list(operator.attrgetter(api_attr)(self.nb).filter(**fltr))
-                for each_rslt in obj_result:
-                    # GBL_VRF_PFX: To differentiate between prefixes in null and in VRFs
-                    if api_attr == "ipam.prefixes":
-                        # breakpoint()
-                        if each_rslt["vrf"] == fltr.get("vrf_id", fltr.get("vrf")):
-                            obj_exist_name.append(each_obj_dm[obj_fltr])
-                        elif each_rslt["vrf"]["id"] == fltr.get("vrf_id", fltr.get("vrf")):
-                            obj_exist_name.append(each_obj_dm[obj_fltr])
+                return each_obj_dm.get(each_obj_dm["obj_fltr"], "")
 
-        return dict(notexist_dm=obj_notexist_dm, exist_name=obj_exist_name)
+    # EXIST_FLTR: Filter used to find the existing object of a DM
+    def exist_fltr(self, obj_fltr: str, each_obj_dm: Dict[str, Any]) -> Dict[str, Any]:
+        # For checking complex filter (filter based on more than 1 item)
+        if obj_fltr == "multi-fltr":
+            return each_obj_dm["chk_fltr"]
+        # For checking all other contacts
+        else:
+            return {obj_fltr: each_obj_dm[obj_fltr]}
+
+    # ----------------------------------------------------------------------------
+    # OBJ_UPDATE: Bulk updates (PATCH) the changed fields of existing objects that differ from their DM.
+    # Returns the names of the existing objects that were not changed (for the already exist message)
+    # ----------------------------------------------------------------------------
+    def obj_update(
+        self,
+        output_name: str,
+        api_attr: str,
+        obj_fltr: str,
+        obj_dm: List,
+        obj_exist_name: List,
+    ) -> List:
+        all_diff = self.pool_map(
+            lambda x: self.get_obj_diff(api_attr, obj_fltr, x), obj_dm
+        )
+        # EXIST: One per existing DM in DM order (as obj_exist_name), names can repeat (e.g. VLANs in different groups)
+        all_exist = [x for x in all_diff if x != None]
+        obj_patch = [patch for name, patch in all_exist if patch != None]
+        if len(obj_patch) == 0:
+            return obj_exist_name
+        if self.plan:
+            self.plan_add(
+                output_name, 0, 0, len(self.obj_batch(obj_patch)), len(obj_patch)
+            )
+        else:
+            all_result = []
+            for each_batch in self.obj_batch(obj_patch):
+                all_result.extend(
+                    self.batch_create(output_name, api_attr, each_batch, "update")
+                )
+            self.add_obj_cache(api_attr, all_result)
+            if len(all_result) != 0:
+                self.rc.print(
+                    f":arrows_counterclockwise: {output_name}: '{', '.join(self.obj_name(x) for x in all_result)}' successfully updated"
+                )
+        return [
+            x for x, (name, patch) in zip(obj_exist_name, all_exist) if patch == None
+        ]
+
+    # GET_OBJ_DIFF: If the object exists returns its exist name and PATCH ({id, changed fields} or None if the same)
+    def get_obj_diff(
+        self, api_attr: str, obj_fltr: str, each_obj_dm: Dict[str, Any]
+    ) -> Any:
+        name = self.obj_exist(api_attr, obj_fltr, each_obj_dm)
+        if name == None or name == False:
+            return None
+        nbox_obj = self.obj_lookup(api_attr, self.exist_fltr(obj_fltr, each_obj_dm))[0]
+        # PFX_VLAN: Prefix DMs only get the VLAN ID when created, if the VLAN does not exist it is not compared
+        if api_attr == "ipam.prefixes":
+            each_obj_dm = self.get_vl_pfx_id(dict(each_obj_dm), defaultdict(list)) or {
+                x: y for x, y in each_obj_dm.items() if x != "vlan"
+            }
+        diff = self.obj_diff(each_obj_dm, nbox_obj)
+        if len(diff) == 0:
+            return name, None
+        return name, dict(diff, id=nbox_obj["id"])
+
+    # OBJ_DIFF: DM fields that differ from the existing object. Unset (None) DM fields and keys that are not a field of
+    # the object (helper keys and device_type components) are ignored
+    def obj_diff(
+        self, each_obj_dm: Dict[str, Any], nbox_obj: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        return {
+            x: y
+            for x, y in each_obj_dm.items()
+            if x in nbox_obj
+            and x not in UPDATE_IGNORE
+            and y != None
+            and not self.same_value(y, nbox_obj[x])
+        }
+
+    # SAME_VALUE: Compares a DM value with an object value. DM nested objects are an ID or dict of attributes, lists
+    # are IDs (e.g. tags) and choices (e.g. status) are the value
+    def same_value(self, dm_value: Any, nbox_value: Any) -> bool:
+        if (
+            isinstance(nbox_value, dict)
+            and "value" in nbox_value
+            and "label" in nbox_value
+        ):
+            nbox_value = nbox_value["value"]
+        if isinstance(dm_value, dict):
+            return isinstance(nbox_value, dict) and all(
+                self.same_value(y, nbox_value.get(x)) for x, y in dm_value.items()
+            )
+        elif isinstance(dm_value, list):
+            return isinstance(nbox_value, list) and sorted(
+                str(self.fltr_value(x)) for x in dm_value
+            ) == sorted(str(self.fltr_value(x)) for x in nbox_value)
+        dm_value, nbox_value = self.fltr_value(dm_value), self.fltr_value(nbox_value)
+        # Numbers may be returned as decimals (e.g. u_height 1.0)
+        try:
+            return float(dm_value) == float(nbox_value)
+        except (TypeError, ValueError):
+            return dm_value == nbox_value
 
     # ----------------------------------------------------------------------------
     # OBJ_CREATE: If not already present adds the object. If for any reason fails returns error message
@@ -96,24 +935,101 @@ class Nbox:
         obj_notexist_dm: List,
         obj_exist_name: List,
     ) -> None:
+        if self.plan:
+            calls = len(self.obj_batch(obj_notexist_dm))
+            return self.plan_obj(
+                output_name, api_attr, obj_notexist_dm, obj_exist_name, calls
+            )
         all_result = []
-        if len(obj_notexist_dm) != 0:
-            try:
-                result = operator.attrgetter(api_attr)(self.nb).create(obj_notexist_dm)
-            except RequestError as e:
-                # ERR: Message is a string but has the format of list of dicts, literal_eval converts back into a list
-                err_msg = ast.literal_eval(e.error)
-                for err in err_msg:
-                    if len(err) != 0:  # safe guards against empty dicts
-                        self.rc.print(
-                            f":x: {output_name} '{list(err.keys())[0]}' - {', '.join(list(err.values())[0])}"
-                        )
-        # If result variable exists means an object was created
-        if "result" in locals():
-            all_result = result
+        # BATCH: Objects are created in chunks (by number and payload size), created objects added to the endpoint cache
+        for each_batch in self.obj_batch(obj_notexist_dm):
+            all_result.extend(self.batch_create(output_name, api_attr, each_batch))
+        self.add_obj_cache(api_attr, all_result)
         # PRINT: Prints object already exists or create message
         self.result_msg(output_name, obj_exist_name, all_result)
 
+    # OBJ_BATCH: Splits the DMs into batches of at most batch_size objects and batch_bytes of JSON payload (0 is no limit)
+    def obj_batch(self, obj_dm: List) -> List:
+        all_batch, batch, batch_bytes = [], [], 0
+        for each_obj_dm in obj_dm:
+            obj_bytes = len(json.dumps(each_obj_dm, default=str))
+            if len(batch) != 0 and (
+                (self.batch_size != 0 and len(batch) >= self.batch_size)
+                or (
+                    self.batch_bytes != 0 and batch_bytes + obj_bytes > self.batch_bytes
+                )
+            ):
+                all_batch.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(each_obj_dm)
+            batch_bytes += obj_bytes
+        if len(batch) != 0:
+            all_batch.append(batch)
+        return all_batch
+
+    # BATCH_CREATE: Bulk creates (or updates) a batch, if rejected reports the failed objects and retries the rest (bisects if unknown)
+    def batch_create(
+        self, output_name: str, api_attr: str, obj_dm: List, method: str = "create"
+    ) -> List:
+        if self.ids:
+            obj_dm = [self.nested_ids(api_attr, x) for x in obj_dm]
+        try:
+            return list(getattr(operator.attrgetter(api_attr)(self.nb), method)(obj_dm))
+        except RequestError as e:
+            err_msg = self.req_err(e)
+        # OBJ_ERR: Netbox returns an error per object (empty dict if valid) so only the valid ones are retried
+        if len(err_msg) == len(obj_dm) and any(len(err) == 0 for err in err_msg):
+            self.err_msg(output_name, err_msg)
+            obj_dm = [x for x, err in zip(obj_dm, err_msg) if len(err) == 0]
+            return self.batch_create(output_name, api_attr, obj_dm, method)
+        elif len(obj_dm) == 1 or len(err_msg) == len(obj_dm):
+            self.err_msg(output_name, err_msg)
+            return []
+        # BISECT: Batch level error (not per object) so halves the batch until the bad objects are found
+        half = len(obj_dm) // 2
+        return self.batch_create(output_name, api_attr, obj_dm[:half], method) + (
+            self.batch_create(output_name, api_attr, obj_dm[half:], method)
+        )
+
+    # NESTED_IDS: Swaps the nested parent references of a payload for the parent ID (Netbox then needs no query per reference),
+    # parents created earlier in the run are in the caches. Left as is unless exactly one match so Netbox reports any error
+    def nested_ids(self, api_attr: str, obj_dm: Dict[str, Any]) -> Dict[str, Any]:
+        obj_dm = dict(obj_dm)
+        for key, parent_api in NESTED_API.get(self.api_key(api_attr), {}).items():
+            value = obj_dm.get(key)
+            if (
+                isinstance(value, dict)
+                and len(value) == 1
+                and None not in value.values()
+            ):
+                all_obj = self.obj_lookup(parent_api, value)
+                if len(all_obj) == 1:
+                    obj_dm[key] = all_obj[0]["id"]
+        return obj_dm
+
+    # REQ_ERR: Error is a JSON string of a dict (single) or list of dicts (bulk), always returned as a list of dicts
+    def req_err(self, e: RequestError) -> List:
+        try:
+            err_msg = json.loads(e.error)
+        except ValueError:
+            err_msg = {"error": [e.error]}
+        if isinstance(err_msg, list):
+            return err_msg
+        elif isinstance(err_msg, dict):
+            return [err_msg]
+        return [{"error": [str(err_msg)]}]
+
+    # ERR_MSG: Prints the error of each object that failed to be created
+    def err_msg(self, output_name: str, err_msg: List) -> None:
+        for err in err_msg:
+            if len(err) != 0:  # safe guards against empty dicts
+                err_value = list(err.values())[0]
+                if isinstance(err_value, list):
+                    err_value = ", ".join(str(x) for x in err_value)
+                self.rc.print(
+                    f":x: {output_name} '{list(err.keys())[0]}' - {err_value}"
+                )
+
     # ----------------------------------------------------------------------------
     # RESULT_MSG: Reports if device was created or already existed
     # ----------------------------------------------------------------------------
@@ -126,9 +1042,15 @@ class Nbox:
         # NEW: Message returned if try/except created a new object
         if len(result) != 0:
             self.rc.print(
-                f":white_check_mark: {output_name}: '{str(result).replace('[', '').replace(']', '')}' successfully created"
+                f":white_check_mark: {output_name}: '{', '.join(self.obj_name(x) for x in result).replace('[', '').replace(']', '')}' successfully created"
             )
 
+    # OBJ_NAME: Name of a created object as pynetbox prints it, read from the create response (str() of a record
+    # without a name, such as a prefix or assignment, would make a GET for the full details of every object)
+    def obj_name(self, obj: Any) -> str:
+        obj = vars(obj) if isinstance(obj, pynetbox.core.response.Record) else obj
+        return str(obj.get("name") or obj.get("label") or obj.get("display") or "")
+
     # ----------------------------------------------------------------------------
     # MERGE_DICT: Merges dictionaires for dev_type component error messages
     # ----------------------------------------------------------------------------
@@ -150,36 +1072,34 @@ class Nbox:
     # ----------------------------------------------------------------------------
     # DEV_TYPE_COMP_CREATE: Adds components of the device_type (intf, power, etc)
     # ----------------------------------------------------------------------------
-    def dev_type_comp_create(self, each_type: Dict[str, Any], output_name: str) -> List:
-        component = dict(
-            interface="interface_templates",
-            power="power_port_templates",
-            console="console_port_templates",
-            rear_port="rear_port_templates",
-            front_port="front_port_templates",
-        )
+    def dev_type_comp_create(
+        self, each_type: Dict[str, Any], output_name: str, dt_id: int = None
+    ) -> List:
         cmpt_created = []
+        # RPORT_ID: Rear-port IDs ({name: id}) taken from the bulk create, used to map front to rear ports (patch-panels)
+        rport_id = {}
         try:
-            for cmpt, api in component.items():
+            for cmpt, api in DEV_TYPE_CMPT.items():
                 if len(each_type[cmpt]) != 0:
                     # Creates everything except 'Front-port' as it needs the rear-port ID to map to it (as name is shared)
                     if cmpt != "front_port":
-                        operator.attrgetter(api)(self.nb.dcim).create(each_type[cmpt])
-                    # front-port needs rear_port ID (using device_type ID) to get the  to map front to rear ports (patch-panels)
+                        result = operator.attrgetter(api)(self.nb.dcim).create(
+                            each_type[cmpt]
+                        )
+                        if cmpt == "rear_port":
+                            rport_id = {str(x.name): x.id for x in result}
+                    # front-port needs rear_port ID, if not just created gets all the device_type rear-ports in one call
                     elif cmpt == "front_port":
-                        dt_id = self.nb.dcim.device_types.get(slug=each_type["slug"]).id
+                        if any(str(x["name"]) not in rport_id for x in each_type[cmpt]):
+                            rport_id.update(self.get_rport_id(each_type, dt_id))
                         for port in each_type[cmpt]:
-                            port["rear_port"] = list(
-                                self.nb.dcim.rear_port_templates.filter(
-                                    name=port["name"], devicetype_id=dt_id
-                                )
-                            )[0].id
+                            port["rear_port"] = rport_id[str(port["name"])]
                         operator.attrgetter(api)(self.nb.dcim).create(each_type[cmpt])
                     cmpt_created.append(cmpt)
             return cmpt_created
         # DEV_TYPE_COMP_ERR: If dev_type component was not able to be created returns an error message
         except RequestError as e:
-            err_msg = ast.literal_eval(e.error)
+            err_msg = self.req_err(e)
             error = self.merge_dict(err_msg)
             dev_model = each_type["model"]
             self.rc.print(
@@ -187,6 +1107,15 @@ class Nbox:
             )
             return []
 
+    # GET_RPORT_ID: Gets all the rear-port templates of a device_type ({name: id}) with one filtered call
+    def get_rport_id(
+        self, each_type: Dict[str, Any], dt_id: int = None
+    ) -> Dict[str, int]:
+        if dt_id == None:
+            dt_id = self.nb.dcim.device_types.get(slug=each_type["slug"]).id
+        all_rport = self.nb.dcim.rear_port_templates.filter(devicetype_id=dt_id)
+        return {str(x.name): x.id for x in all_rport}
+
     # ----------------------------------------------------------------------------
     # DEV_TYPE_CREATE: If not already present and no componets fail adds the device_type
     # ----------------------------------------------------------------------------
@@ -197,6 +1126,15 @@ class Nbox:
         obj_notexist_dm: List,
         obj_exist_name: List,
     ) -> None:
+        # PLAN: A call for the device_type and one for each of its component types
+        if self.plan:
+            calls = sum(
+                1 + sum(len(x[cmpt]) != 0 for cmpt in DEV_TYPE_CMPT)
+                for x in obj_notexist_dm
+            )
+            return self.plan_obj(
+                output_name, api_attr, obj_notexist_dm, obj_exist_name, calls
+            )
         all_result = []
         if len(obj_notexist_dm) != 0:
             for each_type in obj_notexist_dm:
@@ -204,23 +1142,26 @@ class Nbox:
                 try:
                     result = operator.attrgetter(api_attr)(self.nb).create(each_type)
                     # DEV_TYPE_COMP: If dev_type creation succeeds tries to create each device_type component
-                    comp_created = self.dev_type_comp_create(each_type, result)
+                    comp_created = self.dev_type_comp_create(
+                        each_type, output_name, result.id
+                    )
                     # Dependant on component result either adds dev_type to result message or deletes
                     if len(comp_created) != 0:
                         all_result.append(
                             result
                         )  # add dev_type name to print success message
                     elif len(comp_created) == 0:
-                        self.nb.dcim.device_types.get(model=each_type["model"]).delete()
+                        result.delete()
                 # DEV_TYPE_ERR: If dev_type was not able to be created returns an error message
                 except RequestError as e:
-                    # Converts string error message back into a list (literal_eval)
-                    err_msg = ast.literal_eval(e.error)
+                    # Converts JSON error message into a list of dicts
+                    err_msg = self.req_err(e)
                     for err in err_msg:
                         if len(err) != 0:
                             self.rc.print(
                                 f":x: {output_name}: {list(err.keys())[0]} - {list(err.values())[0]}"
                             )
+        self.add_obj_cache(api_attr, all_result)
         # PRINT: Prints object already exists or create message
         self.result_msg(output_name, obj_exist_name, all_result)
 
@@ -234,6 +1175,8 @@ class Nbox:
         obj_dm: Dict[str, Any],
         error: Dict[str, List],
     ) -> Dict[str, Any]:
+        # Copies as the site VLAN changes would otherwise be kept for all following objects
+        api_attr, obj_fltr = list(api_attr), list(obj_fltr)
         # VL_SITE: If no VLAN Group uses site ID instead to see if exists
         if api_attr[0] == "ipam.vlans" and obj_dm.get("group") == None:
             obj_fltr[1] = "site_id"
@@ -253,8 +1196,8 @@ class Nbox:
             # Used to by object_chk to add name of VLAN/PFX to exist list (obj["exist_name"])
             obj_dm["multi-fltr"] = obj_dm[obj_fltr[0]]
             return obj_dm
-        elif operator.attrgetter(api_attr[1])(self.nb).get(**fltr) != None:
-            obj_id = operator.attrgetter(api_attr[1])(self.nb).get(**fltr).id
+        obj_id = self.get_obj_id(api_attr[1], fltr)
+        if obj_id != None:
             # Adds object-id for VRF used for creating prefixes (not used if not VRF)
             obj_dm["vrf"] = obj_id
             # VLAN/PFX FLTR: Creates filter of IDs to check if VLAN or PFX already exists in VL_GRP or  VRF
@@ -268,10 +1211,22 @@ class Nbox:
             return obj_dm
 
         # ERROR: If VRF or VL_GRP dont exist collects details for message (cant create VLAN/PFX without them)
-        elif operator.attrgetter(api_attr[1])(self.nb).get(**fltr) == None:
+        else:
             vl_pfx_name = obj_dm[obj_fltr[0]]
             error[grp_site_vrf_name].append(vl_pfx_name)
 
+    # GET_OBJ_ID: Resolves the ID of a parent object (VL-GRP, site or VRF) once per run, not found cached as None
+    def get_obj_id(self, api_attr: str, fltr: Dict[str, Any]) -> int:
+        key = (self.api_key(api_attr), fltr["name"], fltr.get("rd"))
+        with self.lock:
+            if key in self.id_cache:
+                return self.id_cache[key]
+        all_obj = self.obj_lookup(api_attr, fltr)
+        obj_id = all_obj[0]["id"] if len(all_obj) != 0 else None
+        with self.lock:
+            self.id_cache[key] = obj_id
+        return obj_id
+
     # ----------------------------------------------------------------------------
     # PREFIX_VLAN: If is a Prefix associated to a VLAN checks against VL_GRP and role to get the unique ID
     # ----------------------------------------------------------------------------
@@ -283,31 +1238,31 @@ class Nbox:
         # GET_VLAN_ID: If pfx has a vlan, if vl_grp or site exists gets the VLAN ID and add it to the dict
         elif obj_dm.get("vlan") != None:
             vlan = obj_dm["vlan"]
-            # VL_GRP VLAN ID
+            # VL_GRP VLAN ID (VLAN index keyed by group name and VID)
             if obj_dm.get("vl_grp") != None:
                 vl_grp = obj_dm["vl_grp"]
-                try:
-                    vl_grp_slug = self.nb.ipam.vlan_groups.get(name=vl_grp)["slug"]
-                    obj_dm["vlan"] = self.nb.ipam.vlans.get(
-                        vid=vlan, group=vl_grp_slug
-                    ).id
-                    return obj_dm
-                # VLAN_NOT_EXIST: If the vlan does not exists collects details for message
-                except:
-                    pfx = obj_dm["prefix"]
-                    error[vl_grp].append(f"{pfx} 'VLAN {vlan}'")
-            # SITE VLAN ID
+                all_vlan = self.obj_lookup(
+                    "ipam.vlans", {"group__name": vl_grp, "vid": vlan}
+                )
+            # SITE VLAN ID (VLAN index keyed by site name and VID)
             elif obj_dm.get("site") != None:
-                try:
-                    site_id = self.nb.dcim.sites.get(**obj_dm["site"]).id
-                    obj_dm["vlan"] = self.nb.ipam.vlans.get(
-                        vid=vlan, site_id=site_id
-                    ).id
-                    return obj_dm
-                # VLAN_NOT_EXIST: If the vlan does not exists collects details for message
-                except:
-                    pfx = obj_dm["prefix"]
-                    error[vl_grp].append(f"{pfx} 'VLAN {vlan}'")
+                vl_grp = obj_dm["site"]["name"]
+                all_vlan = self.obj_lookup(
+                    "ipam.vlans", {"site__name": vl_grp, "vid": vlan}
+                )
+            else:
+                return None
+            if len(all_vlan) != 0:
+                obj_dm["vlan"] = all_vlan[0]["id"]
+                return obj_dm
+            # VLAN_NOT_EXIST: If the vlan does not exists collects details for message
+            else:
+                pfx = obj_dm["prefix"]
+                error[vl_grp].append(f"{pfx} 'VLAN {vlan}'")
+
+    # VL_PFX_SCOPE: VLANs of the prefixes to be created are fetched by VID (rather than one call per VID)
+    def vl_pfx_scope(self, obj_dm: List) -> Dict[str, List]:
+        return dict(vid=[x["vlan"] for x in obj_dm if x.get("vlan") != None])
 
     # ----------------------------------------------------------------------------
     # CNT_ASGN_ID: Gets the ID for the assignment objects and contacts
@@ -315,129 +1270,185 @@ class Nbox:
     def get_cnt_asgn_id(
         self, asgn: Dict[str, Any], api_fltr: str, error: List
     ) -> Dict[str, Any]:
-        api = asgn["content_type"] + "s"
+        api = self.asgn_api(asgn["content_type"])
         tmp_asgn = []
-        # GET_ID: Get ID of the object the contact is to be assigned to
+        # GET_ID: Get ID of the object the contact is to be assigned to (from the cached endpoint)
         try:
-            if api == "virtualization.clustergroups":
-                api = "virtualization.cluster-groups"
-            obj_id = (
-                operator.attrgetter(api)(self.nb)
-                .get(**{api_fltr: asgn["object_id"]})
-                .id
-            )
-            for each_cnt in asgn["contact"]:
-                # GET_CNT_ID: Get ID of each contact
-                try:
-                    cnt_id = self.nb.tenancy.contacts.get(name=each_cnt).id
-                    asgn_copy = asgn.copy()
-                    asgn_copy["object_id"] = obj_id
-                    asgn_copy["contact"] = cnt_id
-                    # CHK: Create dictionary used for checking if assignment already exists
-                    asgn_copy["chk_fltr"] = {
-                        "content_type": asgn["content_type"],
-                        "object_id": obj_id,
-                        "contact_id": cnt_id,
-                    }
-                    # IDNTY: Used to identify obj in the already exist list (obj["exist_name"])
-                    asgn_copy[
-                        "multi-fltr"
-                    ] = f"{each_cnt} {asgn['object_id']} ({asgn['content_type'].split('.')[1]})"
-                    tmp_asgn.append(asgn_copy)
-                except:
-                    error.append(f"content - {each_cnt}")
-        except:
+            all_obj = self.obj_lookup(api, {api_fltr: asgn["object_id"]})
+        except RequestError:
+            all_obj = []
+        if len(all_obj) == 0:
             error.append(f"{asgn['content_type'].split('.')[1]} - {asgn['object_id']}")
-
+            return tmp_asgn
+        obj_id = all_obj[0]["id"]
+        for each_cnt in asgn["contact"]:
+            # GET_CNT_ID: Get ID of each contact
+            all_cnt = self.obj_lookup("tenancy.contacts", {"name": each_cnt})
+            if len(all_cnt) == 0:
+                error.append(f"content - {each_cnt}")
+                continue
+            cnt_id = all_cnt[0]["id"]
+            asgn_copy = asgn.copy()
+            asgn_copy["object_id"] = obj_id
+            asgn_copy["contact"] = cnt_id
+            # CHK: Create dictionary used for checking if assignment already exists
+            asgn_copy["chk_fltr"] = {
+                "content_type": asgn["content_type"],
+                "object_id": obj_id,
+                "contact_id": cnt_id,
+            }
+            # IDNTY: Used to identify obj in the already exist list (obj["exist_name"])
+            asgn_copy["multi-fltr"] = (
+                f"{each_cnt} {asgn['object_id']} ({asgn['content_type'].split('.')[1]})"
+            )
+            tmp_asgn.append(asgn_copy)
         return tmp_asgn
 
+    # ASGN_API: Endpoint of the object the contact is assigned to (content_type is app.model)
+    def asgn_api(self, content_type: str) -> str:
+        api = content_type + "s"
+        if api == "virtualization.clustergroups":
+            api = "virtualization.cluster-groups"
+        return api
+
+    # ASGN_ID: Gets ID of the object the contact is to be assigned to using object name (cid for circuits), then slug
+    def get_asgn_id(self, each_asgn: Dict[str, Any], err: List) -> List:
+        if each_asgn["content_type"] == "circuits.circuit":
+            tmp_fltr = "cid"
+        else:
+            tmp_fltr = "name"
+        # SLUG: If no object has that name (index lookup) uses the object slug
+        try:
+            api = self.asgn_api(each_asgn["content_type"])
+            if len(self.obj_lookup(api, {tmp_fltr: each_asgn["object_id"]})) == 0:
+                tmp_fltr = "slug"
+        except RequestError:
+            pass
+        return self.get_cnt_asgn_id(each_asgn, tmp_fltr, err)
+
+    # PREFETCH_ASGN: Fetches contacts and the endpoint of every assigned object once (concurrently if using workers)
+    def prefetch_asgn(self, obj_dm: List) -> None:
+        all_api = ["tenancy.contacts"]
+        all_api.extend([self.asgn_api(x["content_type"]) for x in obj_dm])
+
+        def get_obj_cache(api: str) -> None:
+            try:
+                self.get_obj_cache(api)
+            # A bad endpoint is reported when the object ID is looked up
+            except RequestError:
+                pass
+
+        self.pool_map(get_obj_cache, list(dict.fromkeys(all_api)))
+
     # ----------------------------------------------------------------------------
     # NBOX_ENGINE: Checks existence of objects and creates them if they do not exist
     # ----------------------------------------------------------------------------
     def engine(
         self, output_name: str, api_attr: str, obj_fltr: str, obj_dm: Dict[str, Any]
     ) -> None:
-        # VRF: Adds RD to VRF object check as used to identify unique VRFs (VRFs dont have slugs)
-        if output_name == "VRF":
-            for each_obj_dm in obj_dm:
-                each_obj_dm["chk_fltr"] = dict(
-                    name=each_obj_dm["name"], rd=each_obj_dm.get("rd", "null")
-                )
-                each_obj_dm["obj_fltr"] = obj_fltr
-            obj_fltr = "multi-fltr"
+        obj_fltr = self.vrf_fltr(output_name, obj_fltr, obj_dm)
 
         # VL-GRP/VRF: Check object exists and get ID which is used when creating VLAN/PFX. Merges error message for all VL-GRP/VRF
         if output_name == "VLAN" or output_name == "Prefix":
-            tmp_obj_dm = []
             err = defaultdict(list)
-            for each_obj_dm in obj_dm:
-                tmp = self.get_vlgrp_site_vrf_id(api_attr, obj_fltr, each_obj_dm, err)
-                if tmp != None:
-                    tmp_obj_dm.append(tmp)
-            if len(err) != 0:
-                api_name = api_attr[1].split(".")[1][:-1]
-                for vlgrp_vrf, vl_pfx in err.items():
-                    self.rc.print(
-                        f":x: {output_name}: {', '.join(set(vl_pfx))} - The {api_name} '{vlgrp_vrf}' for this {output_name.lower()} does not exist"
-                    )
-            obj_dm = tmp_obj_dm
+            all_tmp = self.pool_map(
+                lambda each_obj_dm, each_err: self.get_vlgrp_site_vrf_id(
+                    api_attr, obj_fltr, each_obj_dm, each_err
+                ),
+                obj_dm,
+                err,
+            )
+            obj_dm = self.vlgrp_vrf_result(output_name, api_attr, all_tmp, err)
             api_attr = api_attr[0]
             obj_fltr = "multi-fltr"
 
         # CNT_ASGN: Has to gather object IDs for contact assignment. Merges error message for all CNT ASGN
         elif output_name == "Contact Assignment":
-            tmp_obj_dm, err = ([] for i in range(2))
-            for each_asgn in obj_dm:
-                # NAME: Try get ID of the object the contact is to be assigned to using object name
-                try:
-                    if each_asgn["content_type"] == "circuits.circuit":
-                        tmp_fltr = "cid"
-                    else:
-                        tmp_fltr = "name"
-                    tmp_obj_dm.extend(self.get_cnt_asgn_id(each_asgn, tmp_fltr, err))
-                except:
-                    # SLUG: Try get ID of the object the contact is to be assigned to using object slug
-                    try:
-                        tmp_obj_dm.extend(self.get_cnt_asgn_id(each_asgn, "slug", err))
-                    # If cant get the ID add object to error list
-                    except:
-                        err.append(
-                            f"{each_asgn['content_type'].split('.')[1]} - {each_asgn['object_id']}"
-                        )
-            if len(err) != 0:
-                self.rc.print(
-                    f":x: {output_name}: Can't get the ID for the name or slug of: '{', '.join(set(err))}'"
-                )
-            obj_dm = tmp_obj_dm
+            err = []
+            self.prefetch_asgn(obj_dm)
+            all_tmp = self.pool_map(self.get_asgn_id, obj_dm, err)
+            obj_dm = self.asgn_result(output_name, all_tmp, err)
 
         # CHK_OBJ: Check if object already exists.
         if len(obj_dm) != 0:
             obj = self.obj_check(api_attr, obj_fltr, obj_dm)
+            # UPDATE: Existing objects that differ from their DM are updated
+            if self.update:
+                obj["exist_name"] = self.obj_update(
+                    output_name, api_attr, obj_fltr, obj_dm, obj["exist_name"]
+                )
 
             # PRF_VL: If prefix is associated with vlan gets vlan ID. Merges error message for all VL/PFX
             if api_attr == "ipam.prefixes":
-                tmp_obj = []
                 err = defaultdict(list)
-                for each_obj_dm in obj["notexist_dm"]:
-                    tmp = self.get_vl_pfx_id(each_obj_dm, err)
-                    if tmp != None:
-                        tmp_obj.append(tmp)
-                if len(err) != 0:
-                    for vlgrp, pfx_vl in err.items():
-                        self.rc.print(
-                            f":x: {output_name}: {', '.join(set(pfx_vl))} in VLAN Group '{vlgrp}' does not exist"
-                        )
-                obj["notexist_dm"] = tmp_obj
-
+                if self.strategy != "prefetch":
+                    self.load_obj_scope(
+                        "ipam.vlans", self.vl_pfx_scope(obj["notexist_dm"])
+                    )
+                all_tmp = self.pool_map(self.get_vl_pfx_id, obj["notexist_dm"], err)
+                obj["notexist_dm"] = self.vl_pfx_result(output_name, all_tmp, err)
             # CRTE_OBJ: Creates all objects
-            if output_name == "Device-type":
-                self.dev_type_create(
-                    output_name, api_attr, obj["notexist_dm"], obj["exist_name"]
+            self.engine_create(output_name, api_attr, obj)
+
+    # VRF_FLTR: Adds RD to VRF object check as used to identify unique VRFs (VRFs dont have slugs)
+    def vrf_fltr(self, output_name: str, obj_fltr: str, obj_dm: List) -> str:
+        if output_name == "VRF":
+            for each_obj_dm in obj_dm:
+                each_obj_dm["chk_fltr"] = dict(
+                    name=each_obj_dm["name"], rd=each_obj_dm.get("rd", "null")
                 )
-            else:
-                self.obj_create(
-                    output_name, api_attr, obj["notexist_dm"], obj["exist_name"]
+                each_obj_dm["obj_fltr"] = obj_fltr
+            obj_fltr = "multi-fltr"
+        return obj_fltr
+
+    # VLGRP_VRF_RESULT: Drops VLANs/PFXs whose VL-GRP/VRF does not exist and prints the merged errors
+    def vlgrp_vrf_result(
+        self, output_name: str, api_attr: List, all_tmp: List, err: Dict[str, List]
+    ) -> List:
+        tmp_obj_dm = [tmp for tmp in all_tmp if tmp != None]
+        if len(err) != 0:
+            api_name = api_attr[1].split(".")[1][:-1]
+            for vlgrp_vrf, vl_pfx in err.items():
+                self.rc.print(
+                    f":x: {output_name}: {', '.join(dict.fromkeys(vl_pfx))} - The {api_name} '{vlgrp_vrf}' for this {output_name.lower()} does not exist"
                 )
+        return tmp_obj_dm
+
+    # ASGN_RESULT: Flattens the contact assignments of each object and prints the merged errors
+    def asgn_result(self, output_name: str, all_tmp: List, err: List) -> List:
+        tmp_obj_dm = []
+        for tmp in all_tmp:
+            tmp_obj_dm.extend(tmp)
+        if len(err) != 0:
+            self.rc.print(
+                f":x: {output_name}: Can't get the ID for the name or slug of: '{', '.join(dict.fromkeys(err))}'"
+            )
+        return tmp_obj_dm
+
+    # VL_PFX_RESULT: Drops prefixes whose VLAN does not exist and prints the merged errors
+    def vl_pfx_result(
+        self, output_name: str, all_tmp: List, err: Dict[str, List]
+    ) -> List:
+        tmp_obj = [tmp for tmp in all_tmp if tmp != None]
+        if len(err) != 0:
+            for vlgrp, pfx_vl in err.items():
+                self.rc.print(
+                    f":x: {output_name}: {', '.join(dict.fromkeys(pfx_vl))} in VLAN Group '{vlgrp}' does not exist"
+                )
+        return tmp_obj
+
+    # ENGINE_CREATE: Creates all objects that do not already exist
+    def engine_create(
+        self, output_name: str, api_attr: str, obj: Dict[str, List]
+    ) -> None:
+        if output_name == "Device-type":
+            self.dev_type_create(
+                output_name, api_attr, obj["notexist_dm"], obj["exist_name"]
+            )
+        else:
+            self.obj_create(
+                output_name, api_attr, obj["notexist_dm"], obj["exist_name"]
+            )
 
     # ----------------------------------------------------------------------------
     # Methods that that provide Netbox interaction for DM building classes
@@ -446,18 +1457,43 @@ class Nbox:
     def get_or_create_tag(self, tag: Dict[str, Any]) -> List:
         tags = []
         if tag != None:
+            with self.lock:
+                self.create_tags(tag)
+                for name in tag.keys():
+                    name = str(name)
+                    if name not in self.tag_created and name not in self.tag_exists:
+                        self.tag_exists.append(name)
+                    tags.append(self.tag_index[name])
+        return tags
+
+    # LOAD_TAGS: Loads the names and IDs of all existing tags into the tag registry
+    def load_tags(self) -> Dict[str, int]:
+        if self.tag_index == None:
+            self.tag_index = {
+                str(x["name"]): x["id"] for x in self.get_obj_cache("extras.tags")
+            }
+        return self.tag_index
+
+    # CREATE_TAGS: Creates all tags ({name: colour}) not already in the registry with a single bulk POST
+    def create_tags(self, tag: Dict[str, Any]) -> None:
+        new_tag = {}
+        with self.lock:
             for name, colour in tag.items():
                 name = str(name)
-                tag = self.nb.extras.tags.get(name=name)
-                if not tag:
-                    tag = self.nb.extras.tags.create(
-                        dict(name=name, slug=self.make_slug(name), color=colour)
+                if name not in self.load_tags() and name not in new_tag:
+                    new_tag[name] = dict(
+                        name=name, slug=self.make_slug(name), color=colour
                     )
-                    self.tag_created.append(name)
-                else:
-                    self.tag_exists.append(name)
-                tags.append(tag.id)
-        return tags
+            if self.plan:
+                return self.plan_tag_rt(
+                    "Tags", self.tag_index, self.tag_created, tag, new_tag
+                )
+            if len(new_tag) != 0:
+                result = self.nb.extras.tags.create(list(new_tag.values()))
+                self.add_obj_cache("extras.tags", result)
+                for each_tag in result:
+                    self.tag_index[str(each_tag.name)] = each_tag.id
+                    self.tag_created.append(str(each_tag.name))
 
     # RT: Gathers ID of existing RT or creates new one and returns ID (list of IDs)
     def get_or_create_rt(self, rt: List, tnt: str) -> List:
@@ -465,21 +1501,51 @@ class Nbox:
         if isinstance(rt, list):
             rt = dict.fromkeys(rt, "")
         if rt != None:
-            for name, descr in rt.items():
-                rt = self.nb.ipam.route_targets.get(name=name)
-                if not rt:
-                    fltr = {
+            with self.lock:
+                self.create_rts({name: [descr, tnt] for name, descr in rt.items()})
+                for name in rt.keys():
+                    name = str(name)
+                    if name not in self.rt_created and name not in self.rt_exists:
+                        self.rt_exists.append(name)
+                    all_rt.append(self.rt_index[name])
+        return all_rt
+
+    # LOAD_RTS: Loads the names and IDs of all existing RTs into the RT registry
+    def load_rts(self) -> Dict[str, int]:
+        if self.rt_index == None:
+            self.rt_index = {
+                str(x["name"]): x["id"]
+                for x in self.get_obj_cache("ipam.route_targets")
+            }
+        return self.rt_index
+
+    # CREATE_RTS: Creates all RTs ({name: [descr, tenant]}) not already in the registry with a single bulk POST
+    def create_rts(self, rt: Dict[str, List]) -> None:
+        new_rt = {}
+        with self.lock:
+            for name, (descr, tnt) in rt.items():
+                name = str(name)
+                if name not in self.load_rts() and name not in new_rt:
+                    new_rt[name] = {
                         "name": name,
                         "description": descr,
                         "tenant": self.name_none(tnt, {"name": tnt}),
                     }
-                    rt = self.nb.ipam.route_targets.create(**fltr)
-                    self.rt_created.append(name)
-                else:
-                    self.rt_exists.append(name)
-
-                all_rt.append(rt.id)
-        return all_rt
+            if self.plan:
+                return self.plan_tag_rt(
+                    "Route-Targets", self.rt_index, self.rt_created, rt, new_rt
+                )
+            if len(new_rt) != 0:
+                if self.ids:
+                    new_rt = {
+                        x: self.nested_ids("ipam.route_targets", y)
+                        for x, y in new_rt.items()
+                    }
+                result = self.nb.ipam.route_targets.create(list(new_rt.values()))
+                self.add_obj_cache("ipam.route_targets", result)
+                for each_rt in result:
+                    self.rt_index[str(each_rt.name)] = each_rt.id
+                    self.rt_created.append(str(each_rt.name))
 
     # PRINT_TAG_RT: Prints the result of existing and newly created tags
     def print_tag_rt(self, input_msg, exists, created) -> None:
@@ -496,16 +1562,276 @@ class Nbox:
             obj = str(obj)
         return obj.replace(" ", "_").lower()
 
-    # TNT: Gets the tennat name for a a site fed into it (if API call fails leaves blank)
+    # TNT: Gets the tennat name for a a site fed into it from the sites cache or input file (if API call fails leaves blank)
     def get_tnt(self, site: str) -> str:
         try:
-            return dict(self.nb.dcim.sites.get(name=site))["tenant"]["name"]
+            site_obj = self.obj_lookup("dcim.sites", {"name": site})
         except:
-            return None
+            site_obj = []
+        if len(site_obj) != 0:
+            return (site_obj[0].get("tenant") or {}).get("name")
+        return self.site_tnt.get(site)
 
-    # NAME_NONE: Removes name from netbox filter if its value is None
+    # SITE_TNT: Adds the tenant of sites that will be created in this run (from the site DM) for get_tnt to fall back on
+    def add_site_tnt(self, site_dm: List) -> None:
+        for each_site in site_dm:
+            self.site_tnt[each_site["name"]] = (each_site.get("tenant") or {}).get(
+                "name"
+            )
+
+    # NAME_NONE: Removes name from netbox filter if its value is None (a site tenant is only known once resolved)
     def name_none(self, name_value: str, full_key_value: Dict) -> str:
-        if name_value == None:
+        if isinstance(name_value, SiteTntRef):
+            return name_value._replace(value=full_key_value)
+        elif name_value == None:
             return name_value
         else:
             return full_key_value
+
+    # ----------------------------------------------------------------------------
+    # Methods that build references (no Netbox calls) for the DM building classes, resolved once all DMs are built
+    # ----------------------------------------------------------------------------
+    # TAG_REF: Reference to the tags of an object, no tags are an empty list
+    def tag_ref(self, tag: Dict[str, Any]) -> Any:
+        return TagRef(tag) if tag else []
+
+    # RT_REF: Reference to the RTs (list or {name: descr}) of a VRF, no RTs are an empty list
+    def rt_ref(self, rt: Any, tnt: Any) -> Any:
+        if isinstance(rt, list):
+            rt = dict.fromkeys(rt, "")
+        return RtRef(rt, tnt) if rt else []
+
+    # SITE_TNT_REF: Reference to the tenant of a site (from Netbox or the site DM)
+    def site_tnt_ref(self, site: str) -> SiteTntRef:
+        return SiteTntRef(site)
+
+    # ----------------------------------------------------------------------------
+    # RESOLVE: Gathers the references of all DMs, creates any new tags or RTs with one call and swaps them for their values
+    # ----------------------------------------------------------------------------
+    # FIND_REFS: All references of a type in the DMs (in the order found)
+    def find_refs(self, obj: Any, ref_type: type) -> List:
+        if isinstance(obj, ref_type):
+            return [obj]
+        elif isinstance(obj, dict):
+            obj = list(obj.values())
+        elif not isinstance(obj, list):
+            return []
+        return [ref for each_obj in obj for ref in self.find_refs(each_obj, ref_type)]
+
+    # REPLACE_REFS: Replaces (in place) all references of a type in the DMs with the value returned by ref_func
+    def replace_refs(self, obj: Any, ref_type: type, ref_func: Callable) -> Any:
+        if isinstance(obj, ref_type):
+            return ref_func(obj)
+        elif isinstance(obj, dict):
+            for key, value in obj.items():
+                obj[key] = self.replace_refs(value, ref_type, ref_func)
+        elif isinstance(obj, list):
+            for idx, value in enumerate(obj):
+                obj[idx] = self.replace_refs(value, ref_type, ref_func)
+        return obj
+
+    # RESOLVE_TAGS: Creates all new tags of the DMs at once and replaces the tag references with tag IDs
+    def resolve_tags(self, *all_dm: Any) -> None:
+        all_tag = {}
+        for each_ref in self.find_refs(list(all_dm), TagRef):
+            for name, colour in each_ref.tags.items():
+                all_tag.setdefault(name, colour)
+        self.create_tags(all_tag)
+        self.replace_refs(
+            list(all_dm), TagRef, lambda x: self.get_or_create_tag(x.tags)
+        )
+
+    # RESOLVE_SITE_TNT: Replaces the site tenant references (including those of RT references) with the tenant name
+    def resolve_site_tnt(self, *all_dm: Any) -> None:
+        def site_tnt(ref: SiteTntRef) -> Any:
+            tnt = self.get_tnt(ref.site)
+            if ref.value == None or tnt == None:
+                return tnt
+            return self.replace_refs(ref.value, SiteTntRef, site_tnt)
+
+        def rt_tnt(ref: RtRef) -> RtRef:
+            return (
+                ref._replace(tnt=site_tnt(ref.tnt))
+                if isinstance(ref.tnt, SiteTntRef)
+                else ref
+            )
+
+        self.replace_refs(list(all_dm), SiteTntRef, site_tnt)
+        self.replace_refs(list(all_dm), RtRef, rt_tnt)
+
+    # RESOLVE_RTS: Creates all new RTs of the DMs at once (tenants must exist) and replaces the RT references with RT IDs
+    def resolve_rts(self, *all_dm: Any) -> None:
+        all_rt = {}
+        for each_ref in self.find_refs(list(all_dm), RtRef):
+            for name, descr in each_ref.rt.items():
+                all_rt.setdefault(name, [descr, each_ref.tnt])
+        self.create_rts(all_rt)
+        self.replace_refs(
+            list(all_dm), RtRef, lambda x: self.get_or_create_rt(x.rt, x.tnt)
+        )
+
+    # ----------------------------------------------------------------------------
+    # PLAN: Dry-run, records what would be created and adds it to the caches so dependant objects resolve
+    # ----------------------------------------------------------------------------
+    def plan_obj(
+        self,
+        output_name: str,
+        api_attr: str,
+        obj_notexist_dm: List,
+        obj_exist_name: List,
+        calls: int,
+    ) -> None:
+        all_result = [dict(x, id=self.next_plan_id()) for x in obj_notexist_dm]
+        # Endpoint is loaded first as only an already fetched cache is added to
+        self.get_obj_cache(api_attr)
+        self.add_obj_cache(api_attr, all_result)
+        self.plan_add(output_name, len(all_result), len(obj_exist_name), calls)
+
+    # PLAN_TAG_RT: Tags/RTs to create get a made up ID in the registry, existing ones are only counted once
+    def plan_tag_rt(
+        self,
+        output_name: str,
+        index: Dict[str, int],
+        created: List,
+        obj: Dict[str, Any],
+        new_obj: Dict[str, Any],
+    ) -> None:
+        exist = [
+            str(x)
+            for x in obj
+            if index.get(str(x), 0) > 0 and str(x) not in self.plan_seen
+        ]
+        self.plan_seen.update(exist)
+        for name in new_obj:
+            index[name] = self.next_plan_id()
+            created.append(name)
+        self.plan_add(output_name, len(new_obj), len(exist), int(len(new_obj) != 0))
+
+    def plan_add(
+        self, output_name: str, create: int, exist: int, calls: int, update: int = 0
+    ) -> None:
+        with self.lock:
+            each_plan = self.plan_result[
+                (
+                    getattr(self.local, "section", None) or self.stats.current,
+                    output_name,
+                )
+            ]
+            each_plan[0] += create
+            each_plan[1] += update
+            each_plan[2] += exist
+            each_plan[3] += calls
+
+    # PLAN_ID: Made up IDs are negative so they never match an existing object
+    def next_plan_id(self) -> int:
+        with self.lock:
+            self.plan_id -= 1
+            return self.plan_id
+
+    # SNAPSHOT: Loads all the endpoints (one GraphQL query if enabled, else REST listings run on the workers), returns API calls made
+    def snapshot(self, *api_attr: str) -> int:
+        calls = self.stats.summary()["total"]["calls"]
+        self.prefetch(*api_attr)
+        all_api = [
+            x
+            for x in dict.fromkeys(api_attr)
+            if self.obj_cache.get(self.api_key(x)) == None
+        ]
+        self.pool_map(self.get_obj_cache, all_api)
+        return self.stats.summary()["total"]["calls"] - calls
+
+    # PRINT_PLAN: Prints the objects to be created, updated and that already exist (unchanged) per stage and the API calls to apply the plan
+    def print_plan(self, snapshot_calls: int) -> None:
+        plan_table = Table(title="Plan (nothing has been changed in Netbox)")
+        plan_table.add_column("Stage")
+        plan_table.add_column("Object")
+        for column in ["Create", "Update", "Exist", "API calls"]:
+            plan_table.add_column(column, justify="right")
+        plan_table.add_row(
+            "SNAPSHOT", "Existing objects (lookups)", "", "", "", str(snapshot_calls)
+        )
+        # ORDER: Stages run at the same time finish in any order so rows are in registry order (Tags/RTs with the section DM)
+        order = {}
+        for idx, each_stage in enumerate(self.all_stage):
+            order.setdefault(each_stage.section, idx)
+            order[(each_stage.section, each_stage.name)] = idx
+        all_plan = sorted(
+            self.plan_result.items(),
+            key=lambda x: order.get(x[0], order.get(x[0][0], -1)),
+        )
+        for (stage, output_name), each_plan in all_plan:
+            plan_table.add_row(stage, output_name, *[str(x) for x in each_plan])
+        total = [sum(x[idx] for x in self.plan_result.values()) for idx in range(4)]
+        total[3] += snapshot_calls
+        plan_table.add_row("TOTAL", "", *[str(x) for x in total])
+        self.rc.print(plan_table)
+
+    # ----------------------------------------------------------------------------
+    # PRINT_STATS: Prints a summary table of the API calls per endpoint/method and the time taken by each stage
+    # ----------------------------------------------------------------------------
+    def print_stats(self, stats_json: str = None) -> None:
+        summary = self.stats.summary()
+        api_table = Table(title="Netbox API calls")
+        api_table.add_column("Endpoint", no_wrap=True)
+        api_table.add_column("Method")
+        for column in [
+            "Calls",
+            "Retry",
+            "Err",
+            "KB out",
+            "KB in",
+            "Time s",
+            "Avg ms",
+            "p95 ms",
+            "Max ms",
+        ]:
+            api_table.add_column(column, justify="right")
+        for each_api in summary["api"] + [
+            dict(summary["total"], endpoint="TOTAL", method="")
+        ]:
+            histogram = list(each_api.get("histogram", {}).values())
+            api_table.add_row(
+                each_api["endpoint"],
+                each_api["method"],
+                str(each_api["calls"]),
+                str(each_api["retries"]),
+                str(each_api["errors"]),
+                f"{each_api['sent'] / 1024:.1f}",
+                f"{each_api['received'] / 1024:.1f}",
+                f"{each_api['secs']:.2f}",
+                f"{each_api['secs'] * 1000 / max(1, each_api['calls']):.1f}",
+                f"<={self.stats.percentile(histogram, 0.95)}" if histogram else "",
+                f"{each_api['max_secs'] * 1000:.1f}" if "max_secs" in each_api else "",
+            )
+        stage_table = Table(title="Stages (sections include their object stages)")
+        stage_table.add_column("Stage")
+        for column in ["Time (s)", "API calls"]:
+            stage_table.add_column(column, justify="right")
+        for stage, each_stage in summary["stages"].items():
+            stage = f"  {stage}" if each_stage.get("section") != None else stage
+            stage_table.add_row(
+                stage, f"{each_stage['secs']:.2f}", str(each_stage["calls"])
+            )
+        self.rc.print(api_table, stage_table)
+        # STRATEGY: How the objects of each endpoint were fetched to check existence (chosen by the estimated calls)
+        if len(summary["strategy"]) != 0:
+            strategy_table = Table(
+                title="Existence check (estimated API calls of each strategy)"
+            )
+            strategy_table.add_column("Endpoint", no_wrap=True)
+            strategy_table.add_column("Strategy", no_wrap=True)
+            for column in ["Objects", "DMs"] + [x.capitalize() for x in STRATEGY]:
+                strategy_table.add_column(column, justify="right")
+            for api, each_api in sorted(summary["strategy"].items()):
+                strategy_table.add_row(
+                    api,
+                    each_api["strategy"],
+                    str(each_api["count"]),
+                    str(each_api["dm"]),
+                    *[str(each_api["cost"].get(x, "")) for x in STRATEGY],
+                )
+            self.rc.print(strategy_table)
+        # JSON: Optionally saves all the metrics (including full latency histograms) to file
+        if stats_json != None:
+            with open(stats_json, "w") as file_content:
+                json.dump(summary, file_content, indent=2)
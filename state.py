@@ -0,0 +1,111 @@
+from typing import Any, Dict, List
+import json
+import sqlite3
+import threading
+
+# PAGE_SIZE: First page fetched by a sync (Netbox default page size), holds all the objects of small endpoints
+PAGE_SIZE = 50
+
+
+# ----------------------------------------------------------------------------
+# STATE_CACHE: Objects of each endpoint kept in a SQLite file between runs, only the changes are fetched from Netbox
+# ----------------------------------------------------------------------------
+class StateCache:
+    def __init__(self, filename: str, netbox_url: str):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(filename, check_same_thread=False)
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS obj (api TEXT, id INTEGER, last_updated TEXT, data TEXT, PRIMARY KEY (api, id))"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS sync (api TEXT PRIMARY KEY, since TEXT)"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            # URL: A cache file of another Netbox is of no use so is emptied
+            row = self.db.execute(
+                "SELECT value FROM meta WHERE key = 'netbox_url'"
+            ).fetchone()
+            if row == None or row[0] != netbox_url:
+                self.db.execute("DELETE FROM obj")
+                self.db.execute("DELETE FROM sync")
+                self.db.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('netbox_url', ?)",
+                    (netbox_url,),
+                )
+
+    # ----------------------------------------------------------------------------
+    # SYNC: Returns all objects of an endpoint. If synced before only objects updated since are fetched (last_updated__gte),
+    # if the number of objects then differs from Netbox (objects have been deleted) the whole endpoint is fetched again.
+    # The first page gives the number of objects, if it holds them all (small endpoint) it replaces the stored objects
+    # ----------------------------------------------------------------------------
+    def sync(self, api: str, endpoint: Any) -> List:
+        since = self.since(api)
+        if since != None:
+            page = endpoint.filter(limit=PAGE_SIZE, offset=0)
+            all_obj = [dict(x) for x in page]
+            if len(page) <= len(all_obj):
+                self.save(api, all_obj, full=True)
+                return sorted(all_obj, key=lambda x: x.get("id", 0))
+            count = len(page)
+            all_obj = self.load(api)
+            changed = [dict(x) for x in endpoint.filter(last_updated__gte=since)]
+            all_obj.update({x["id"]: x for x in changed})
+            if count == len(all_obj):
+                self.save(api, changed)
+                return sorted(all_obj.values(), key=lambda x: x.get("id", 0))
+        all_obj = [dict(x) for x in endpoint.all()]
+        self.save(api, all_obj, full=True)
+        return sorted(all_obj, key=lambda x: x.get("id", 0))
+
+    # SINCE: Newest last_updated of the stored objects (Netbox time so local clock skew does not matter), None if never
+    # synced or the endpoint was empty (all objects are then fetched)
+    def since(self, api: str) -> Any:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT since FROM sync WHERE api = ?", (api,)
+            ).fetchone()
+        return row[0] if row != None else None
+
+    # LOAD: Stored objects of an endpoint ({id: obj})
+    def load(self, api: str) -> Dict[int, Dict[str, Any]]:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, data FROM obj WHERE api = ?", (api,)
+            ).fetchall()
+        return {obj_id: json.loads(data) for obj_id, data in rows}
+
+    # SAVE: Adds or updates objects of a synced endpoint (full replaces all its objects). The sync point only moves on
+    # for objects fetched by a sync (not those just created) so changes made by others in between are not missed
+    def save(
+        self, api: str, all_obj: List, full: bool = False, sync: bool = True
+    ) -> None:
+        with self.lock, self.db:
+            if full:
+                self.db.execute("DELETE FROM obj WHERE api = ?", (api,))
+                self.db.execute("INSERT OR REPLACE INTO sync VALUES (?, NULL)", (api,))
+            elif (
+                self.db.execute("SELECT 1 FROM sync WHERE api = ?", (api,)).fetchone()
+                == None
+            ):
+                return
+            self.db.executemany(
+                "INSERT OR REPLACE INTO obj VALUES (?, ?, ?, ?)",
+                [
+                    (api, x["id"], x.get("last_updated"), json.dumps(x, default=str))
+                    for x in all_obj
+                    if x.get("id") != None
+                ],
+            )
+            if sync:
+                since = max(
+                    [str(x["last_updated"]) for x in all_obj if x.get("last_updated")],
+                    default=None,
+                )
+                self.db.execute(
+                    "UPDATE sync SET since = MAX(COALESCE(since, ''), ?) WHERE api = ? AND ? IS NOT NULL",
+                    (since, api, since),
+                )
@@ -0,0 +1,482 @@
+import json
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+import requests
+from requests.adapters import BaseAdapter
+
+# ----------------------------------------------------------------------------
+# Nested object fields of each endpoint and the endpoint they reference (all others default to FK_FIELD, None is not a field so ignored)
+# ----------------------------------------------------------------------------
+FK_FIELD = dict(
+    tenant="tenancy/tenants",
+    site="dcim/sites",
+    location="dcim/locations",
+    manufacturer="dcim/manufacturers",
+    device_type="dcim/device-types",
+    rir="ipam/rirs",
+    vrf="ipam/vrfs",
+    vlan="ipam/vlans",
+    provider="circuits/providers",
+    contact="tenancy/contacts",
+)
+FK_API = {
+    "tenancy/contacts": dict(group="tenancy/contact-groups"),
+    "tenancy/contact-groups": dict(parent="tenancy/contact-groups"),
+    "tenancy/contact-assignments": dict(role="tenancy/contact-roles"),
+    "dcim/locations": dict(parent="dcim/locations"),
+    "dcim/racks": dict(role="dcim/rack-roles"),
+    "dcim/rear-port-templates": {},
+    "dcim/front-port-templates": dict(rear_port="dcim/rear-port-templates"),
+    "ipam/vlans": dict(group="ipam/vlan-groups", role="ipam/roles", vrf=None),
+    "ipam/prefixes": dict(role="ipam/roles"),
+    "circuits/circuits": dict(type="circuits/circuit-types"),
+    "virtualization/clusters": dict(
+        type="virtualization/cluster-types", group="virtualization/cluster-groups"
+    ),
+}
+# Fields that are a list of nested objects
+FK_LIST = dict(
+    tags="extras/tags",
+    import_targets="ipam/route-targets",
+    export_targets="ipam/route-targets",
+)
+# Optional fields returned as null if not set when the object is created
+NULL_FIELDS = {
+    "tenancy/tenants": ["group"],
+    "dcim/sites": ["tenant", "region", "group"],
+    "dcim/locations": ["parent", "tenant"],
+    "dcim/racks": ["location", "tenant", "role"],
+    "ipam/aggregates": ["tenant"],
+    "ipam/vrfs": ["rd", "tenant"],
+    "ipam/vlans": ["site", "group", "tenant", "role"],
+    "ipam/prefixes": ["site", "vrf", "tenant", "vlan", "role"],
+    "circuits/circuits": ["tenant"],
+    "virtualization/clusters": ["group", "tenant", "site"],
+}
+# Fields that must be set when creating an object
+REQUIRED = dict(
+    slug=[
+        "tenancy/tenants",
+        "tenancy/contact-groups",
+        "tenancy/contact-roles",
+        "dcim/sites",
+        "dcim/locations",
+        "dcim/rack-roles",
+        "dcim/device-roles",
+        "dcim/manufacturers",
+        "dcim/platforms",
+        "dcim/device-types",
+        "ipam/rirs",
+        "ipam/roles",
+        "ipam/vlan-groups",
+        "circuits/circuit-types",
+        "circuits/providers",
+        "virtualization/cluster-types",
+        "virtualization/cluster-groups",
+        "extras/tags",
+    ]
+)
+# Fields that must be unique within an endpoint
+UNIQUE = dict(
+    name=[
+        "tenancy/tenants",
+        "dcim/sites",
+        "dcim/rack-roles",
+        "dcim/device-roles",
+        "dcim/manufacturers",
+        "dcim/platforms",
+        "ipam/rirs",
+        "ipam/roles",
+        "ipam/route-targets",
+        "circuits/circuit-types",
+        "circuits/providers",
+        "virtualization/cluster-types",
+        "virtualization/cluster-groups",
+        "virtualization/clusters",
+        "extras/tags",
+        "tenancy/contact-roles",
+    ],
+    slug=["tenancy/tenants", "dcim/sites", "extras/tags", "dcim/device-types"],
+    model=["dcim/device-types"],
+)
+
+# Filters that are a single-value CharFilter in Netbox, only the last value of the query is applied
+SINGLE_FLTR = {"tenancy/contact-assignments": ["content_type"]}
+
+# GraphQL list queries and the endpoint they return
+GQL_LIST = {
+    "tenant_list": "tenancy/tenants",
+    "contact_role_list": "tenancy/contact-roles",
+    "contact_group_list": "tenancy/contact-groups",
+    "contact_list": "tenancy/contacts",
+    "contact_assignment_list": "tenancy/contact-assignments",
+    "site_list": "dcim/sites",
+    "location_list": "dcim/locations",
+    "rack_list": "dcim/racks",
+    "rack_role_list": "dcim/rack-roles",
+    "device_role_list": "dcim/device-roles",
+    "manufacturer_list": "dcim/manufacturers",
+    "platform_list": "dcim/platforms",
+    "device_type_list": "dcim/device-types",
+    "rir_list": "ipam/rirs",
+    "aggregate_list": "ipam/aggregates",
+    "role_list": "ipam/roles",
+    "vlan_group_list": "ipam/vlan-groups",
+    "vrf_list": "ipam/vrfs",
+    "route_target_list": "ipam/route-targets",
+    "vlan_list": "ipam/vlans",
+    "prefix_list": "ipam/prefixes",
+    "circuit_type_list": "circuits/circuit-types",
+    "provider_list": "circuits/providers",
+    "circuit_list": "circuits/circuits",
+    "cluster_type_list": "virtualization/cluster-types",
+    "cluster_group_list": "virtualization/cluster-groups",
+    "cluster_list": "virtualization/clusters",
+    "tag_list": "extras/tags",
+}
+
+
+# ----------------------------------------------------------------------------
+# FAKE_NETBOX: In-memory stand-in for the NetBox REST API mounted as a requests transport adapter
+# ----------------------------------------------------------------------------
+class FakeNetbox(BaseAdapter):
+
+    def __init__(
+        self,
+        latency: float = 0,
+        page_size: int = 50,
+        max_page_size: int = 1000,
+        max_url: int = 4094,
+    ):
+        super().__init__()
+        self.latency = latency
+        # MAX_URL: Longer request URLs are rejected (as gunicorn does with long request lines)
+        self.max_url = max_url
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.db = defaultdict(dict)
+        self.next_id = defaultdict(lambda: 1)
+        self.calls = defaultdict(int)
+
+    # MOUNT: Routes all requests made by a pynetbox api (or Nbox) session to the fake server
+    def mount(self, nb: "pynetbox.api") -> "FakeNetbox":
+        nb.http_session.mount("http://", self)
+        nb.http_session.mount("https://", self)
+        return self
+
+    # COUNT: Total number of requests made, optionally for a single method or endpoint
+    def count(self, method: str = None, api: str = None) -> int:
+        return sum(
+            num
+            for (each_method, each_api), num in self.calls.items()
+            if method in (None, each_method) and api in (None, each_api)
+        )
+
+    # ----------------------------------------------------------------------------
+    # SEND: Entry point called by requests, splits the URL into endpoint, object ID and filters
+    # ----------------------------------------------------------------------------
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlsplit(request.url)
+        path = [x for x in url.path.split("/") if x][1:]
+        qry = parse_qs(url.query, keep_blank_values=True)
+        body = json.loads(request.body) if request.body else None
+        api = "/".join(path[:2])
+        if url.path.rstrip("/").endswith("/graphql"):
+            api = "graphql"
+        self.calls[(request.method, api)] += 1
+
+        if len(request.url) > self.max_url:
+            return self.response(request, 414, {"detail": "Request-URI Too Long"})
+        if api == "graphql":
+            return self.graphql(request, body)
+        if len(path) == 0 or path[0] in ("status", ""):
+            return self.response(request, 200, {"netbox-version": "3.2.0"})
+        obj_id = int(path[2]) if len(path) > 2 and path[2].isdigit() else None
+        if request.method == "GET" and obj_id != None:
+            obj = self.db[api].get(obj_id)
+            return self.response(
+                request, 200 if obj else 404, obj or {"detail": "Not found."}
+            )
+        elif request.method == "GET":
+            return self.list(request, api, qry)
+        elif request.method == "POST":
+            return self.create(request, api, body)
+        elif request.method in ("PATCH", "PUT"):
+            if obj_id != None:
+                body = dict(body, id=obj_id)
+            return self.update(request, api, body)
+        elif request.method == "DELETE":
+            ids = [obj_id] if obj_id != None else [x["id"] for x in body]
+            for each_id in ids:
+                self.db[api].pop(each_id, None)
+            return self.response(request, 204, None)
+        return self.response(request, 405, {"detail": "Method not allowed."})
+
+    # RESPONSE: Builds the requests response object returned to pynetbox
+    def response(self, request, status: int, data: Any) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = status
+        resp.request = request
+        resp.url = request.url
+        resp.headers["Content-Type"] = "application/json"
+        resp.headers["API-Version"] = "3.2"
+        resp._content = json.dumps(data).encode() if data is not None else b""
+        resp.encoding = "utf-8"
+        return resp
+
+    def close(self) -> None:
+        pass
+
+    # ----------------------------------------------------------------------------
+    # LIST: Filters the objects of an endpoint and returns the requested page
+    # ----------------------------------------------------------------------------
+    def list(self, request, api: str, qry: Dict[str, List]) -> requests.Response:
+        limit = int(qry.pop("limit", [self.page_size])[0]) or self.max_page_size
+        limit = min(limit, self.max_page_size)
+        offset = int(qry.pop("offset", [0])[0])
+        qry.pop("brief", None)
+        qry.pop("ordering", None)
+        for key in SINGLE_FLTR.get(api, []):
+            if key in qry:
+                qry[key] = qry[key][-1:]
+        result = [obj for obj in self.db[api].values() if self.match(obj, qry)]
+        page = result[offset : offset + limit]
+        nxt = None
+        if offset + limit < len(result):
+            params = {k: v for k, v in parse_qs(urlsplit(request.url).query).items()}
+            params.update(limit=[limit], offset=[offset + limit])
+            nxt = request.url.split("?")[0] + "?" + urlencode(params, doseq=True)
+        return self.response(
+            request, 200, dict(count=len(result), next=nxt, previous=None, results=page)
+        )
+
+    # MATCH: An object matches if for every filter one of its values matches (AND between filters, OR within)
+    def match(self, obj: Dict[str, Any], qry: Dict[str, List]) -> bool:
+        for key, values in qry.items():
+            if key.endswith("__gte"):
+                if not any(str(obj.get(key[:-5])) >= v for v in values):
+                    return False
+                continue
+            if not any(self.match_value(obj, key, v) for v in values):
+                return False
+        return True
+
+    def match_value(self, obj: Dict[str, Any], key: str, value: str) -> bool:
+        if key == "devicetype_id":
+            key = "device_type_id"
+        if key not in obj and key.endswith("_id"):
+            nested = obj.get(key[:-3])
+            if value == "null":
+                return nested == None
+            return isinstance(nested, dict) and str(nested["id"]) == value
+        field = obj.get(key)
+        if value == "null":
+            return field in (None, "")
+        if isinstance(field, dict):
+            return value in (
+                str(field.get("slug")),
+                str(field.get("name")),
+                str(field.get("id")),
+                str(field.get("value")),
+            )
+        if isinstance(field, list):
+            return any(value in (str(x.get("slug")), str(x.get("name"))) for x in field)
+        return str(field) == value
+
+    # ----------------------------------------------------------------------------
+    # CREATE: Validates and bulk creates objects, errors are a list with an empty dict for valid objects
+    # ----------------------------------------------------------------------------
+    def create(self, request, api: str, body: Any) -> requests.Response:
+        bulk = isinstance(body, list)
+        objs = body if bulk else [body]
+        new_objs, errors = [], []
+        for each_obj in objs:
+            try:
+                new_objs.append(self.build(api, each_obj))
+                errors.append({})
+            except ValueError as e:
+                errors.append(e.args[0])
+        if any(errors):
+            return self.response(request, 400, errors if bulk else errors[0])
+        for each_obj in new_objs:
+            each_obj["id"] = self.next_id[api]
+            each_obj["url"] = f"http://netbox/api/{api}/{each_obj['id']}/"
+            self.next_id[api] += 1
+            self.db[api][each_obj["id"]] = each_obj
+        return self.response(request, 201, new_objs if bulk else new_objs[0])
+
+    # UPDATE: Bulk PATCH of a list of objects (each must have an ID)
+    def update(self, request, api: str, body: Any) -> requests.Response:
+        bulk = isinstance(body, list)
+        result = []
+        for each_obj in body if bulk else [body]:
+            obj = self.db[api].get(each_obj.get("id"))
+            if obj == None:
+                return self.response(request, 404, {"detail": "Not found."})
+            try:
+                # Display is only changed if a field it is made from is updated
+                obj.update(
+                    {
+                        x: y
+                        for x, y in self.build(api, each_obj, validate=False).items()
+                        if x != "display" or y
+                    }
+                )
+            except ValueError as e:
+                return self.response(request, 400, e.args[0])
+            result.append(obj)
+        return self.response(request, 200, result if bulk else result[0])
+
+    # BUILD: Resolves nested objects (dicts of attributes or IDs) into brief nested objects
+    def build(
+        self, api: str, data: Dict[str, Any], validate: bool = True
+    ) -> Dict[str, Any]:
+        obj = {}
+        if validate and api in REQUIRED["slug"] and not data.get("slug"):
+            raise ValueError({"slug": ["This field is required."]})
+        for fld, apis in UNIQUE.items():
+            if validate and api in apis and data.get(fld) != None:
+                if any(
+                    str(x.get(fld)) == str(data[fld]) for x in self.db[api].values()
+                ):
+                    raise ValueError(
+                        {
+                            fld: [
+                                f"{api.split('/')[1][:-1]} with this {fld} already exists."
+                            ]
+                        }
+                    )
+        for key, value in data.items():
+            if key == "id" or (key in FK_API.get(api, {}) and FK_API[api][key] == None):
+                continue
+            if key in FK_LIST and isinstance(value, list):
+                obj[key] = [self.nested(key, FK_LIST[key], x) for x in value]
+            elif (
+                key == "object_id"
+                and isinstance(value, int)
+                and data.get("content_type")
+            ):
+                obj[key] = value
+            elif self.fk_api(api, key) and value not in (None, ""):
+                obj[key] = self.nested(key, self.fk_api(api, key), value)
+            else:
+                obj[key] = value
+        if validate:
+            for key in NULL_FIELDS.get(api, []):
+                obj.setdefault(key, None)
+            obj.setdefault("tags", [])
+            obj.setdefault("description", "")
+        now = datetime.now(timezone.utc).isoformat()
+        obj.setdefault("created", now[:10])
+        obj["last_updated"] = now
+        obj["display"] = str(
+            data.get("name", data.get("prefix", data.get("cid", data.get("model", ""))))
+        )
+        # ASSIGNMENT: Has no name so is displayed by its contact and role (as Netbox does)
+        if isinstance(obj.get("contact"), dict):
+            obj["display"] = obj["contact"]["display"]
+            if isinstance(obj.get("role"), dict):
+                obj["display"] += f" ({obj['role']['display']})"
+        if "name" in obj:
+            obj["name"] = str(obj["name"])
+        return obj
+
+    def fk_api(self, api: str, key: str) -> str:
+        return FK_API.get(api, {}).get(key, FK_FIELD.get(key))
+
+    # NESTED: Looks up the referenced object by ID or attributes and returns its brief representation
+    def nested(self, key: str, api: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, dict) and "id" in value and len(value) > 1:
+            return value
+        if isinstance(value, int):
+            obj = self.db[api].get(value)
+        else:
+            obj = next(
+                (
+                    x
+                    for x in self.db[api].values()
+                    if all(str(x.get(k)) == str(v) for k, v in value.items())
+                ),
+                None,
+            )
+        if obj == None:
+            raise ValueError(
+                {
+                    key: [
+                        f"Related object not found using the provided attributes: {value}"
+                    ]
+                }
+            )
+        brief = dict(id=obj["id"], url=obj["url"], display=obj["display"])
+        for fld in ("name", "slug", "model", "prefix", "cid", "vid", "rd"):
+            if fld in obj:
+                brief[fld] = obj[fld]
+        return brief
+
+    # ----------------------------------------------------------------------------
+    # GRAPHQL: Answers a query of list fields (aliases and nested selections only, no arguments), IDs are strings
+    # ----------------------------------------------------------------------------
+    def graphql(self, request, body: Dict[str, Any]) -> requests.Response:
+        tokens = re.findall(r"[{}]|\w+:?", body["query"])
+        try:
+            selection = self.gql_selection(tokens[1:]) if tokens[0] == "{" else None
+        except (IndexError, KeyError):
+            selection = None
+        if selection == None or any(x[1] not in GQL_LIST for x in selection):
+            return self.response(
+                request, 400, {"errors": [{"message": "Syntax Error"}]}
+            )
+        data = {}
+        for alias, name, fields in selection:
+            data[alias] = [
+                self.gql_value(x, fields) for x in self.db[GQL_LIST[name]].values()
+            ]
+        return self.response(request, 200, {"data": data})
+
+    # GQL_SELECTION: Parses the tokens of a selection set into [(alias, field, sub-selection)], consumes the closing brace
+    def gql_selection(self, tokens: List[str]) -> List:
+        selection = []
+        while True:
+            token = tokens.pop(0)
+            if token == "}":
+                return selection
+            alias = name = token
+            if token.endswith(":"):
+                alias, name = token[:-1], tokens.pop(0)
+            fields = self.gql_selection(tokens[1:]) if tokens[0] == "{" else None
+            if fields != None:
+                del tokens[: self.gql_len(tokens)]
+            selection.append((alias, name, fields))
+
+    # GQL_LEN: Number of tokens up to and including the brace closing the selection set at the start of the tokens
+    def gql_len(self, tokens: List[str]) -> int:
+        depth = 0
+        for idx, token in enumerate(tokens):
+            depth += {"{": 1, "}": -1}.get(token, 0)
+            if depth == 0:
+                return idx + 1
+
+    # GQL_VALUE: Selected fields of an object (content types as app_label and model)
+    def gql_value(self, obj: Any, fields: List) -> Any:
+        if obj == None or fields == None:
+            return obj
+        if isinstance(obj, str) and "." in obj:
+            obj = dict(zip(("app_label", "model"), obj.split(".", 1)))
+        result = {}
+        for alias, name, sub_fields in fields:
+            value = obj.get(name)
+            if name == "id":
+                value = str(value)
+            elif isinstance(value, list):
+                value = [self.gql_value(x, sub_fields) for x in value]
+            else:
+                value = self.gql_value(value, sub_fields)
+            result[alias] = value
+        return result
@@ -0,0 +1,280 @@
+import pytest
+import os
+import sys
+import time
+import math
+import threading
+import types
+import yaml
+import requests
+from collections import defaultdict
+
+from tests.fake_netbox import FakeNetbox
+
+# config.py (Netbox URL and token) is not shared, any values will do for the fake NetBox
+if "config" not in sys.modules:
+    try:
+        import config
+    except ImportError:
+        sys.modules["config"] = types.SimpleNamespace(
+            netbox_url="http://fake_netbox:8000", api_token="0123456789abcdef"
+        )
+import nbox_env_setup
+import netbox
+
+# ----------------------------------------------------------------------------
+# Variables to change dependant on environment
+# ----------------------------------------------------------------------------
+# Size of the generated environment, VLANs and prefixes are 2 * (5 * scale sites) * (10 * scale), 7 is ~10k, 22 is ~100k
+scale = int(os.environ.get("NBOX_BENCH_SCALE", "1"))
+# Simulated latency (seconds) of each fake NetBox API call
+latency = float(os.environ.get("NBOX_BENCH_LATENCY", "0"))
+# Flags (such as workers) the benchmark is run with
+bench_args = os.environ.get("NBOX_BENCH_ARGS", "").split()
+repo_dir = os.path.dirname(os.path.dirname(__file__))
+
+
+# ----------------------------------------------------------------------------
+# Fixture to generate the input file and run main() against the fake NetBox
+# ----------------------------------------------------------------------------
+# Builds an input file of 2 tenants with sites, racks, VLANs, prefixes, circuits, clusters and contact assignments
+def make_input(n_site: int, n_vl: int) -> dict:
+    tag = {"bench": "9e9e9e"}
+    my_vars = dict(rack_role=[{"name": "network"}], device_role=[{"name": "router"}])
+    my_vars["tenant"] = [
+        {
+            "name": f"tnt{t}",
+            "tags": tag,
+            "site": [
+                {
+                    "name": f"site{t}_{s}",
+                    "tags": tag,
+                    "location": [
+                        {
+                            "name": f"loc{t}_{s}",
+                            "rack": [{"name": f"rack{t}_{s}_{r}"} for r in range(5)],
+                        }
+                    ],
+                }
+                for s in range(n_site)
+            ],
+        }
+        for t in range(2)
+    ]
+    my_vars["manufacturer"] = [
+        {"name": "Cisco", "device_type": ["ASA5505.yaml", "PP-Copper-48P-2U.yaml"]}
+    ]
+    my_vars["rir"] = [{"name": "RFC1918", "aggregate": [{"prefix": "10.0.0.0/8"}]}]
+    all_site = []
+    for t in range(2):
+        for s in range(n_site):
+            vrf = dict(
+                name=f"VRF{s % 3}",
+                rd=f"1:{s % 3}",
+                import_rt=[f"1:{s % 3}"],
+                export_rt=[f"1:{s % 3}"],
+            )
+            vrf["prefix"] = [
+                {"pfx": f"10.{t * 100 + s}.{v // 256}.{v % 256}/32", "vl": v + 2}
+                for v in range(n_vl)
+            ]
+            vlan = [{"name": f"VL{v}", "id": v + 2, "tags": tag} for v in range(n_vl)]
+            all_site.append(
+                {
+                    "name": f"site{t}_{s}",
+                    "vlan_grp": [{"name": f"vg{t}_{s}", "vlan": vlan, "vrf": [vrf]}],
+                }
+            )
+    my_vars["role"] = [{"name": "prod", "site": all_site}]
+    my_vars["circuit_type"] = [{"name": "fibre"}]
+    my_vars["provider"] = [
+        {
+            "name": "BT",
+            "circuit": [{"cid": f"c{i}", "type": "fibre"} for i in range(n_site)],
+        }
+    ]
+    my_vars["cluster_group"] = [{"name": "cg"}]
+    my_vars["cluster_type"] = [
+        {
+            "name": "az",
+            "site": "site0_0",
+            "group": "cg",
+            "cluster": [{"name": f"cl{i}"} for i in range(n_site)],
+        }
+    ]
+    my_vars["contact_role"] = [{"name": "ops"}]
+    my_vars["contact_group"] = [
+        {"name": "grp", "contact": [{"name": f"cnt{i}"} for i in range(5)]}
+    ]
+    my_vars["contact_assign"] = [
+        {
+            "assign_to": {"site": f"site0_{s}", "circuit": f"c{s}"},
+            "role": "ops",
+            "contact": [f"cnt{i}" for i in range(5)],
+        }
+        for s in range(n_site)
+    ]
+    return my_vars
+
+
+@pytest.fixture(scope="module")
+def bench_env(tmp_path_factory):
+    input_dir = tmp_path_factory.mktemp("bench_input")
+    with open(os.path.join(input_dir, "bench.yml"), "w") as file_content:
+        yaml.safe_dump(make_input(5 * scale, 10 * scale), file_content)
+    return str(input_dir), FakeNetbox(latency=latency)
+
+
+# Runs main() with all API calls sent to the fake NetBox, returns stdout, API calls per (method, endpoint) and time taken
+def run_main(bench_env, monkeypatch, capsys, args: list = None) -> tuple:
+    input_dir, fake = bench_env
+    monkeypatch.setattr(
+        requests.adapters.HTTPAdapter,
+        "send",
+        lambda self, req, **kw: fake.send(req, **kw),
+    )
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["nbox_env_setup.py", input_dir] + (bench_args if args == None else args),
+    )
+    monkeypatch.setattr(
+        nbox_env_setup, "dvc_type_dir", os.path.join(repo_dir, "device_type")
+    )
+    capsys.readouterr()
+    before = dict(fake.calls)
+    start = time.perf_counter()
+    nbox_env_setup.main()
+    secs = time.perf_counter() - start
+    calls = {
+        x: y - before.get(x, 0)
+        for x, y in fake.calls.items()
+        if y - before.get(x, 0) != 0
+    }
+    return capsys.readouterr().out, calls, secs
+
+
+# Prints the benchmark result (not captured by pytest)
+def print_result(name: str, fake: FakeNetbox, calls: dict, secs: float, capsys) -> None:
+    num_obj = sum(len(x) for x in fake.db.values())
+    with capsys.disabled():
+        print(
+            f"\nBENCH {name}: scale={scale} objects={num_obj} api_calls={sum(calls.values())} time={secs:.2f}s"
+        )
+
+
+# ----------------------------------------------------------------------------
+# 1. BENCHMARK: Full main() pipeline against the fake NetBox, measures API calls and wall time
+# ----------------------------------------------------------------------------
+class TestBenchmark:
+
+    # 1a. BENCH_CREATE: Test all objects are created in an empty NetBox
+    def test_bench_create(self, bench_env, monkeypatch, capsys):
+        err_msg = "❌ bench_create: Creating the benchmark environment failed"
+        stdout, calls, secs = run_main(bench_env, monkeypatch, capsys)
+        fake = bench_env[1]
+        print_result("create", fake, calls, secs, capsys)
+        assert "❌" not in stdout, err_msg
+        # ASSIGNMENT: Assignments are reported by contact and role (the output is wrapped by rich)
+        actual_result = " ".join(stdout.split())
+        assert (
+            "Contact Assignment: 'cnt0 (ops), cnt1 (ops)" in actual_result
+            and ", , " not in actual_result
+        ), err_msg
+        assert len(fake.db["ipam/prefixes"]) == 2 * (5 * scale) * (10 * scale), err_msg
+        assert all(
+            x["vlan"] != None for x in fake.db["ipam/prefixes"].values()
+        ), err_msg
+
+    # 1b. BENCH_RERUN: Test a rerun creates nothing and lists each endpoint once (API calls do not grow with objects)
+    def test_bench_rerun(self, bench_env, monkeypatch, capsys):
+        err_msg = (
+            "❌ bench_rerun: Rerunning against an existing benchmark environment failed"
+        )
+        stdout, calls, secs = run_main(bench_env, monkeypatch, capsys)
+        fake = bench_env[1]
+        print_result("rerun", fake, calls, secs, capsys)
+        assert "❌" not in stdout and "successfully created" not in stdout, err_msg
+        assert all(method == "GET" for method, api in calls), err_msg
+        for (method, api), num in calls.items():
+            pages = math.ceil(max(1, len(fake.db[api])) / fake.max_page_size)
+            assert num <= pages + 1, f"{err_msg} - '{api}' called {num} times"
+
+    # 1c. BENCH_INFLIGHT: Test the API calls in flight at the same time (stages and lookups) are limited to workers
+    def test_bench_inflight(self, bench_env, monkeypatch, capsys):
+        err_msg = (
+            "❌ bench_inflight: Limiting the concurrent API calls to workers failed"
+        )
+        fake = FakeNetbox(latency=0.001)
+        inflight, max_inflight, lock = ([0], [0], threading.Lock())
+        send = fake.send
+
+        def count_send(request, **kwargs):
+            with lock:
+                inflight[0] += 1
+                max_inflight[0] = max(max_inflight[0], inflight[0])
+            try:
+                return send(request, **kwargs)
+            finally:
+                with lock:
+                    inflight[0] -= 1
+
+        monkeypatch.setattr(fake, "send", count_send)
+        stdout, calls, secs = run_main(
+            (bench_env[0], fake), monkeypatch, capsys, ["-w", "1"]
+        )
+        assert "❌" not in stdout and max_inflight[0] == 1, err_msg
+        run_main((bench_env[0], fake), monkeypatch, capsys, ["-w", "4"])
+        assert 1 < max_inflight[0] <= 4, err_msg
+        # PLAN: The snapshot listings are run on the workers (the transport limit alone would hide extra threads)
+        get_obj_cache, active = (netbox.Nbox.get_obj_cache, defaultdict(int))
+
+        # Threads loading an endpoint at the same time (a thread can load an endpoint while loading another)
+        def count_obj_cache(self, api_attr):
+            thread = threading.get_ident()
+            with lock:
+                active[thread] += 1
+                max_inflight[0] = max(max_inflight[0], len(active))
+            try:
+                return get_obj_cache(self, api_attr)
+            finally:
+                with lock:
+                    active[thread] -= 1
+                    if active[thread] == 0:
+                        del active[thread]
+
+        monkeypatch.setattr(netbox.Nbox, "get_obj_cache", count_obj_cache)
+        for workers, expected in [("1", [1]), ("4", [2, 3, 4])]:
+            max_inflight[0] = 0
+            stdout, calls, secs = run_main(
+                (bench_env[0], fake), monkeypatch, capsys, ["--plan", "-w", workers]
+            )
+            assert "Plan" in stdout and max_inflight[0] in expected, err_msg
+
+    # 1d. BENCH_CASSETTE_ARGS: Test a run cannot both record and replay, and the replay latency is only used with replay
+    def test_bench_cassette_args(self, monkeypatch, capsys):
+        err_msg = "❌ arg_parser: Rejecting conflicting record and replay flags failed"
+        for args in [
+            ["--record", "a.gz", "--replay", "b.gz"],
+            ["--record", "a.gz", "--replay-latency", "0.1"],
+        ]:
+            monkeypatch.setattr(sys, "argv", ["nbox_env_setup.py", "example"] + args)
+            with pytest.raises(SystemExit):
+                nbox_env_setup.Inputs().arg_parser()
+            assert "error: argument --replay" in capsys.readouterr().err, err_msg
+        monkeypatch.setattr(
+            sys,
+            "argv",
+            [
+                "nbox_env_setup.py",
+                "example",
+                "--replay",
+                "b.gz",
+                "--replay-latency",
+                "0.1",
+            ],
+        )
+        actual_result = nbox_env_setup.Inputs().arg_parser()
+        assert (
+            actual_result[0]["replay_latency"] == 0.1 and actual_result[1] == "example"
+        ), err_msg
@@ -3,7 +3,8 @@ import yaml
 import os
 from collections import defaultdict
 
-from netbox import Nbox
+from netbox import Nbox, TagRef, RtRef, SiteTntRef
+from tests.fake_netbox import FakeNetbox
 from dm import Organisation
 from dm import Devices
 from dm import Ipam
@@ -24,6 +25,8 @@ dvc_type_dir = os.path.join(test_dir, "test_files")
 token = "0123456789abcdef0123456789abcdef01234567"
 # netbox_url = "http://10.10.10.104:8000"
 netbox_url = "http://10.30.10.104:8000"
+# Set NBOX_FAKE=1 to run the tests against the in-memory fake NetBox rather than a live one
+use_fake = os.environ.get("NBOX_FAKE") == "1"
 
 
 # ----------------------------------------------------------------------------
@@ -37,7 +40,11 @@ def load_vars():
         my_vars = yaml.load(file_content, Loader=yaml.FullLoader)
 
     tag_exists, tag_created, rt_exists, rt_created = ([] for i in range(4))
-    nbox = Nbox(netbox_url, token, tag_exists, tag_created, rt_exists, rt_created)
+    nbox = Nbox(
+        netbox_url, token, False, tag_exists, tag_created, rt_exists, rt_created
+    )
+    if use_fake:
+        FakeNetbox().mount(nbox.nb)
 
 
 # Load the vars for Organisation class
@@ -454,6 +461,26 @@ class TestIpam:
         actual_result = ipam.cr_vrf("UTEST_tenant1", vrf)
         assert actual_result == desired_vrf, err_msg
 
+    # 3f. VRF_REFS: Test a VRF references its tags, RTs and site tenant rather than getting them from Netbox
+    def test_cr_vrf_refs(self):
+        err_msg = "❌ cr_vrf Creation of VRF dictionary references (tags, RTs, site tenant) failed"
+        each_vrf = dict(
+            name="UTEST_ref_vrf",
+            tags={"UTEST_tag": "c0c0c0"},
+            import_rt=["1:1"],
+            export_rt={"1:2": "rt"},
+        )
+        site_tnt = SiteTntRef(role["site"][0]["name"])
+        actual_result = ipam.cr_vrf(site_tnt, each_vrf)
+        assert actual_result["tags"] == TagRef({"UTEST_tag": "c0c0c0"}), err_msg
+        assert actual_result["import_targets"] == RtRef({"1:1": ""}, site_tnt), err_msg
+        assert actual_result["export_targets"] == RtRef(
+            {"1:2": "rt"}, site_tnt
+        ), err_msg
+        assert actual_result["tenant"] == SiteTntRef(
+            site_tnt.site, {"name": site_tnt}
+        ), err_msg
+
     # 3g. VRF_VLAN: Test method for creating dict to add a VRF within VLAN Group
     def test_cr_pfx(self):
         err_msg = "❌ cr_pfx Creation of VRF dictionary (within VLAN Group) failed"
@@ -5,8 +5,12 @@ from pynetbox.core.query import RequestError
 import operator
 from collections import defaultdict
 import os
-from netbox import Nbox
-
+import threading
+import time
+from urllib.parse import urlencode
+import netbox
+from netbox import Nbox, Stage, TagRef, RtRef, SiteTntRef
+from tests.fake_netbox import FakeNetbox
 
 # ----------------------------------------------------------------------------
 # Variables to change dependant on environment
@@ -20,6 +24,8 @@ token = "0123456789abcdef0123456789abcdef01234567"
 # netbox_url = "http://10.10.10.104:8000"
 netbox_url = "http://10.30.10.104:8000"
 # netbox_url = "http://10.103.40.120:8000/"
+# Set NBOX_FAKE=1 to run the tests against the in-memory fake NetBox rather than a live one
+use_fake = os.environ.get("NBOX_FAKE") == "1"
 
 
 # ----------------------------------------------------------------------------
@@ -46,6 +52,10 @@ def load_nbox():
     global nbox, nb, tnt2, cnt_usr, dvc_type, dvc_type1, mftr, vlan, vl_grp, vrf, vrf_rd, pfx, cnt_role, contact, site
     nbox = Nbox(netbox_url, token, False, [], [], [], [])
     nb = pynetbox.api(url=netbox_url, token=token)
+    if use_fake:
+        fake = FakeNetbox()
+        fake.mount(nbox.nb)
+        fake.mount(nb)
 
     # Creates nbox test objects
     tnt2 = my_vars["tenant"][1]["name"]
@@ -204,6 +214,184 @@ class TestNbox:
         )
         assert actual_result == desired_result, err_msg
 
+    # 1b. OBJ_LOOKUP: Test lookup of objects from the cached endpoint (nested ID, nested field and null filters)
+    def test_obj_lookup(self):
+        err_msg = "❌ obj_lookup: Lookup of object in the endpoint cache failed"
+        vrf_id = nb.ipam.vrfs.get(name=vrf).id
+        actual_result = nbox.obj_lookup(
+            "ipam.prefixes", {"prefix": pfx["pfx"], "vrf_id": vrf_id}
+        )
+        assert len(actual_result) == 1, err_msg
+        assert actual_result[0]["vrf"]["id"] == vrf_id, err_msg
+        actual_result = nbox.obj_lookup(
+            "ipam.prefixes", {"prefix": pfx["pfx"], "vrf": None}
+        )
+        assert actual_result[0]["vrf"] == None, err_msg
+        assert nbox.obj_lookup("tenancy.tenants", {"name": "no_tenant"}) == [], err_msg
+        actual_result = nbox.obj_lookup(
+            "ipam.vlans", {"group__name": vl_grp, "vid": vlan["id"]}
+        )
+        assert actual_result[0]["name"] == vlan["name"], err_msg
+
+    # 1b. OBJ_SCOPE: Test only objects within the scope are fetched for a partly fetched endpoint
+    def test_load_obj_scope(self):
+        err_msg = (
+            "❌ load_obj_scope: Fetching the objects of an endpoint within scope failed"
+        )
+        tmp_nbox = Nbox(netbox_url, token, False, [], [], [], [])
+        tmp_nbox.nb.http_session = nbox.nb.http_session
+        tmp_nbox.load_obj_scope("tenancy.tenants", {"name": [tnt2, "no_tenant"]})
+        actual_result = [x["name"] for x in tmp_nbox.obj_cache["tenancy.tenants"]]
+        assert actual_result == [tnt2], err_msg
+        desired_result = {("name", tnt2), ("name", "no_tenant")}
+        assert tmp_nbox.obj_scope["tenancy.tenants"] == desired_result, err_msg
+        assert len(tmp_nbox.obj_lookup("tenancy.tenants", {"name": tnt2})) == 1, err_msg
+
+    # 1b. SCOPE_SINGLE: Test a filter Netbox only applies one value of (assignment content type) is fetched per value
+    def test_load_obj_scope_single(self):
+        err_msg = (
+            "❌ load_obj_scope: Fetching assignments of several content types failed"
+        )
+        tmp_nbox = Nbox(netbox_url, token, False, [], [], [], [])
+        fake = FakeNetbox().mount(tmp_nbox.nb)
+        tmp_nbox.nb.tenancy.tenants.create(name="tnt1", slug="tnt1")
+        tmp_nbox.nb.dcim.sites.create(name="site1", slug="site1")
+        tmp_nbox.nb.tenancy.contacts.create(name="cnt1")
+        tmp_nbox.nb.tenancy.contact_roles.create(name="role1", slug="role1")
+        for content_type in ["tenancy.tenant", "dcim.site"]:
+            tmp_nbox.nb.tenancy.contact_assignments.create(
+                content_type=content_type, object_id=1, contact=1, role=1
+            )
+        calls = fake.count("GET", "tenancy/contact-assignments")
+        tmp_nbox.load_obj_scope(
+            "tenancy.contact-assignments",
+            dict(content_type=["tenancy.tenant", "dcim.site"]),
+        )
+        actual_result = tmp_nbox.obj_cache["tenancy.contact-assignments"]
+        assert sorted(x["content_type"] for x in actual_result) == [
+            "dcim.site",
+            "tenancy.tenant",
+        ], err_msg
+        assert fake.count("GET", "tenancy/contact-assignments") == calls + 2, err_msg
+
+    # 1b. SCOPE_LOOKUP: Test a lookup outside the scope of a partly fetched endpoint fetches its objects
+    def test_scope_lookup(self):
+        err_msg = "❌ scope_lookup: Lookup outside the scope of a partly fetched endpoint failed"
+        tmp_nbox = Nbox(netbox_url, token, False, [], [], [], [])
+        tmp_nbox.nb.http_session = nbox.nb.http_session
+        tmp_nbox.load_obj_scope("tenancy.tenants", {"name": ["no_tenant"]})
+        assert tmp_nbox.obj_cache["tenancy.tenants"] == [], err_msg
+        actual_result = tmp_nbox.obj_lookup(
+            "tenancy.tenants", {"name": tnt2, "group": None}
+        )
+        assert [x["name"] for x in actual_result] == [tnt2], err_msg
+        assert ("name", tnt2) in tmp_nbox.obj_scope["tenancy.tenants"], err_msg
+
+    # 1b. FLTR_CHUNK: Test multi-value filters are split so the URL of each chunk stays under the limit
+    def test_fltr_chunk(self, monkeypatch):
+        err_msg = (
+            "❌ fltr_chunk: Splitting multi-value filter values by URL length failed"
+        )
+        monkeypatch.setattr(netbox, "URL_MAX", 200)
+        url = nbox.nb.tenancy.tenants.url
+        values = [f"UTEST tenant {x}" for x in range(20)] + [tnt2]
+        actual_result = nbox.fltr_chunk(url, "name", values)
+        assert len(actual_result) > 1 and sum(actual_result, []) == values, err_msg
+        for chunk in actual_result:
+            assert (
+                len(url + "?" + urlencode({"name": chunk}, doseq=True))
+                <= 200 - netbox.URL_PAGE
+            ), err_msg
+        # FILTER: Only objects of the DMs are fetched (in chunks) to check existence
+        tmp_nbox = Nbox(netbox_url, token, False, [], [], [], [], strategy="filter")
+        tmp_nbox.nb.http_session = nbox.nb.http_session
+        actual_result = tmp_nbox.obj_check(
+            "tenancy.tenants", "name", [dict(name=x) for x in values]
+        )
+        assert len(actual_result["notexist_dm"]) == 20 and actual_result[
+            "exist_name"
+        ] == [tnt2], err_msg
+        assert [x["name"] for x in tmp_nbox.obj_cache["tenancy.tenants"]] == [
+            tnt2
+        ], err_msg
+
+    # 1b. STRATEGY: Test the existence check strategy with the fewest estimated calls is chosen per endpoint
+    def test_choose_strategy(self, monkeypatch):
+        err_msg = "❌ choose_strategy: Choosing how to fetch objects to check existence failed"
+        monkeypatch.setattr(netbox, "MAX_PAGE_SIZE", 20)
+        tmp_nbox = Nbox(netbox_url, token, False, [], [], [], [], strategy="auto")
+        FakeNetbox().mount(tmp_nbox.nb)
+        tmp_nbox.nb.tenancy.tenants.create(
+            [dict(name=f"tnt{x}", slug=f"tnt{x}") for x in range(120)]
+        )
+        tmp_nbox.nb.ipam.prefixes.create(
+            [dict(prefix="10.0.0.0/24") for x in range(120)]
+        )
+        # FILTER: Few DMs of a large endpoint
+        actual_result = tmp_nbox.obj_check(
+            "tenancy.tenants", "name", [dict(name="tnt1"), dict(name="no_tenant")]
+        )
+        assert actual_result["exist_name"] == ["tnt1"], err_msg
+        assert (
+            tmp_nbox.stats.strategy["tenancy.tenants"]["strategy"] == "filter"
+        ), err_msg
+        assert [x["name"] for x in tmp_nbox.obj_cache["tenancy.tenants"]] == [
+            "tnt1"
+        ], err_msg
+        # POINT: Multi-field check whose filter field matches many objects
+        chk_fltr = dict(prefix="10.0.0.0/24", vrf_id=None)
+        obj_dm = [
+            {"prefix": "10.0.0.0/24", "chk_fltr": chk_fltr, "multi-fltr": "10.0.0.0/24"}
+        ]
+        actual_result = tmp_nbox.obj_check("ipam.prefixes", "multi-fltr", obj_dm)
+        assert actual_result["exist_name"] == ["10.0.0.0/24"], err_msg
+        desired_result = dict(
+            strategy="point", count=120, dm=1, cost=dict(prefetch=4, filter=7, point=1)
+        )
+        assert tmp_nbox.stats.strategy["ipam.prefixes"] == desired_result, err_msg
+        # PREFETCH: All objects fit in the first page
+        actual_result = tmp_nbox.obj_check("ipam.rirs", "name", [dict(name="no_rir")])
+        assert actual_result["notexist_dm"] == [dict(name="no_rir")], err_msg
+        assert (
+            tmp_nbox.stats.summary()["strategy"]["ipam.rirs"]["strategy"] == "prefetch"
+        ), err_msg
+
+    # 1b. STRATEGY_PAGES: Test the prefetch gets every object if Netbox caps the page size below MAX_PAGE_SIZE
+    def test_choose_strategy_pages(self):
+        err_msg = "❌ choose_strategy: Prefetching all objects with a smaller Netbox max page size failed"
+        tmp_nbox = Nbox(
+            netbox_url, token, False, [], [], [], [], workers=4, strategy="auto"
+        )
+        FakeNetbox(max_page_size=30).mount(tmp_nbox.nb)
+        tmp_nbox.nb.tenancy.tenants.create(
+            [dict(name=f"tnt{x}", slug=f"tnt{x}") for x in range(135)]
+        )
+        actual_result = tmp_nbox.obj_check(
+            "tenancy.tenants", "name", [dict(name="tnt134")]
+        )
+        assert actual_result["exist_name"] == ["tnt134"], err_msg
+        assert (
+            tmp_nbox.stats.strategy["tenancy.tenants"]["strategy"] == "prefetch"
+        ), err_msg
+        actual_result = [x["name"] for x in tmp_nbox.obj_cache["tenancy.tenants"]]
+        assert actual_result == [f"tnt{x}" for x in range(135)], err_msg
+
+    # 1b. PREFETCH: Test the objects of several endpoints are fetched with one GraphQL query (IDs as integers)
+    def test_prefetch(self):
+        err_msg = "❌ prefetch: Fetching the objects of endpoints using GraphQL failed"
+        tmp_nbox = Nbox(netbox_url, token, False, [], [], [], [], graphql=True)
+        tmp_nbox.nb.http_session = nbox.nb.http_session
+        tmp_nbox.prefetch("tenancy.tenants", "extras.tags")
+        actual_result = tmp_nbox.obj_lookup("tenancy.tenants", {"name": tnt2})
+        assert len(actual_result) == 1 and isinstance(
+            actual_result[0]["id"], int
+        ), err_msg
+        assert tmp_nbox.obj_cache.get("extras.tags") != None, err_msg
+        # Already cached endpoints are not fetched again
+        tmp_nbox.obj_cache["tenancy.tenants"] = []
+        tmp_nbox.prefetch("tenancy.tenants")
+        assert tmp_nbox.obj_cache["tenancy.tenants"] == [], err_msg
+
     # 1c. OBJ_CREATE_ERR: Test object creation failure error reporting works
     def test_obj_create_err(self, capsys):
         err_msg = "❌ obj_create: Netbox object creation error reporting failed"
@@ -237,6 +425,300 @@ class TestNbox:
             pass
         assert capsys.readouterr().out == desired_result, err_msg
 
+    # 1d. OBJ_BATCH: Test splitting objects into bulk create batches by number and payload size
+    def test_obj_batch(self):
+        err_msg = "❌ obj_batch: Splitting objects into batches failed"
+        obj_dm = [{"name": "x" * 10}, {"name": "y" * 10}, {"name": "z" * 30}]
+        nbox.batch_size, nbox.batch_bytes = (2, 0)
+        assert nbox.obj_batch(obj_dm) == [obj_dm[:2], obj_dm[2:]], err_msg
+        nbox.batch_size, nbox.batch_bytes = (0, 50)
+        assert nbox.obj_batch(obj_dm) == [obj_dm[:2], obj_dm[2:]], err_msg
+        nbox.batch_size, nbox.batch_bytes = (0, 0)
+        assert nbox.obj_batch(obj_dm) == [obj_dm], err_msg
+
+    # 1d. SAME_VALUE: Test comparing DM values with Netbox values (choices, nested objects, ID lists and decimals)
+    def test_same_value(self):
+        err_msg = "❌ same_value: Comparing DM and Netbox object values failed"
+        assert nbox.same_value(
+            "active", {"value": "active", "label": "Active"}
+        ), err_msg
+        assert nbox.same_value(
+            {"name": tnt2}, {"id": 1, "name": tnt2, "slug": "x"}
+        ), err_msg
+        assert not nbox.same_value({"name": tnt2}, None), err_msg
+        assert nbox.same_value(3, {"id": 3, "name": "x"}), err_msg
+        assert nbox.same_value([2, 1], [{"id": 1}, {"id": 2}]), err_msg
+        assert not nbox.same_value([1], [{"id": 1}, {"id": 2}]), err_msg
+        assert nbox.same_value(1, 1.0) and not nbox.same_value("a", "b"), err_msg
+
+    # 1d. OBJ_UPDATE: Test only existing objects that differ from their DM are updated (changed fields only)
+    def test_obj_update(self, capsys):
+        err_msg = (
+            "❌ obj_update: Updating existing objects that differ from their DM failed"
+        )
+        tnt_dm = [
+            {
+                "name": tnt2,
+                "slug": make_slug(tnt2),
+                "description": "UTEST updated",
+                "tenant_group": None,
+            }
+        ]
+        assert (
+            nbox.obj_update("Tenant", "tenancy.tenants", "name", tnt_dm, [tnt2]) == []
+        ), err_msg
+        assert nb.tenancy.tenants.get(name=tnt2).description == "UTEST updated", err_msg
+        assert "successfully updated" in capsys.readouterr().out, err_msg
+        assert nbox.obj_update("Tenant", "tenancy.tenants", "name", tnt_dm, [tnt2]) == [
+            tnt2
+        ], err_msg
+        assert capsys.readouterr().out == "", err_msg
+
+    # 1d. OBJ_UPDATE_SAME_NAME: Test only the updated object leaves the exist list, not others with the same name
+    def test_obj_update_same_name(self, capsys):
+        err_msg = "❌ obj_update: Keeping unchanged objects with the same name as an updated one failed"
+        tmp_nbox = Nbox(netbox_url, token, False, [], [], [], [], update=True)
+        FakeNetbox().mount(tmp_nbox.nb)
+        for grp in ["grp1", "grp2"]:
+            grp_id = tmp_nbox.nb.ipam.vlan_groups.create(name=grp, slug=grp).id
+            tmp_nbox.nb.ipam.vlans.create(name="VL0", vid=10, group=grp_id)
+        vlan_dm = [
+            dict(name="VL0", vid=10, group=dict(name=grp), description=descr, tags=[])
+            for grp, descr in [("grp1", "UTEST updated"), ("grp2", None)]
+        ]
+        tmp_nbox.engine(
+            "VLAN", ["ipam.vlans", "ipam.vlan_groups"], ["name", "group_id"], vlan_dm
+        )
+        actual_result = capsys.readouterr().out
+        assert "VLAN: 'VL0' successfully updated" in actual_result, err_msg
+        assert "VLAN: 'VL0' already exist" in actual_result, err_msg
+
+    # 1d. PLAN: Test a dry-run counts the objects and tags to create (made up IDs) without creating them in Netbox
+    def test_plan(self):
+        err_msg = "❌ plan: Dry-run of object and tag creation failed"
+        tmp_nbox = Nbox(netbox_url, token, False, [], [], [], [], plan=True)
+        tmp_nbox.nb.http_session = nbox.nb.http_session
+        tmp_nbox.stats.stage("ORG")
+        tmp_nbox.create_tags({"plan_tag": "9e9e9e"})
+        assert tmp_nbox.tag_index["plan_tag"] < 0, err_msg
+        plan_tnt = [
+            {"name": "plan_tnt", "slug": "plan_tnt"},
+            {"name": "plan_tnt2", "slug": "plan_tnt2"},
+        ]
+        tmp_nbox.obj_create("Tenant", "tenancy.tenants", plan_tnt, [tnt2])
+        assert (
+            tmp_nbox.obj_lookup("tenancy.tenants", {"name": "plan_tnt"})[0]["id"] < 0
+        ), err_msg
+        assert dict(tmp_nbox.plan_result) == {
+            ("ORG", "Tags"): [1, 0, 0, 1],
+            ("ORG", "Tenant"): [2, 0, 1, 1],
+        }, err_msg
+        assert nbox.nb.tenancy.tenants.get(name="plan_tnt") == None, err_msg
+        assert nbox.nb.extras.tags.get(name="plan_tag") == None, err_msg
+
+    # 1d. RUN_STAGES: Test independent stages run at the same time, dependants wait and the output stays in registry order
+    def test_run_stages(self, capsys):
+        err_msg = "❌ run_stages: Running the stage registry concurrently failed"
+        tmp_nbox = Nbox(netbox_url, token, False, [], [], [], [], workers=2, plan=True)
+        started, rr_started = ([], threading.Event())
+
+        def run_stage(each_stage):
+            started.append(each_stage.name)
+            # Tenant can only finish once the (independent) Rack Role has started
+            if each_stage.name == "Rack Role":
+                rr_started.set()
+            elif each_stage.name == "Tenant":
+                assert rr_started.wait(5), err_msg
+            tmp_nbox.rc.print(each_stage.name)
+
+        all_stage = [
+            Stage("ORG", "Tenant", "tenancy.tenants", "name", []),
+            Stage("ORG", "Site", "dcim.sites", "name", [], ["Tenant", "Not Run"]),
+            Stage("ORG", "Rack Role", "dcim.rack_roles", "name", []),
+        ]
+        tmp_nbox.run_stages(all_stage, run_stage)
+        assert started.index("Site") > started.index("Tenant"), err_msg
+        assert capsys.readouterr().out == "Tenant\nSite\nRack Role\n", err_msg
+        assert list(tmp_nbox.stats.summary()["stages"]) == started, err_msg
+
+    # 1d. RUN_STAGES_ERR: Test stages depending on a failed stage are not run and the error is raised after the output
+    def test_run_stages_err(self, capsys):
+        err_msg = "❌ run_stages: Stopping the stage registry on a failed stage failed"
+        tmp_nbox = Nbox(netbox_url, token, False, [], [], [], [], plan=True)
+        started = []
+
+        def run_stage(each_stage):
+            started.append(each_stage.name)
+            tmp_nbox.rc.print(each_stage.name)
+            if each_stage.name == "Tenant":
+                raise SystemExit(1)
+
+        all_stage = [
+            Stage("ORG", "Tenant", "tenancy.tenants", "name", []),
+            Stage("ORG", "Site", "dcim.sites", "name", [], ["Tenant"]),
+        ]
+        with pytest.raises(SystemExit):
+            tmp_nbox.run_stages(all_stage, run_stage)
+        assert started == ["Tenant"], err_msg
+        assert capsys.readouterr().out == "Tenant\n", err_msg
+
+    # 1d. STAGE_DEPS: Test the stages creating objects of the content types of contact assignments are found by endpoint
+    def test_stage_deps(self):
+        err_msg = "❌ stage_deps: Getting the stages that create the objects of an endpoint failed"
+        all_stage = [
+            Stage("ORG", "Location (parent)", "dcim.locations", "slug", []),
+            Stage(
+                "ORG",
+                "Location (child)",
+                "dcim.locations",
+                "slug",
+                [],
+                ["Location (parent)"],
+            ),
+            Stage("DVC", "Platform", "dcim.platforms", "name", []),
+            Stage("DVC", "Device-role", "dcim.device_roles", "name", []),
+            Stage("IPAM", "Route-Targets", None, None, None),
+            Stage(
+                "IPAM",
+                "VLAN",
+                ["ipam.vlans", "ipam.vlan_groups"],
+                ["name", "group_id"],
+                [],
+            ),
+            Stage(
+                "VIRTUAL", "Cluster Group", "virtualization.cluster-groups", "name", []
+            ),
+        ]
+        content_type = [
+            "dcim.location",
+            "dcim.platform",
+            "virtualization.clustergroup",
+            "tenancy.tenant",
+        ]
+        actual_result = nbox.stage_deps(
+            all_stage, [nbox.asgn_api(x) for x in content_type]
+        )
+        assert actual_result == [
+            "Location (parent)",
+            "Location (child)",
+            "Platform",
+            "Cluster Group",
+        ], err_msg
+        assert nbox.stage_deps(all_stage, ["ipam.vlans", "dcim.device-roles"]) == [
+            "Device-role",
+            "VLAN",
+        ], err_msg
+
+    # 1d. POOL_MAP: Test per-object results and errors keep the input order when run by the workers
+    def test_pool_map(self):
+        err_msg = "❌ pool_map: Keeping the input order of concurrent results and errors failed"
+        tmp_nbox = Nbox(netbox_url, token, False, [], [], [], [], workers=4)
+
+        # Later objects finish first so the results come back out of order
+        def get_obj(each_obj_dm, each_err):
+            time.sleep(0.01 * (6 - each_obj_dm))
+            if each_obj_dm % 2 == 1:
+                each_err[f"grp{each_obj_dm % 3}"].append(str(each_obj_dm))
+            return each_obj_dm * 10
+
+        desired_result = {"grp1": ["1"], "grp0": ["3"], "grp2": ["5"]}
+        error = defaultdict(list)
+        assert tmp_nbox.pool_map(get_obj, list(range(6)), error) == [
+            0,
+            10,
+            20,
+            30,
+            40,
+            50,
+        ], err_msg
+        assert error == desired_result and list(error) == list(desired_result), err_msg
+        error = []
+        assert (
+            tmp_nbox.pool_map(lambda x, y: y.append(x), ["a", "b", "c"], error)
+            == [None] * 3
+        ), err_msg
+        assert error == ["a", "b", "c"], err_msg
+
+    # 1d. POOL_MAP_ERR: Test the errors of objects checked by the workers are merged and reported as when run one at a time
+    def test_pool_map_err(self, capsys):
+        err_msg = "❌ pool_map: Merging the errors of concurrent object checks failed"
+        vlan_dm = [
+            dict(
+                vid=100 + x,
+                name=f"UTEST_vl{x}",
+                group=dict(name=f"no_vlgrp{x % 2}"),
+                tags=[],
+            )
+            for x in range(6)
+        ]
+        asgn_dm = [
+            dict(
+                content_type="tenancy.tenant",
+                object_id=f"no_tenant{x}",
+                contact=[contact],
+                role={"name": "x"},
+            )
+            for x in range(4)
+        ]
+        all_output = []
+        for workers in [1, 4]:
+            tmp_nbox = Nbox(
+                netbox_url,
+                token,
+                False,
+                [],
+                [],
+                [],
+                [],
+                workers=workers,
+                plan=True,
+            )
+            tmp_nbox.nb.http_session = nbox.nb.http_session
+            tmp_nbox.engine(
+                "VLAN",
+                ["ipam.vlans", "ipam.vlan_groups"],
+                ["name", "group_id"],
+                [dict(x) for x in vlan_dm],
+            )
+            tmp_nbox.engine(
+                "Contact Assignment",
+                "tenancy.contact-assignments",
+                "multi-fltr",
+                [dict(x) for x in asgn_dm],
+            )
+            all_output.append(capsys.readouterr().out)
+        assert all_output[0] == all_output[1], err_msg
+        # Joined as long messages are wrapped by the console
+        actual_result = " ".join(all_output[0].split())
+        assert (
+            "VLAN: UTEST_vl0, UTEST_vl2, UTEST_vl4 - The vlan_group 'no_vlgrp0'"
+            in actual_result
+        ), err_msg
+        assert (
+            "'tenant - no_tenant0, tenant - no_tenant1, tenant - no_tenant2, tenant - no_tenant3'"
+            in actual_result
+        ), err_msg
+
+    # 1d. NESTED_IDS: Test nested parent references are swapped for IDs, unknown parents and unmapped fields are left as is
+    def test_nested_ids(self):
+        err_msg = "❌ nested_ids: Replacing nested parent references with IDs failed"
+        obj_dm = dict(
+            name="UTEST_rack",
+            site={"name": site},
+            tenant={"name": tnt2},
+            location={"slug": "UTEST_no_location"},
+            role=None,
+            tags=[],
+        )
+        actual_result = nbox.nested_ids("dcim.racks", obj_dm)
+        assert actual_result["site"] == nb.dcim.sites.get(name=site).id, err_msg
+        assert actual_result["tenant"] == nb.tenancy.tenants.get(name=tnt2).id, err_msg
+        assert (
+            actual_result["location"] == {"slug": "UTEST_no_location"}
+            and actual_result["role"] == None
+        ), err_msg
+        assert obj_dm["site"] == {"name": site}, err_msg
+
     # 1d. MERGE_ERR_DICT: Test merges dictionaires for dev_type component error messages
     def test_merge_dict(self):
         err_msg = "❌ merge_dict: dev_type component error messages dict merge failed"
@@ -283,6 +765,13 @@ class TestNbox:
         actual_result = nbox.dev_type_comp_create(conn, "Device-type")
         assert actual_result == desired_result, err_msg
 
+    # 1e. GET_RPORT_ID: Test getting all rear-port IDs of a device_type (by slug) in one call
+    def test_get_rport_id(self):
+        err_msg = "❌ get_rport_id: Gathering rear-port IDs of the device_type failed"
+        desired_result = ["1", "2"]
+        actual_result = nbox.get_rport_id(dict(slug=make_slug(dvc_type)))
+        assert sorted(actual_result.keys()) == desired_result, err_msg
+
     # 1f. DEV_TYPE_CREATE: Test adding device_type and connections
     def test_dev_type_create(self, capsys):
         err_msg = "❌ dev_type_create: dev_type component (interface) addition failed"
@@ -361,6 +850,23 @@ class TestNbox:
         )
         assert error == desired_result, err_msg
 
+    # 1i. OBJ_ID: Test parent object IDs (and not found) are cached by endpoint, name and RD
+    def test_get_obj_id(self):
+        err_msg = "❌ get_obj_id: Caching of VRF ID or VRF not found failed"
+        vrf_id = nb.ipam.vrfs.get(name=vrf).id
+        assert (
+            nbox.get_obj_id("ipam.vrfs", dict(name=vrf, rd=vrf_rd)) == vrf_id
+        ), err_msg
+        assert (
+            nbox.get_obj_id("ipam.vrfs", dict(name="no_vrf", rd="no_rd")) == None
+        ), err_msg
+        desired_result = {
+            ("ipam.vrfs", vrf, vrf_rd): vrf_id,
+            ("ipam.vrfs", "no_vrf", "no_rd"): None,
+        }
+        actual_result = {x: y for x, y in nbox.id_cache.items() if x[0] == "ipam.vrfs"}
+        assert actual_result == desired_result, err_msg
+
     # 1j. VL_PFX: Test getting unique VLAN ID to be used by a prefix
     def test_get_vl_pfx_id(self):
         err_msg = "❌ get_vl_pfx_id: Gathering VLAN ID (to be used by a prefix) failed"
@@ -442,6 +948,25 @@ class TestNbox:
         nbox.get_cnt_asgn_id(asgn_dict, "name", error)
         assert error == desired_result, err_msg
 
+    # 1n. ASGN_ID_SLUG: Test getting ID of object to assign contact to by slug if no object has that name
+    def test_get_asgn_id_slug(self):
+        err_msg = (
+            "❌ get_asgn_id: Gathering ID of object to assign contact using slug failed"
+        )
+        asgn_dict = {
+            "content_type": "tenancy.tenant",
+            "object_id": make_slug(tnt2),
+            "contact": [contact],
+            "role": {"name": cnt_role["name"]},
+            "priority": "primary",
+        }
+        error = []
+        actual_result = nbox.get_asgn_id(asgn_dict, error)
+        assert (
+            actual_result[0].get("object_id") == nb.tenancy.tenants.get(name=tnt2).id
+        ), err_msg
+        assert error == [], err_msg
+
     # 1m. TAG: Test creating tag or getting existing tag ID
     def test_get_or_create_tag(self):
         err_msg = "❌ get_or_create_tag: Creation of tag or checking for existence of tag failed"
@@ -450,6 +975,52 @@ class TestNbox:
         # Run twice as first create, then second time make sure can get the ID
         assert isinstance(actual_result[0], int), err_msg
 
+    # 1m. CREATE_TAGS: Test a tag used by several DMs is created once (all new tags in one bulk call), existing tags are not
+    def test_create_tags(self):
+        err_msg = (
+            "❌ create_tags: Creating all new tags of the DMs in one bulk call failed"
+        )
+        tmp_nbox = Nbox(netbox_url, token, False, [], [], [], [])
+        fake = FakeNetbox().mount(tmp_nbox.nb)
+        exist_id = tmp_nbox.nb.extras.tags.create(
+            name="UTEST_tag_exist", slug="utest_tag_exist", color="c0c0c0"
+        ).id
+        calls = fake.count("POST", "extras/tags")
+        all_dm = dict(
+            tnt=[
+                dict(
+                    name="tnt1",
+                    tags=TagRef({"UTEST_tag1": "c0c0c0", "UTEST_tag_exist": "c0c0c0"}),
+                ),
+                dict(
+                    name="tnt2",
+                    tags=TagRef({"UTEST_tag1": "c0c0c0", "UTEST_tag2": "ff0000"}),
+                ),
+            ],
+            site=[dict(name="site1", tags=TagRef({"UTEST_tag2": "ff0000"}))],
+        )
+        tmp_nbox.resolve_tags(all_dm)
+        assert fake.count("POST", "extras/tags") == calls + 1, err_msg
+        assert tmp_nbox.tag_created == ["UTEST_tag1", "UTEST_tag2"], err_msg
+        assert (
+            tmp_nbox.tag_exists == ["UTEST_tag_exist"]
+            and len(fake.db["extras/tags"]) == 3
+        ), err_msg
+        tag1, tag2 = (
+            tmp_nbox.tag_index["UTEST_tag1"],
+            tmp_nbox.tag_index["UTEST_tag2"],
+        )
+        assert [x["tags"] for x in all_dm["tnt"]] == [
+            [tag1, exist_id],
+            [tag1, tag2],
+        ], err_msg
+        assert all_dm["site"][0]["tags"] == [tag2], err_msg
+        # Tags now in the registry are not created again
+        tmp_nbox.resolve_tags(
+            dict(tnt=[dict(name="tnt3", tags=TagRef({"UTEST_tag1": "c0c0c0"}))])
+        )
+        assert fake.count("POST", "extras/tags") == calls + 1, err_msg
+
     # 1o. RT_LIST: Test creating RT or getting existing tag ID (list input)
     def test_get_or_create_rt_list(self):
         err_msg = "❌ get_or_create_rt: Creation of RT (with a list) or checking for existence of RT failed"
@@ -470,6 +1041,79 @@ class TestNbox:
         # Run twice as first create, then second time make sure can get the ID
         assert isinstance(actual_result[0], int), err_msg
 
+    # 1p. CREATE_RTS: Test RTs shared by VRFs are created once in one bulk call, run as a stage before the VRFs that use them
+    def test_create_rts(self):
+        err_msg = (
+            "❌ create_rts: Creating all new RTs of the VRFs in one bulk call failed"
+        )
+        tmp_nbox = Nbox(netbox_url, token, False, [], [], [], [], workers=4)
+        fake = FakeNetbox().mount(tmp_nbox.nb)
+        all_event = []
+        fake_send = fake.send
+
+        def send(request, **kwargs):
+            if request.method == "POST":
+                all_event.append(request.path_url.split("/")[3])
+            return fake_send(request, **kwargs)
+
+        fake.send = send
+        all_dm = dict(
+            vrf=[
+                dict(
+                    name="UTEST_vrf1",
+                    rd="65000:1",
+                    import_targets=RtRef({"65000:1": "", "65000:2": "shared"}, None),
+                    export_targets=RtRef({"65000:1": ""}, None),
+                ),
+                dict(
+                    name="UTEST_vrf2",
+                    rd="65000:2",
+                    import_targets=RtRef({"65000:2": "shared", "65000:1": ""}, None),
+                    export_targets=RtRef({"65000:2": "shared"}, None),
+                ),
+            ]
+        )
+
+        # The RT stage is slowed down so a VRF stage not waiting for it would start first
+        def run_stage(each_stage):
+            all_event.append(f"start {each_stage.name}")
+            if each_stage.name == "Route-Targets":
+                time.sleep(0.05)
+                tmp_nbox.resolve_rts(all_dm)
+            else:
+                tmp_nbox.engine(
+                    each_stage.name,
+                    each_stage.api_attr,
+                    each_stage.obj_fltr,
+                    all_dm["vrf"],
+                )
+
+        all_stage = [
+            Stage("IPAM", "VRF", "ipam.vrfs", "name", "vrf", ["Route-Targets"]),
+            Stage("IPAM", "Route-Targets", None, None, None),
+        ]
+        tmp_nbox.run_stages(all_stage, run_stage)
+        assert all_event == [
+            "start Route-Targets",
+            "route-targets",
+            "start VRF",
+            "vrfs",
+        ], err_msg
+        assert (
+            tmp_nbox.rt_created == ["65000:1", "65000:2"]
+            and len(fake.db["ipam/route-targets"]) == 2
+        ), err_msg
+        rt1, rt2 = (tmp_nbox.rt_index["65000:1"], tmp_nbox.rt_index["65000:2"])
+        assert [x["import_targets"] for x in all_dm["vrf"]] == [
+            [rt1, rt2],
+            [rt2, rt1],
+        ], err_msg
+        actual_result = {
+            x["name"]: [y["id"] for y in x["export_targets"]]
+            for x in fake.db["ipam/vrfs"].values()
+        }
+        assert actual_result == {"UTEST_vrf1": [rt1], "UTEST_vrf2": [rt2]}, err_msg
+
     # 1q. SLUG: Test creating slug from object name
     def test_make_slug(self):
         err_msg = "❌ make_slug: Creation of slug from object name failed"
@@ -484,6 +1128,58 @@ class TestNbox:
         actual_result = nbox.get_tnt(my_vars["role"][0]["site"][0]["name"])
         assert actual_result == desired_result, err_msg
 
+    # 1r. GET_TNT_INPUT: Test getting tenant for a site not yet in netbox from the site DM
+    def test_get_tnt_input(self):
+        err_msg = "❌ get_tnt: Getting tenant name from a site in the input file failed"
+        nbox.add_site_tnt([{"name": "UTEST_no_site", "tenant": {"name": tnt2}}])
+        assert nbox.get_tnt("UTEST_no_site") == tnt2, err_msg
+        assert nbox.get_tnt("UTEST_no_site2") == None, err_msg
+
+    # 1r. RESOLVE: Test the tag, site tenant and RT references of DMs are swapped for IDs/names (new ones created in bulk)
+    def test_resolve_refs(self):
+        err_msg = "❌ resolve: Resolving the references of the DMs failed"
+        nbox.add_site_tnt(
+            [
+                {"name": "UTEST_ref_site", "tenant": {"name": tnt2}},
+                {"name": "UTEST_ref_site2"},
+            ]
+        )
+        all_dm = dict(
+            vrf=[
+                dict(
+                    tags=TagRef({"UTEST_ref_tag": "c0c0c0"}),
+                    tenant=nbox.name_none(
+                        SiteTntRef("UTEST_ref_site"),
+                        {"name": SiteTntRef("UTEST_ref_site")},
+                    ),
+                    import_targets=RtRef(
+                        {"UTEST3:RT": "test"}, SiteTntRef("UTEST_ref_site")
+                    ),
+                ),
+                dict(
+                    tags=[],
+                    tenant=nbox.name_none(
+                        SiteTntRef("UTEST_ref_site2"), {"name": "ignored"}
+                    ),
+                ),
+            ]
+        )
+        nbox.resolve_tags(all_dm)
+        nbox.resolve_site_tnt(all_dm)
+        nbox.resolve_rts(all_dm)
+        actual_result = all_dm["vrf"]
+        assert actual_result[0]["tags"] == [
+            nb.extras.tags.get(name="UTEST_ref_tag").id
+        ], err_msg
+        assert (
+            actual_result[0]["tenant"] == {"name": tnt2}
+            and actual_result[1]["tenant"] == None
+        ), err_msg
+        rt = nb.ipam.route_targets.get(name="UTEST3:RT")
+        assert (
+            actual_result[0]["import_targets"] == [rt.id] and rt.tenant.name == tnt2
+        ), err_msg
+
     # 1s. NAME_NONE: Test name from netbox api filter if its value is None
     def test_name_none(self):
         err_msg = "❌ name_none: Removing netbox api filter if None failed"
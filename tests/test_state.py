@@ -0,0 +1,127 @@
+import pytest
+import pynetbox
+from state import StateCache, PAGE_SIZE
+from tests.fake_netbox import FakeNetbox
+
+
+# ----------------------------------------------------------------------------
+# Fixture of a pynetbox api connected to the fake NetBox (with 2 tenants) and the path of an empty state cache file
+# ----------------------------------------------------------------------------
+@pytest.fixture
+def fake_nb(tmp_path):
+    nb = pynetbox.api("http://fake_netbox:8000", token="0123456789abcdef")
+    fake = FakeNetbox().mount(nb)
+    nb.tenancy.tenants.create(
+        [{"name": "tnt1", "slug": "tnt1"}, {"name": "tnt2", "slug": "tnt2"}]
+    )
+    return nb, fake, str(tmp_path / "state.db")
+
+
+# ----------------------------------------------------------------------------
+# 1. STATE_CACHE: Testing of the persistent endpoint cache and its incremental sync
+# ----------------------------------------------------------------------------
+class TestStateCache:
+
+    # 1a. SYNC_FULL: Test the first sync fetches all objects and keeps them in the file
+    def test_sync_full(self, fake_nb):
+        err_msg = "❌ sync: First sync of all the objects of an endpoint failed"
+        nb, fake, filename = fake_nb
+        all_obj = StateCache(filename, nb.base_url).sync(
+            "tenancy.tenants", nb.tenancy.tenants
+        )
+        assert [x["name"] for x in all_obj] == ["tnt1", "tnt2"], err_msg
+        actual_result = StateCache(filename, nb.base_url).load("tenancy.tenants")
+        assert sorted(x["name"] for x in actual_result.values()) == [
+            "tnt1",
+            "tnt2",
+        ], err_msg
+
+    # 1b. SYNC_CHANGES: Test a later sync only fetches objects updated since (new and changed objects are added), the
+    # first page gives the number of objects
+    def test_sync_changes(self, fake_nb, monkeypatch):
+        err_msg = (
+            "❌ sync: Incremental sync of the changed objects of an endpoint failed"
+        )
+        nb, fake, filename = fake_nb
+        nb.tenancy.tenants.create(
+            [{"name": f"tnt{x}", "slug": f"tnt{x}"} for x in range(3, PAGE_SIZE + 2)]
+        )
+        StateCache(filename, nb.base_url).sync("tenancy.tenants", nb.tenancy.tenants)
+        nb.tenancy.tenants.create({"name": "tnt_new", "slug": "tnt_new"})
+        urls = []
+        send = fake.send
+        monkeypatch.setattr(
+            fake, "send", lambda req, **kw: urls.append(req.url) or send(req, **kw)
+        )
+        all_obj = StateCache(filename, nb.base_url).sync(
+            "tenancy.tenants", nb.tenancy.tenants
+        )
+        assert (
+            len(all_obj) == PAGE_SIZE + 2 and all_obj[-1]["name"] == "tnt_new"
+        ), err_msg
+        assert (
+            f"limit={PAGE_SIZE}" in urls[0]
+            and "last_updated__gte" in urls[1]
+            and len(urls) == 2
+        ), err_msg
+
+    # 1b. SYNC_SMALL: Test a later sync of an endpoint whose objects fit in the first page makes only that one call
+    def test_sync_small(self, fake_nb, monkeypatch):
+        err_msg = "❌ sync: Syncing an endpoint with fewer objects than a page in one call failed"
+        nb, fake, filename = fake_nb
+        StateCache(filename, nb.base_url).sync("tenancy.tenants", nb.tenancy.tenants)
+        nb.tenancy.tenants.create({"name": "tnt3", "slug": "tnt3"})
+        fake.db["tenancy/tenants"].pop(1)
+        calls = fake.count()
+        all_obj = StateCache(filename, nb.base_url).sync(
+            "tenancy.tenants", nb.tenancy.tenants
+        )
+        assert [x["name"] for x in all_obj] == [
+            "tnt2",
+            "tnt3",
+        ] and fake.count() == calls + 1, err_msg
+        actual_result = StateCache(filename, nb.base_url).load("tenancy.tenants")
+        assert sorted(x["name"] for x in actual_result.values()) == [
+            "tnt2",
+            "tnt3",
+        ], err_msg
+
+    # 1c. SYNC_DELETE: Test objects deleted in Netbox are removed (count differs so all objects are fetched again)
+    def test_sync_delete(self, fake_nb):
+        err_msg = "❌ sync: Removing objects deleted in Netbox from the cache failed"
+        nb, fake, filename = fake_nb
+        nb.tenancy.tenants.create(
+            [{"name": f"tnt{x}", "slug": f"tnt{x}"} for x in range(3, PAGE_SIZE + 2)]
+        )
+        StateCache(filename, nb.base_url).sync("tenancy.tenants", nb.tenancy.tenants)
+        fake.db["tenancy/tenants"].pop(1)
+        all_obj = StateCache(filename, nb.base_url).sync(
+            "tenancy.tenants", nb.tenancy.tenants
+        )
+        assert len(all_obj) == PAGE_SIZE and "tnt1" not in [
+            x["name"] for x in all_obj
+        ], err_msg
+
+    # 1d. SAVE_CREATED: Test created objects are kept without moving the sync point on
+    def test_save_created(self, fake_nb):
+        err_msg = "❌ save: Adding created objects to the cache failed"
+        nb, fake, filename = fake_nb
+        state = StateCache(filename, nb.base_url)
+        state.sync("tenancy.tenants", nb.tenancy.tenants)
+        since = state.since("tenancy.tenants")
+        state.save(
+            "tenancy.tenants",
+            [dict(id=99, name="tnt99", last_updated="9999-01-01")],
+            sync=False,
+        )
+        assert state.since("tenancy.tenants") == since, err_msg
+        assert state.load("tenancy.tenants")[99]["name"] == "tnt99", err_msg
+
+    # 1e. NETBOX_URL: Test the cache of another Netbox is emptied
+    def test_netbox_url(self, fake_nb):
+        err_msg = "❌ state_cache: Emptying the cache of a different Netbox failed"
+        nb, fake, filename = fake_nb
+        StateCache(filename, nb.base_url).sync("tenancy.tenants", nb.tenancy.tenants)
+        state = StateCache(filename, "http://other_netbox/api")
+        assert state.since("tenancy.tenants") == None, err_msg
+        assert state.load("tenancy.tenants") == {}, err_msg
@@ -0,0 +1,212 @@
+import pytest
+import io
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from transport import NboxAdapter, TokenBucket, Stats, Cassette
+
+
+# ----------------------------------------------------------------------------
+# Fixture to replace the real HTTP send with canned responses (status code and headers) and record each call
+# ----------------------------------------------------------------------------
+@pytest.fixture
+def mock_send(monkeypatch):
+    calls = []
+    responses = []
+
+    def send(self, request, **kwargs):
+        calls.append(request.method)
+        status, headers = responses.pop(0)
+        if isinstance(status, Exception):
+            raise status
+        resp = requests.Response()
+        resp.status_code = status
+        resp.headers.update(headers)
+        resp.raw = io.BytesIO(b"")
+        return resp
+
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    monkeypatch.setattr(time, "sleep", lambda x: calls.append(round(x, 2)))
+    return calls, responses
+
+
+def make_request(method: str) -> requests.PreparedRequest:
+    return requests.Request(method, "http://netbox/api/dcim/sites/").prepare()
+
+
+# ----------------------------------------------------------------------------
+# 1. TRANSPORT: Testing of retries, backoff and rate limiting of the Netbox transport adapter
+# ----------------------------------------------------------------------------
+class TestTransport:
+
+    # 1a. RETRY_AFTER: Test throttled request is retried after the Retry-After delay
+    def test_retry_after(self, mock_send):
+        err_msg = (
+            "❌ retry_after: Retrying a throttled request after Retry-After failed"
+        )
+        calls, responses = mock_send
+        responses.extend([(429, {"Retry-After": "2"}), (200, {})])
+        resp = NboxAdapter(retries=3).send(make_request("POST"))
+        assert resp.status_code == 200, err_msg
+        assert calls == ["POST", 2, "POST"], err_msg
+
+    # 1b. RETRY_IDEMPOTENT: Test gateway errors are only retried for idempotent methods
+    def test_retry_idempotent(self, mock_send):
+        err_msg = "❌ retry_status: Retrying gateway errors for idempotent methods only failed"
+        calls, responses = mock_send
+        responses.extend([(502, {}), (200, {}), (502, {})])
+        assert (
+            NboxAdapter(retries=3).send(make_request("GET")).status_code == 200
+        ), err_msg
+        assert (
+            NboxAdapter(retries=3).send(make_request("POST")).status_code == 502
+        ), err_msg
+
+    # 1c. RETRY_LIMIT: Test the last error is returned (or raised) once the retries are used up
+    def test_retry_limit(self, mock_send):
+        err_msg = "❌ send: Giving up after the number of retries failed"
+        calls, responses = mock_send
+        responses.extend([(503, {})] * 3)
+        assert (
+            NboxAdapter(retries=2).send(make_request("GET")).status_code == 503
+        ), err_msg
+        assert [x for x in calls if x == "GET"] == ["GET"] * 3, err_msg
+        responses.extend([(requests.exceptions.ConnectionError(), {})] * 2)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            NboxAdapter(retries=1).send(make_request("GET"))
+
+    # 1d. BACKOFF: Test backoff delay is random but never more than the exponential (capped) delay
+    def test_backoff_delay(self):
+        err_msg = "❌ backoff_delay: Exponential backoff with jitter failed"
+        adapter = NboxAdapter(backoff=1, max_backoff=5)
+        assert all(0 <= adapter.backoff_delay(2) <= 4 for i in range(50)), err_msg
+        assert all(0 <= adapter.backoff_delay(10) <= 5 for i in range(50)), err_msg
+
+    # 1e. TOKEN_BUCKET: Test requests over the burst are delayed to the rate limit
+    def test_token_bucket(self, mock_send):
+        err_msg = "❌ token_bucket: Rate limiting requests failed"
+        calls, responses = mock_send
+        bucket = TokenBucket(rate=10, burst=2)
+        for i in range(3):
+            bucket.take()
+        assert len(calls) == 1 and 0 < calls[0] <= 0.1, err_msg
+
+    # 1f. STATS: Test requests are recorded per endpoint (without object ID) and method, including retries
+    def test_stats_record(self, mock_send):
+        err_msg = "❌ stats: Recording per endpoint request metrics failed"
+        calls, responses = mock_send
+        responses.extend([(429, {}), (200, {})])
+        adapter = NboxAdapter(retries=1)
+        request = requests.Request(
+            "PATCH", "http://netbox/api/dcim/sites/12/", data="abc"
+        )
+        adapter.send(request.prepare())
+        actual_result = adapter.stats.summary()["api"][0]
+        assert (actual_result["endpoint"], actual_result["method"]) == (
+            "dcim/sites",
+            "PATCH",
+        ), err_msg
+        assert (
+            actual_result["calls"],
+            actual_result["retries"],
+            actual_result["errors"],
+        ) == (2, 1, 1), err_msg
+        assert (
+            actual_result["sent"] == 6 and actual_result["histogram"]["<=10ms"] == 2
+        ), err_msg
+
+    # 1g. STATS_STAGE: Test each stage records its time and API calls, starting a stage ends the last one
+    def test_stats_stage(self):
+        err_msg = "❌ stats: Recording stage timings failed"
+        stats = Stats()
+        stats.stage("ORG")
+        stats.record(make_request("GET"), None, 0.2, False)
+        stats.stage("DVC")
+        stats.stage(None)
+        actual_result = stats.summary()["stages"]
+        assert list(actual_result.keys()) == ["ORG", "DVC"], err_msg
+        assert (
+            actual_result["ORG"]["calls"] == 1 and actual_result["DVC"]["calls"] == 0
+        ), err_msg
+        histogram = stats.api[("dcim/sites", "GET")]["histogram"]
+        assert stats.percentile(histogram, 0.95) == 250, err_msg
+
+    # 1g. STATS_TIMING: Test stages run at the same time only count the API calls made by their own threads
+    def test_stats_timing(self):
+        err_msg = "❌ stats: Recording concurrent stage timings failed"
+        stats = Stats()
+        with stats.timing("Tenant"):
+            stats.record(make_request("GET"), None, 0.2, False)
+            thread = threading.Thread(
+                target=stats.record, args=(make_request("GET"), None, 0.2, False)
+            )
+            thread.start()
+            thread.join()
+        with stats.timing("Site"):
+            pass
+        actual_result = stats.summary()["stages"]
+        assert list(actual_result.keys()) == ["Tenant", "Site"], err_msg
+        assert (
+            actual_result["Tenant"]["calls"] == 1
+            and actual_result["Site"]["calls"] == 0
+        ), err_msg
+
+    # 1g. STATS_SECTION: Test the time and API calls of the stages of a section are added to the section
+    def test_stats_section(self):
+        err_msg = "❌ stats: Adding stage timings to their section failed"
+        stats = Stats()
+        stats.stage("ORG")
+        stats.record(make_request("GET"), None, 0.2, False)
+        stats.stage(None)
+        with stats.timing("Tenant", "ORG"):
+            stats.record(make_request("POST"), None, 0.2, False)
+            time.sleep(0.02)
+        with stats.timing("Site", "ORG"):
+            stats.record(make_request("POST"), None, 0.2, False)
+        actual_result = stats.summary()["stages"]
+        assert (
+            actual_result["ORG"]["calls"] == 3 and actual_result["Tenant"]["calls"] == 1
+        ), err_msg
+        assert (
+            actual_result["ORG"]["secs"] >= actual_result["Tenant"]["secs"] >= 0.02
+        ), err_msg
+        assert (
+            actual_result["ORG"].get("section") == None
+            and actual_result["Site"]["section"] == "ORG"
+        ), err_msg
+
+    # 1g. STATS_STRATEGY: Test the existence check strategy of each endpoint is kept in the summary
+    def test_stats_strategy(self):
+        err_msg = "❌ stats: Recording the existence check strategy failed"
+        stats = Stats()
+        stats.add_strategy(
+            "ipam.prefixes",
+            "filter",
+            500000,
+            200,
+            dict(prefetch=500, filter=1, point=200),
+        )
+        actual_result = stats.summary()["strategy"]["ipam.prefixes"]
+        assert (
+            actual_result["strategy"] == "filter" and actual_result["count"] == 500000
+        ), err_msg
+        assert actual_result["cost"] == dict(prefetch=500, filter=1, point=200), err_msg
+
+    # 1h. CASSETTE: Test requests are recorded to file and replayed from it (in recorded order) without the network
+    def test_cassette(self, mock_send, tmp_path):
+        err_msg = "❌ cassette: Recording and replaying API calls failed"
+        calls, responses = mock_send
+        responses.extend([(200, {"API-Version": "3.2"}), (201, {})])
+        filename = str(tmp_path / "cassette.json.gz")
+        adapter = NboxAdapter(cassette=Cassette(filename, "record"))
+        adapter.send(make_request("GET"))
+        adapter.send(make_request("GET"))
+        adapter.cassette.save()
+        adapter = NboxAdapter(cassette=Cassette(filename, "replay"))
+        request = requests.Request("GET", "http://other/api/dcim/sites/").prepare()
+        actual_result = [adapter.send(request).status_code for i in range(3)]
+        assert actual_result == [200, 201, 201], err_msg
+        assert calls == ["GET", "GET"], err_msg
+        with pytest.raises(requests.exceptions.ConnectionError):
+            adapter.send(make_request("POST"))
@@ -0,0 +1,367 @@
+from typing import Any, Dict, List
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import atexit
+import gzip
+import hashlib
+import io
+import json
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter, DEFAULT_POOLSIZE
+
+
+# ----------------------------------------------------------------------------
+# TOKEN_BUCKET: Each request takes a token, tokens are refilled at 'rate' per second up to 'burst'
+# ----------------------------------------------------------------------------
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.burst = burst if burst != None else max(1, int(rate))
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    # TAKE: Reserves a token (can go into debt) and sleeps until it is due
+    def take(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+# ----------------------------------------------------------------------------
+# STATS: Per endpoint and method request metrics (count, bytes, latency histogram) and per stage timings
+# ----------------------------------------------------------------------------
+class Stats:
+    # Upper bound (ms) of each latency histogram bucket, anything slower goes in the last (inf) bucket
+    BUCKET_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+    def __init__(self):
+        self.api = defaultdict(
+            lambda: dict(
+                calls=0,
+                retries=0,
+                errors=0,
+                sent=0,
+                received=0,
+                secs=0,
+                max_secs=0,
+                histogram=[0] * len(self.BUCKET_MS),
+            )
+        )
+        self.stages = {}
+        self.current = None
+        # LOCAL: Stage (run with timing) of the thread making the call, its calls are counted in stage_calls
+        self.local = threading.local()
+        self.stage_calls = {}
+        # SPANS: Start and end time of each stage run with timing, a section is timed from its first to last stage
+        self.spans = {}
+        # STRATEGY: How the objects of each endpoint were fetched to check existence and the estimated calls of each
+        self.strategy = {}
+        self.lock = threading.Lock()
+
+    # API_NAME: Endpoint of the URL without the object ID (e.g. http://nbox/api/dcim/sites/12/ is dcim/sites)
+    def api_name(self, url: str) -> str:
+        path = [x for x in urlsplit(url).path.split("/") if x != ""]
+        if "api" in path:
+            path = path[path.index("api") + 1 :]
+        return "/".join([x for x in path if not x.isdigit()][:2])
+
+    # RECORD: Adds a request (each retry is counted as a separate call)
+    def record(
+        self, request: requests.PreparedRequest, resp: Any, secs: float, retry: bool
+    ) -> None:
+        body = request.body or b""
+        with self.lock:
+            each_api = self.api[(self.api_name(request.url), request.method)]
+            each_api["calls"] += 1
+            each_api["retries"] += int(retry)
+            each_api["errors"] += int(resp == None or resp.status_code >= 400)
+            each_api["sent"] += len(body.encode() if isinstance(body, str) else body)
+            each_api["received"] += len(resp.content) if resp != None else 0
+            each_api["secs"] += secs
+            each_api["max_secs"] = max(each_api["max_secs"], secs)
+            bucket = [secs * 1000 <= x for x in self.BUCKET_MS].index(True)
+            each_api["histogram"][bucket] += 1
+            stage = getattr(self.local, "stage", None)
+            if stage in self.stage_calls:
+                self.stage_calls[stage] += 1
+
+    # STAGE: Starts timing a stage, this ends the previous stage (None just ends it)
+    def stage(self, name: str) -> None:
+        now = time.perf_counter()
+        with self.lock:
+            calls = sum(x["calls"] for x in self.api.values())
+            if self.current != None:
+                start, start_calls = self.stages.pop(self.current)
+                self.stages[self.current] = dict(
+                    secs=now - start, calls=calls - start_calls
+                )
+            if name != None:
+                self.stages[name] = (now, calls)
+            self.current = name
+
+    # TIMING: Times a stage run at the same time as others, its calls are those made by threads working on the stage.
+    # The time and calls of the stages of a section are added to the section (if timed with stage)
+    @contextmanager
+    def timing(self, name: str, section: str = None) -> Any:
+        start = time.perf_counter()
+        with self.lock:
+            self.stages[name], self.stage_calls[name] = (None, 0)
+        self.local.stage = name
+        try:
+            yield
+        finally:
+            self.local.stage = None
+            end = time.perf_counter()
+            with self.lock:
+                self.stages[name] = dict(
+                    secs=end - start, calls=self.stage_calls.pop(name), section=section
+                )
+                self.spans[name] = (start, end)
+
+    # ADD_STRATEGY: Records the strategy chosen for an endpoint, the objects in Netbox and DMs checked it was based on
+    def add_strategy(
+        self, api: str, strategy: str, count: int, num_dm: int, cost: Dict[str, int]
+    ) -> None:
+        with self.lock:
+            self.strategy[api] = dict(
+                strategy=strategy, count=count, dm=num_dm, cost=cost
+            )
+
+    # SUMMARY: All metrics as a dict (used for the JSON output)
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            all_api = []
+            for (api, method), each_api in sorted(self.api.items()):
+                each_api = dict(each_api, endpoint=api, method=method)
+                each_api["histogram"] = {
+                    f"<={x}ms": y for x, y in zip(self.BUCKET_MS, each_api["histogram"])
+                }
+                all_api.append(each_api)
+            stages = {x: dict(y) for x, y in self.stages.items() if isinstance(y, dict)}
+            for section in set(x.get("section") for x in stages.values()):
+                all_name = [x for x, y in stages.items() if y.get("section") == section]
+                if section in stages and len(all_name) != 0:
+                    stages[section]["calls"] += sum(
+                        stages[x]["calls"] for x in all_name
+                    )
+                    end = max(self.spans[x][1] for x in all_name)
+                    stages[section]["secs"] += end - min(
+                        self.spans[x][0] for x in all_name
+                    )
+            strategy = dict(self.strategy)
+        total = {
+            x: sum(y[x] for y in all_api)
+            for x in ["calls", "retries", "errors", "sent", "received", "secs"]
+        }
+        return dict(stages=stages, strategy=strategy, api=all_api, total=total)
+
+    # PERCENTILE: Upper bound (ms) of the histogram bucket the percentile falls in
+    def percentile(self, histogram: List, pct: float) -> float:
+        target, count = sum(histogram) * pct, 0
+        for bucket_ms, num in zip(self.BUCKET_MS, histogram):
+            count += num
+            if count >= target:
+                return bucket_ms
+        return self.BUCKET_MS[-1]
+
+
+# ----------------------------------------------------------------------------
+# CASSETTE: Records every request/response pair to a gzip JSON file or replays them from it (no network)
+# ----------------------------------------------------------------------------
+class Cassette:
+    def __init__(self, filename: str, mode: str, latency: float = 0):
+        self.filename = filename
+        self.mode = mode
+        self.latency = latency
+        self.lock = threading.Lock()
+        # Responses per request ({key: [responses]}), replayed in the order recorded (the last is repeated if run out)
+        self.entry = defaultdict(list)
+        if mode == "replay":
+            with gzip.open(filename, "rt") as file_content:
+                for key, all_resp in json.load(file_content).items():
+                    self.entry[key] = all_resp
+        elif mode == "record":
+            atexit.register(self.save)
+
+    # KEY: Method, path and sorted query of the URL (so any base URL matches) and a hash of the body
+    def key(self, request: requests.PreparedRequest) -> str:
+        url = urlsplit(request.url)
+        qry = urlencode(sorted(parse_qsl(url.query, keep_blank_values=True)))
+        body = request.body or b""
+        body = hashlib.sha1(
+            body.encode() if isinstance(body, str) else body
+        ).hexdigest()[:16]
+        return f"{request.method} {url.path}?{qry} {body}"
+
+    # ADD: Records the response of a request
+    def add(self, request: requests.PreparedRequest, resp: requests.Response) -> None:
+        with self.lock:
+            self.entry[self.key(request)].append(
+                dict(
+                    status=resp.status_code,
+                    headers={
+                        x: y
+                        for x, y in resp.headers.items()
+                        if x.lower() != "content-encoding"
+                    },
+                    body=resp.text,
+                )
+            )
+
+    # PLAY: Builds the recorded response of a request, errors like a failed connection if it was never recorded
+    def play(self, request: requests.PreparedRequest) -> requests.Response:
+        key = self.key(request)
+        with self.lock:
+            all_resp = self.entry.get(key)
+            if not all_resp:
+                raise requests.exceptions.ConnectionError(
+                    f"Request '{key}' is not in the cassette '{self.filename}'",
+                    request=request,
+                )
+            each_resp = all_resp.pop(0) if len(all_resp) > 1 else all_resp[0]
+        if self.latency:
+            time.sleep(self.latency)
+        resp = requests.Response()
+        resp.status_code = each_resp["status"]
+        resp.headers.update(each_resp["headers"])
+        resp.raw = io.BytesIO()
+        resp._content = each_resp["body"].encode()
+        resp.encoding = "utf-8"
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    # SAVE: Writes all recorded pairs to the compressed cassette file
+    def save(self) -> None:
+        with self.lock:
+            with gzip.open(self.filename, "wt") as file_content:
+                json.dump(self.entry, file_content, separators=(",", ":"))
+
+
+# ----------------------------------------------------------------------------
+# NBOX_ADAPTER: Transport adapter that retries failed requests with backoff and rate limits all requests
+# ----------------------------------------------------------------------------
+class NboxAdapter(HTTPAdapter):
+    # Not processed by NetBox so safe to retry for any method
+    RETRY_STATUS = (429, 503)
+    # May have been processed by NetBox so only retried for methods that can be repeated
+    RETRY_IDEMPOTENT_STATUS = (502, 504)
+    IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+    def __init__(
+        self,
+        retries: int = 0,
+        backoff: float = 0.5,
+        max_backoff: float = 30,
+        rate: float = 0,
+        pool_size: int = DEFAULT_POOLSIZE,
+        cassette: Cassette = None,
+        max_inflight: int = 0,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(rate) if rate > 0 else None
+        self.stats = Stats()
+        self.cassette = cassette
+        # MAX_INFLIGHT: Most requests sent at the same time (0 is no limit), waits for retries are not counted
+        self.inflight = (
+            threading.BoundedSemaphore(max_inflight) if max_inflight > 0 else None
+        )
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    # SEND: Sends the request, if it fails with a retryable error waits and tries again (up to retries times)
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        attempt = 0
+        while True:
+            if self.bucket != None:
+                self.bucket.take()
+            start = time.perf_counter()
+            try:
+                if self.inflight != None:
+                    with self.inflight:
+                        resp = self.send_once(request, **kwargs)
+                else:
+                    resp = self.send_once(request, **kwargs)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                self.stats.record(
+                    request, None, time.perf_counter() - start, attempt > 0
+                )
+                if attempt >= self.retries or not self.retry_error(request, e):
+                    raise
+                delay = self.backoff_delay(attempt)
+            else:
+                self.stats.record(
+                    request, resp, time.perf_counter() - start, attempt > 0
+                )
+                if attempt >= self.retries or not self.retry_status(request, resp):
+                    return resp
+                delay = self.retry_after(resp)
+                if delay == None:
+                    delay = self.backoff_delay(attempt)
+                resp.close()
+            time.sleep(delay)
+            attempt += 1
+
+    # SEND_ONCE: A single attempt, served from the cassette if replaying and added to it if recording
+    def send_once(
+        self, request: requests.PreparedRequest, **kwargs
+    ) -> requests.Response:
+        if self.cassette != None and self.cassette.mode == "replay":
+            return self.cassette.play(request)
+        resp = super().send(request, **kwargs)
+        if self.cassette != None and self.cassette.mode == "record":
+            self.cassette.add(request, resp)
+        return resp
+
+    # RETRY_STATUS: Whether the response status code can be retried for this request method
+    def retry_status(
+        self, request: requests.PreparedRequest, resp: requests.Response
+    ) -> bool:
+        if resp.status_code in self.RETRY_STATUS:
+            return True
+        return (
+            resp.status_code in self.RETRY_IDEMPOTENT_STATUS
+            and request.method in self.IDEMPOTENT_METHODS
+        )
+
+    # RETRY_ERROR: Failing to connect is always safe to retry, any other connection error only for idempotent methods
+    def retry_error(self, request: requests.PreparedRequest, error: Exception) -> bool:
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        return request.method in self.IDEMPOTENT_METHODS
+
+    # BACKOFF: Exponential backoff with full jitter (random delay up to backoff * 2^attempt, capped at max_backoff)
+    def backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    # RETRY_AFTER: Seconds to wait from the Retry-After header (seconds or HTTP date), None if not sent
+    def retry_after(self, resp: requests.Response) -> Any:
+        value = resp.headers.get("Retry-After")
+        if value == None:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = (
+                    parsedate_to_datetime(value) - datetime.now(timezone.utc)
+                ).total_seconds()
+            except (TypeError, ValueError):
+                return None
+        return max(0, delay)